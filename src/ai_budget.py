@@ -0,0 +1,164 @@
+"""
+AI 用量预算
+按每次响应中的 usage 字段累计 token 数和费用，预算将尽时逐级降低 AI 使用：
+完整 → 仅为长划线/有笔记的划线调用 AI → 仅本地标签 → 不使用 AI
+"""
+import threading
+from typing import Dict, Optional
+from .config_manager import config
+from .usage_ledger import UsageLedger, get_usage_ledger
+
+# 降级等级
+LEVEL_FULL = 'full'  # 正常使用 AI
+LEVEL_REDUCED = 'reduced'  # 只为长划线或有笔记的划线调用 AI，其余使用本地标签
+LEVEL_LOCAL = 'local'  # 只使用本地规则生成标签
+LEVEL_OFF = 'off'  # 不生成标签和摘要
+
+LEVEL_NAMES = {
+    LEVEL_FULL: '完整',
+    LEVEL_REDUCED: '精简（仅长划线/有笔记的划线）',
+    LEVEL_LOCAL: '仅本地标签',
+    LEVEL_OFF: '停用 AI',
+}
+
+
+class AIBudget:
+    """AI token / 费用预算（本次运行 + 每日），线程安全"""
+
+    LEDGER_TOKENS = "ai_tokens"
+    LEDGER_COST = "ai_cost"
+
+    def __init__(
+        self,
+        ledger: Optional[UsageLedger] = None,
+        run_tokens: int = 0,
+        daily_tokens: int = 0,
+        run_cost: float = 0,
+        daily_cost: float = 0,
+        input_price: float = 0,
+        output_price: float = 0,
+        reduce_below: float = 0.5,
+        local_below: float = 0.2
+    ):
+        """
+        初始化预算
+
+        Args:
+            ledger: 用量账本（记录每日用量，为 None 时不限制每日用量）
+            run_tokens: 本次运行最多 token 数（0 表示不限制）
+            daily_tokens: 每天最多 token 数（0 表示不限制）
+            run_cost: 本次运行最多费用（0 表示不限制）
+            daily_cost: 每天最多费用（0 表示不限制）
+            input_price: 每 1000 输入 token 的价格
+            output_price: 每 1000 输出 token 的价格
+            reduce_below: 剩余预算低于该比例时进入精简模式
+            local_below: 剩余预算低于该比例时只使用本地标签
+        """
+        self.ledger = ledger
+        self.run_tokens = run_tokens
+        self.daily_tokens = daily_tokens
+        self.run_cost = run_cost
+        self.daily_cost = daily_cost
+        self.input_price = input_price
+        self.output_price = output_price
+        self.reduce_below = reduce_below
+        self.local_below = local_below
+        self.lock = threading.Lock()
+
+        # 本次运行用量
+        self.request_count = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+
+    def cost_of(self, prompt_tokens: int, completion_tokens: int) -> float:
+        """按单价计算一次调用的费用"""
+        return (prompt_tokens * self.input_price + completion_tokens * self.output_price) / 1000
+
+    def record(self, prompt_tokens: int, completion_tokens: int):
+        """
+        记录一次 AI 调用的用量
+
+        Args:
+            prompt_tokens: 输入 token 数
+            completion_tokens: 输出 token 数
+        """
+        cost = self.cost_of(prompt_tokens, completion_tokens)
+        with self.lock:
+            self.request_count += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.cost += cost
+        if self.ledger is not None:
+            self.ledger.add(self.LEDGER_TOKENS, prompt_tokens + completion_tokens)
+            if cost > 0:
+                self.ledger.add(self.LEDGER_COST, cost)
+
+    def get_daily_tokens(self) -> float:
+        """获取今日已用 token 数"""
+        return self.ledger.get(self.LEDGER_TOKENS) if self.ledger is not None else 0
+
+    def get_daily_cost(self) -> float:
+        """获取今日已用费用"""
+        return self.ledger.get(self.LEDGER_COST) if self.ledger is not None else 0
+
+    def remaining_fraction(self) -> float:
+        """
+        获取剩余预算比例（各项限制中最紧的一项）
+
+        Returns:
+            0~1，未设置任何限制时为 1
+        """
+        limits = [
+            (self.run_tokens, self.prompt_tokens + self.completion_tokens),
+            (self.run_cost, self.cost),
+        ]
+        if self.ledger is not None:
+            limits.append((self.daily_tokens, self.get_daily_tokens()))
+            limits.append((self.daily_cost, self.get_daily_cost()))
+
+        fraction = 1.0
+        for limit, used in limits:
+            if limit > 0:
+                fraction = min(fraction, max(limit - used, 0) / limit)
+        return fraction
+
+    def get_level(self) -> str:
+        """获取当前降级等级"""
+        fraction = self.remaining_fraction()
+        if fraction <= 0:
+            return LEVEL_OFF
+        if fraction < self.local_below:
+            return LEVEL_LOCAL
+        if fraction < self.reduce_below:
+            return LEVEL_REDUCED
+        return LEVEL_FULL
+
+    def get_stats(self) -> Dict:
+        """获取本次运行和今日用量"""
+        return {
+            "request_count": self.request_count,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+            "cost": self.cost,
+            "daily_tokens": self.get_daily_tokens(),
+            "daily_cost": self.get_daily_cost(),
+            "level": self.get_level(),
+        }
+
+
+# 共享的预算实例（延迟创建）
+_budget: Optional[AIBudget] = None
+# 工作线程可能同时首次获取，创建时加锁
+_lock = threading.Lock()
+
+
+def get_ai_budget() -> AIBudget:
+    """获取共享的 AI 用量预算"""
+    global _budget
+    if _budget is None:
+        with _lock:
+            if _budget is None:
+                _budget = AIBudget(ledger=get_usage_ledger(), **config.get_ai_budget())
+    return _budget
@@ -0,0 +1,258 @@
+"""
+AI 结果缓存
+按 (提供商, 实际应答的 API 地址和模型, 实际使用的提示词模板, 划线内容) 持久化 AI 标签和摘要，
+重复处理同一段内容（发送失败重跑、重置记录、跨书籍相同段落）时不再调用 AI
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterable, List, Optional, Tuple
+from .config_manager import config
+from .highlight_utils import normalize_text
+
+
+class AICache:
+    """带 LRU 淘汰和可选过期时间的 AI 结果缓存"""
+
+    def __init__(self, path: str = "ai_cache.json", max_entries: int = 5000, ttl_days: float = 0):
+        """
+        初始化缓存
+
+        Args:
+            path: 缓存文件路径
+            max_entries: 最多保存的条目数，超出时淘汰最久未使用的条目
+            ttl_days: 条目有效天数（0 表示永不过期）
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_days * 86400
+        self.entries = self.load()
+        self.dirty = False
+        self.lock = threading.Lock()  # 并发 AI 请求会同时读写缓存
+
+        # 统计
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def load(self) -> "OrderedDict[str, Any]":
+        """加载缓存文件（文件中按最近使用顺序保存）"""
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    return OrderedDict(json.load(f).get("entries", []))
+            except Exception as e:
+                print(f"⚠️  加载 AI 缓存失败: {e}")
+        return OrderedDict()
+
+    def save(self):
+        """保存缓存文件（没有变化时跳过）"""
+        if not self.dirty:
+            return
+        with self.lock:
+            data = {"entries": list(self.entries.items())}
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+        except Exception as e:
+            print(f"⚠️  保存 AI 缓存失败: {e}")
+
+    @staticmethod
+    def make_key(kind: str, provider: str, api_base: str, model: str, prompt_template: str, text: str) -> str:
+        """
+        生成缓存键
+
+        Args:
+            kind: 结果类型，如 'tags'、'summary'
+            provider: AI 提供商
+            api_base: API 地址
+            model: 模型名称
+            prompt_template: 提示词模板（未填充变量）
+            text: 划线内容（归一化后参与计算）
+
+        Returns:
+            缓存键
+        """
+        return AICache.make_keys(kind, provider, [(api_base, model)], [prompt_template], text)[0]
+
+    @staticmethod
+    def make_keys(
+        kind: str,
+        provider: str,
+        sources: Iterable[Tuple[str, str]],
+        prompt_templates: Iterable[str],
+        text: str
+    ) -> List[str]:
+        """
+        生成多个 (接口, 提示词) 组合的缓存键
+
+        结果按实际应答的接口和实际使用的提示词写入，查询时需要尝试所有可能的组合
+
+        Args:
+            kind: 结果类型，如 'tags'、'summary'
+            provider: AI 提供商
+            sources: [(API 地址, 模型名称)]
+            prompt_templates: 提示词模板列表（未填充变量）
+            text: 划线内容（归一化后参与计算）
+
+        Returns:
+            去重后的缓存键列表（保持顺序）
+        """
+        text_hash = hashlib.sha1(normalize_text(text).encode('utf-8')).hexdigest()
+        prompt_hashes = [
+            hashlib.sha1((template or '').encode('utf-8')).hexdigest()
+            for template in prompt_templates
+        ]
+        keys = {}
+        for api_base, model in sources:
+            for prompt_hash in prompt_hashes:
+                raw = "\x1f".join([kind, provider, api_base.rstrip('/'), model, prompt_hash, text_hash])
+                keys[hashlib.sha1(raw.encode('utf-8')).hexdigest()] = None
+        return list(keys)
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        读取缓存
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            缓存的结果，未命中或已过期时返回 None
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and self.ttl_seconds > 0 and time.time() - entry["created_at"] > self.ttl_seconds:
+                del self.entries[key]
+                self.dirty = True
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry["value"]
+
+    def get_first(self, keys: Iterable[str]) -> Optional[Any]:
+        """
+        按顺序查找多个缓存键，返回第一个命中的结果（只计一次命中或未命中）
+
+        Args:
+            keys: 缓存键列表
+
+        Returns:
+            缓存的结果，都未命中时返回 None
+        """
+        with self.lock:
+            now = time.time()
+            for key in keys:
+                entry = self.entries.get(key)
+                if entry is None:
+                    continue
+                if self.ttl_seconds > 0 and now - entry["created_at"] > self.ttl_seconds:
+                    del self.entries[key]
+                    self.dirty = True
+                    continue
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry["value"]
+            self.misses += 1
+            return None
+
+    def contains_any(self, keys: Iterable[str]) -> bool:
+        """多个缓存键中是否有未过期的缓存（不计入命中统计，不调整淘汰顺序）"""
+        return any(self.contains(key) for key in keys)
+
+    def contains(self, key: str) -> bool:
+        """是否有未过期的缓存（不计入命中统计，不调整淘汰顺序）"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return False
+            return self.ttl_seconds <= 0 or time.time() - entry["created_at"] <= self.ttl_seconds
+
+    def set(self, key: str, value: Any):
+        """
+        写入缓存
+
+        Args:
+            key: 缓存键
+            value: 结果（需可 JSON 序列化）
+        """
+        if value is None:
+            return
+        with self.lock:
+            self.entries[key] = {"value": value, "created_at": time.time()}
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self.dirty = True
+
+    def get_hit_rate(self) -> float:
+        """获取命中率（百分比）"""
+        total = self.hits + self.misses
+        return (self.hits / total) * 100 if total > 0 else 0.0
+
+
+class _DisabledCache(AICache):
+    """未启用缓存时使用：不读写文件，始终未命中"""
+
+    def __init__(self):
+        super().__init__(path="", max_entries=0)
+
+    def load(self):
+        return OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        return None
+
+    def get_first(self, keys: Iterable[str]) -> Optional[Any]:
+        return None
+
+    def contains(self, key: str) -> bool:
+        return False
+
+    def set(self, key: str, value: Any):
+        pass
+
+    def save(self):
+        pass
+
+
+# 共享的缓存实例（延迟创建）
+_cache: Optional[AICache] = None
+# 工作线程可能同时首次获取，创建时加锁
+_lock = threading.Lock()
+
+
+def get_ai_cache() -> AICache:
+    """获取共享的 AI 结果缓存"""
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                if config.should_enable_ai_cache():
+                    _cache = AICache(
+                        path=config.get_ai_cache_file(),
+                        max_entries=config.get_ai_cache_max_entries(),
+                        ttl_days=config.get_ai_cache_ttl_days()
+                    )
+                else:
+                    _cache = _DisabledCache()
+    return _cache
+
+
+def save_ai_cache():
+    """保存共享的 AI 结果缓存（本次运行没有用到时不加载、不保存）"""
+    if _cache is not None:
+        _cache.save()
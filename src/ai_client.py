@@ -0,0 +1,400 @@
+"""
+OpenAI 兼容接口客户端
+AI 标签、AI 摘要等功能共用的 /chat/completions 调用。
+支持多个接口地址（ai.endpoints）：按权重选择、慢请求对冲、出错时切换到下一个；
+每个接口有独立的熔断器和自适应超时，全部不可用时后续调用立即跳过
+"""
+import random
+import threading
+import time
+import requests
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from typing import Any, Dict, List, Optional, Tuple
+from .ai_budget import get_ai_budget
+from .ai_executor import estimate_tokens, get_request_budget
+from .circuit_breaker import CircuitBreaker, LatencyTracker
+from .config_manager import config
+
+
+class AIUnavailableError(Exception):
+    """AI 服务熔断中，请求未发出"""
+
+
+class AIEndpoint:
+    """单个 OpenAI 兼容接口（地址 + 模型 + Key）"""
+
+    def __init__(
+        self,
+        api_base: str,
+        model: str,
+        api_key: str,
+        weight: float = 1,
+        name: Optional[str] = None,
+        timeout: float = 30,
+        adaptive_timeout: Optional[Dict[str, Any]] = None,
+        circuit_breaker: Optional[Dict[str, float]] = None
+    ):
+        """
+        初始化接口
+
+        Args:
+            api_base: API 地址
+            model: 模型名称
+            api_key: API Key
+            weight: 选择为首选接口的权重
+            name: 统计中显示的名称（默认为 API 地址）
+            timeout: 请求超时上限（秒）
+            adaptive_timeout: 自适应超时参数
+            circuit_breaker: 熔断参数
+        """
+        self.api_base = api_base
+        self.model = model
+        self.api_key = api_key
+        self.weight = weight
+        self.name = name or api_base
+        self.timeout = timeout
+        self.adaptive_timeout = adaptive_timeout or {}
+        self.breaker = CircuitBreaker(**(circuit_breaker or {}))
+
+        # 不同输出长度（单条 / 批量）的耗时差别很大，按 max_tokens 分别统计
+        self.latency: Dict[int, LatencyTracker] = {}
+
+        # 统计（对冲请求在线程池中发出，计数需要加锁）
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.win_count = 0
+        self.failure_count = 0
+
+    def get_tracker(self, max_tokens: int) -> LatencyTracker:
+        """获取同类请求的耗时记录"""
+        tracker = self.latency.get(max_tokens)
+        if tracker is None:
+            tracker = self.latency.setdefault(max_tokens, LatencyTracker(
+                max_timeout=self.timeout,
+                min_timeout=self.adaptive_timeout.get('min_timeout', 5),
+                multiplier=self.adaptive_timeout.get('multiplier', 2.0)
+            ))
+        return tracker
+
+    def get_timeout(self, max_tokens: int) -> float:
+        """
+        获取本次请求的超时时间
+
+        Args:
+            max_tokens: 最大输出 token 数
+
+        Returns:
+            超时秒数：根据同类请求近期耗时的 p95 计算，样本不足时为 ai.timeout
+        """
+        if not self.adaptive_timeout.get('enabled', True):
+            return self.timeout
+        return self.get_tracker(max_tokens).get_timeout()
+
+    def get_hedge_delay(self, max_tokens: int, percentile: float) -> Optional[float]:
+        """
+        获取发出对冲请求前的等待时间
+
+        Args:
+            max_tokens: 最大输出 token 数
+            percentile: 使用的耗时分位数
+
+        Returns:
+            同类请求近期耗时的分位数（秒），样本不足时返回 None（不对冲）
+        """
+        tracker = self.get_tracker(max_tokens)
+        if len(tracker.samples) < tracker.min_samples:
+            return None
+        return tracker.get_percentile(percentile)
+
+    def chat(self, prompt: str, max_tokens: int, temperature: float) -> str:
+        """
+        向该接口发送单轮对话请求
+
+        Raises:
+            AIUnavailableError: 该接口熔断中，请求未发出
+        """
+        if not self.breaker.allow_request():
+            raise AIUnavailableError(f"AI 接口 {self.name} 暂不可用（熔断中）")
+
+        # 超出每分钟请求数 / token 数限制时在此排队
+        get_request_budget().acquire(estimate_tokens(prompt) + max_tokens)
+
+        url = f"{self.api_base.rstrip('/')}/chat/completions"
+        headers = {
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json'
+        }
+        data = {
+            'model': self.model,
+            'messages': [
+                {'role': 'user', 'content': prompt}
+            ],
+            'temperature': temperature,
+            'max_tokens': max_tokens
+        }
+
+        with self.lock:
+            self.request_count += 1
+        # 失败的请求同样记录耗时，否则 p95 只学到快速返回的请求，超时无法随慢请求增长
+        tracker = self.get_tracker(max_tokens)
+        timeout = self.get_timeout(max_tokens)
+        start = time.time()
+        try:
+            response = requests.post(url, headers=headers, json=data, timeout=timeout)
+            response.raise_for_status()
+        except requests.exceptions.HTTPError as e:
+            tracker.record(time.time() - start)
+            with self.lock:
+                self.failure_count += 1
+            # 4xx（限流除外）是请求本身的问题，不代表服务不可用
+            status = e.response.status_code if e.response is not None else 0
+            if status == 429 or status >= 500:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            raise
+        except requests.exceptions.Timeout:
+            # 超时的真实耗时未知（至少为当前超时），按当前超时记录一个截断样本
+            tracker.record(max(time.time() - start, timeout))
+            with self.lock:
+                self.failure_count += 1
+            self.breaker.record_failure()
+            raise
+        except requests.exceptions.RequestException:
+            tracker.record(time.time() - start)
+            with self.lock:
+                self.failure_count += 1
+            self.breaker.record_failure()
+            raise
+
+        self.breaker.record_success()
+        tracker.record(time.time() - start)
+
+        result = response.json()
+        content = result['choices'][0]['message']['content'].strip()
+
+        # 记录用量（接口未返回 usage 时按文本长度估算；对冲请求同样计费）
+        usage = result.get('usage') or {}
+        get_ai_budget().record(
+            usage.get('prompt_tokens') or estimate_tokens(prompt),
+            usage.get('completion_tokens') or estimate_tokens(content)
+        )
+        return content
+
+    def record_win(self):
+        """记录一次采用该接口返回的结果"""
+        with self.lock:
+            self.win_count += 1
+
+    def get_stats(self) -> Dict:
+        """获取该接口的延迟和胜出统计"""
+        p90 = [tracker.get_percentile(90) for tracker in self.latency.values() if tracker.samples]
+        with self.lock:
+            request_count, win_count, failure_count = self.request_count, self.win_count, self.failure_count
+        return {
+            "name": self.name,
+            "request_count": request_count,
+            "win_count": win_count,
+            "failure_count": failure_count,
+            "win_rate": (win_count / request_count) * 100 if request_count else 0.0,
+            "p90": max(p90) if p90 else None,
+            "state": self.breaker.state,
+        }
+
+
+class AIClient:
+    """OpenAI 兼容的对话补全客户端（可配置多个接口）"""
+
+    def __init__(self):
+        """初始化 AI 客户端"""
+        self.provider = config.get_ai_provider()
+        timeout = config.get_ai_timeout()
+        adaptive_timeout = config.get_ai_adaptive_timeout()
+        circuit_breaker = config.get_ai_circuit_breaker()
+        self.endpoints: List[AIEndpoint] = [
+            AIEndpoint(
+                timeout=timeout,
+                adaptive_timeout=adaptive_timeout,
+                circuit_breaker=circuit_breaker,
+                **endpoint
+            )
+            for endpoint in config.get_ai_endpoints()
+            if endpoint.get('api_key')
+        ]
+        self.hedge = config.get_ai_hedge()
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+        # 统计（AI 执行器和对冲线程池会并发调用 chat，计数需要加锁）
+        self.lock = threading.Lock()
+        self.hedge_count = 0
+        self.failover_count = 0
+        self.rejected_count = 0
+
+    def is_available(self) -> bool:
+        """是否可以调用 OpenAI 兼容接口（未配置或全部熔断中时不可用）"""
+        return self.provider == 'openai' and self.is_healthy()
+
+    def is_healthy(self) -> bool:
+        """是否至少有一个接口未熔断"""
+        return any(not endpoint.breaker.is_open() for endpoint in self.endpoints)
+
+    def _pick_order(self) -> List[AIEndpoint]:
+        """
+        确定本次请求尝试接口的顺序
+
+        未熔断的接口中按权重随机选出首选，其余按权重从高到低作为对冲和切换备选
+        """
+        healthy = [endpoint for endpoint in self.endpoints if not endpoint.breaker.is_open()]
+        if len(healthy) <= 1:
+            return healthy
+        first = random.choices(healthy, weights=[max(endpoint.weight, 0.001) for endpoint in healthy])[0]
+        rest = sorted((endpoint for endpoint in healthy if endpoint is not first), key=lambda e: -e.weight)
+        return [first] + rest
+
+    def chat(self, prompt: str, max_tokens: int, temperature: float = 0.7) -> str:
+        """
+        发送单轮对话请求
+
+        Args:
+            prompt: 提示词
+            max_tokens: 最大输出 token 数
+            temperature: 采样温度
+
+        Returns:
+            模型返回的文本（已去除首尾空白）
+
+        Raises:
+            AIUnavailableError: 所有接口都熔断中，请求未发出
+        """
+        return self.chat_with_source(prompt, max_tokens, temperature)[0]
+
+    def chat_with_source(self, prompt: str, max_tokens: int, temperature: float = 0.7) -> Tuple[str, AIEndpoint]:
+        """
+        发送单轮对话请求，同时返回实际应答的接口（对冲或切换后可能不是首选接口）
+
+        Args:
+            prompt: 提示词
+            max_tokens: 最大输出 token 数
+            temperature: 采样温度
+
+        Returns:
+            Tuple[str, AIEndpoint]: (模型返回的文本, 应答的接口)
+
+        Raises:
+            AIUnavailableError: 所有接口都熔断中，请求未发出
+        """
+        candidates = self._pick_order()
+        if not candidates:
+            with self.lock:
+                self.rejected_count += 1
+            raise AIUnavailableError("AI 服务暂不可用（熔断中），跳过")
+
+        last_error: Optional[Exception] = None
+        position = 0
+        while position < len(candidates):
+            primary = candidates[position]
+            backup = candidates[position + 1] if position + 1 < len(candidates) else None
+            content, winner, tried, error = self._race(primary, backup, prompt, max_tokens, temperature)
+            if error is None:
+                return content, winner
+            last_error = error
+            position += tried
+            if position < len(candidates):
+                with self.lock:
+                    self.failover_count += 1
+        raise last_error
+
+    def _race(
+        self,
+        primary: AIEndpoint,
+        backup: Optional[AIEndpoint],
+        prompt: str,
+        max_tokens: int,
+        temperature: float
+    ) -> Tuple[Optional[str], Optional[AIEndpoint], int, Optional[Exception]]:
+        """
+        向首选接口发送请求，超过其近期 p90 耗时仍未返回时向备选接口发送对冲请求，
+        采用先成功返回的结果
+
+        Returns:
+            Tuple: (返回文本, 应答的接口, 尝试的接口数, 失败时的异常)
+        """
+        delay = primary.get_hedge_delay(max_tokens, self.hedge.get('percentile', 90))
+        if backup is None or not self.hedge.get('enabled', True) or delay is None:
+            try:
+                content = primary.chat(prompt, max_tokens, temperature)
+                primary.record_win()
+                return content, primary, 1, None
+            except Exception as e:
+                return None, None, 1, e
+
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=max(config.get_ai_concurrency(), 1) * 2,
+                thread_name_prefix="ai-hedge"
+            )
+
+        first = self._pool.submit(primary.chat, prompt, max_tokens, temperature)
+        try:
+            content = first.result(timeout=delay)
+            primary.record_win()
+            return content, primary, 1, None
+        except FutureTimeoutError:
+            pass
+        except Exception as e:
+            # 首选接口很快失败：交给调用方切换到下一个接口
+            return None, None, 1, e
+
+        # 首选接口较慢：对冲请求，采用先成功的结果（落败的请求在后台结束）
+        with self.lock:
+            self.hedge_count += 1
+        futures = {first: primary, self._pool.submit(backup.chat, prompt, max_tokens, temperature): backup}
+        pending = set(futures)
+        error: Optional[Exception] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    winner = futures[future]
+                    winner.record_win()
+                    return future.result(), winner, 2, None
+                error = future.exception()
+        return None, None, 2, error
+
+    def cache_sources(self) -> List[Tuple[str, str]]:
+        """获取可能应答的 (API 地址, 模型)，查询 AI 结果缓存时使用"""
+        return [(endpoint.api_base, endpoint.model) for endpoint in self.endpoints]
+
+    def get_stats(self) -> Dict:
+        """获取熔断、对冲和各接口统计"""
+        endpoint_stats = [endpoint.get_stats() for endpoint in self.endpoints]
+        p95 = [
+            tracker.get_percentile(95)
+            for endpoint in self.endpoints for tracker in endpoint.latency.values() if tracker.samples
+        ]
+        with self.lock:
+            hedge_count, failover_count, rejected_count = self.hedge_count, self.failover_count, self.rejected_count
+        return {
+            "trip_count": sum(endpoint.breaker.trip_count for endpoint in self.endpoints),
+            "rejected_count": rejected_count + sum(endpoint.breaker.rejected_count for endpoint in self.endpoints),
+            "max_p95": max(p95) if p95 else None,
+            "hedge_count": hedge_count,
+            "failover_count": failover_count,
+            "endpoints": endpoint_stats,
+        }
+
+
+# 共享的 AI 客户端实例（延迟创建）
+_client: Optional[AIClient] = None
+# 工作线程可能同时首次获取，创建时加锁
+_lock = threading.Lock()
+
+
+def get_ai_client() -> AIClient:
+    """获取共享的 AI 客户端"""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = AIClient()
+    return _client
@@ -0,0 +1,425 @@
+"""
+AI 合并生成器
+一次 AI 调用同时生成标签和摘要，划线内容只发送一次
+"""
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+from .ai_client import AIEndpoint, get_ai_client
+from .ai_executor import get_ai_executor
+from .ai_summary import AISummaryGenerator
+from .ai_tags import AITagGenerator
+from .config_manager import config
+
+# 合并调用的输出格式要求（追加在摘要提示词和标签要求之后）
+ENRICH_OUTPUT_INSTRUCTIONS = """只返回一个 JSON 对象，不要其他内容，格式如下：
+{"tags": ["#标签1", "#标签2"], "summary": "一句话概述"}"""
+
+# 批量调用的输出格式要求
+BATCH_OUTPUT_INSTRUCTIONS = """只返回一个 JSON 数组，每条划线一个元素，不要其他内容，格式如下：
+[{"index": 1, "tags": ["#标签1", "#标签2"], "summary": "一句话概述"}]"""
+
+# ai.tag_prompt 中没有可用的要求时使用的标签要求
+DEFAULT_TAG_INSTRUCTIONS = "生成主题标签：简洁、准确，优先使用中文，每个标签以#开头"
+
+_CODE_FENCE = re.compile(r"^```[a-zA-Z]*\s*|\s*```$")
+_HASHTAG = re.compile(r"#[^\s#,，、]+")
+_SUMMARY_LINE = re.compile(r"^\s*(?:摘要|概述|总结|summary)\s*[:：]\s*(.+)$", re.IGNORECASE)
+_PLACEHOLDER = re.compile(r"\{\w+\}")
+
+
+def tag_instructions() -> str:
+    """
+    合并 / 批量调用中的标签要求，与单独调用保持一致
+
+    取 ai.tag_prompt 中第一个占位符（书名、划线等）之前的要求部分，
+    去掉与 JSON 输出冲突的"只返回……"要求，并注明 tags.max_ai_tags 的数量上限
+
+    Returns:
+        标签要求文本
+    """
+    lines = []
+    for line in config.get('ai.tag_prompt', '').splitlines():
+        if _PLACEHOLDER.search(line):
+            break
+        if line.strip() and '只返回' not in line:
+            lines.append(line.strip())
+    instructions = "\n".join(lines) or DEFAULT_TAG_INSTRUCTIONS
+    return f"{instructions}\n标签数量不超过 {config.settings.max_ai_tags} 个"
+
+
+class AIEnrichmentGenerator:
+    """AI 合并生成器（标签 + 摘要）"""
+
+    def __init__(
+        self,
+        tag_generator: Optional[AITagGenerator] = None,
+        summary_generator: Optional[AISummaryGenerator] = None
+    ):
+        """
+        初始化合并生成器
+
+        Args:
+            tag_generator: AI 标签生成器（合并调用失败时回退使用）
+            summary_generator: AI 摘要生成器（合并调用失败时回退使用）
+        """
+        self.tag_generator = tag_generator or AITagGenerator()
+        self.summary_generator = summary_generator or AISummaryGenerator()
+
+        # 合并 / 批量调用生成的结果按各自的提示词缓存，单独调用时同样可以复用
+        shared_prompts = [self.enrich_prompt_template(), self.batch_prompt_template()]
+        self.tag_generator.shared_prompt_templates = shared_prompts
+        self.summary_generator.shared_prompt_templates = shared_prompts
+
+    def is_enabled(self) -> bool:
+        """AI 标签和摘要都启用、且配置了合并调用时启用"""
+        return (
+            config.settings.combine_ai_enrichment
+            and self.tag_generator.is_enabled()
+            and self.tag_generator.provider == 'openai'
+            and self.summary_generator.uses_ai()
+        )
+
+    @staticmethod
+    def enrich_prompt_template() -> str:
+        """合并调用实际使用的提示词模板（用于缓存键）"""
+        return config.get('ai.enrich_prompt') or (
+            f"{config.get('ai.summary_prompt', '')}\x1f{tag_instructions()}\x1f{ENRICH_OUTPUT_INSTRUCTIONS}"
+        )
+
+    @staticmethod
+    def batch_prompt_template() -> str:
+        """批量调用实际使用的提示词模板（用于缓存键）"""
+        return f"{config.get('ai.summary_prompt', '')}\x1f{tag_instructions()}\x1f{BATCH_OUTPUT_INSTRUCTIONS}"
+
+    def build_prompt(self, book_title: str, author: str, highlight_text: str) -> str:
+        """
+        构建合并提示词
+
+        优先使用 ai.enrich_prompt；未配置时在摘要提示词后追加标签要求（取自 ai.tag_prompt）
+        和 JSON 格式要求，保留用户自定义的摘要和标签风格
+        """
+        template = config.get('ai.enrich_prompt')
+        if template:
+            return template.format(
+                book_title=book_title,
+                author=author,
+                highlight_text=highlight_text
+            )
+
+        summary_prompt = config.get('ai.summary_prompt', '').format(
+            highlight_text=highlight_text,
+            book_title=book_title or '',
+            author=author or ''
+        )
+        return (
+            f"{summary_prompt}\n\n书名：{book_title}\n作者：{author}\n\n"
+            f"此外，请按以下要求为这段划线生成标签：\n{tag_instructions()}\n\n{ENRICH_OUTPUT_INSTRUCTIONS}"
+        )
+
+    def enrich(
+        self,
+        book_title: str,
+        author: str,
+        highlight_text: str
+    ) -> Tuple[List[str], Optional[str]]:
+        """
+        生成标签和摘要
+
+        划线不够长、不需要摘要时只生成标签；合并调用失败或结果缺项时，
+        对缺少的部分回退到单独调用
+
+        Args:
+            book_title: 书名
+            author: 作者
+            highlight_text: 划线内容
+
+        Returns:
+            Tuple[List[str], Optional[str]]: (标签列表, 摘要)
+        """
+        if not self.summary_generator.should_summarize(highlight_text):
+            return self.tag_generator.generate_tags(book_title, author, highlight_text), None
+
+        # 缓存中已有（或可从相似划线复用）的部分不再生成；两项都缺时才合并调用
+        tags = self.tag_generator.lookup_tags(highlight_text)
+        summary = self.summary_generator.get_cached_summary(highlight_text)
+        if tags is None and summary is None:
+            endpoint = None
+            try:
+                content, endpoint = get_ai_client().chat_with_source(
+                    self.build_prompt(book_title, author, highlight_text),
+                    max_tokens=250
+                )
+                tags, summary = self.parse_enrichment(content)
+            except Exception as e:
+                print(f"   ⚠️  AI 合并调用失败，改为分别调用: {e}")
+            prompt_template = self.enrich_prompt_template()
+            self.tag_generator.cache_tags(highlight_text, tags, endpoint, prompt_template)
+            self.summary_generator.cache_summary(highlight_text, summary, endpoint, prompt_template)
+
+        if tags is None:
+            tags = self.tag_generator.generate_tags(book_title, author, highlight_text, use_cache=False)
+        if summary is None:
+            summary = self.summary_generator.generate_summary(highlight_text, book_title, author, use_cache=False)
+
+        return tags[:config.settings.max_ai_tags], summary
+
+    def enrich_one(
+        self,
+        book_title: str,
+        author: str,
+        highlight_text: str
+    ) -> Tuple[List[str], Optional[str]]:
+        """单条生成：启用合并调用时一次生成，否则分别调用"""
+        if self.is_enabled():
+            return self.enrich(book_title, author, highlight_text)
+        tags = self.tag_generator.generate_tags(book_title, author, highlight_text) if self.tag_generator.is_enabled() else []
+        summary = self.summary_generator.generate_summary(highlight_text, book_title, author) if self.summary_generator.is_enabled() else None
+        return tags, summary
+
+    def uses_ai(self) -> bool:
+        """标签或摘要是否需要调用 AI 接口（都关闭或都在本地生成时无需批量、并发调用）"""
+        if not get_ai_client().is_available():
+            return False
+        tags_enabled = self.tag_generator.is_enabled() and self.tag_generator.provider == 'openai'
+        return tags_enabled or self.summary_generator.uses_ai()
+
+    def supports_batch(self) -> bool:
+        """是否可以把多条划线打包为一次 AI 调用"""
+        return config.settings.ai_batch_size > 1 and self.uses_ai()
+
+    def enrich_batch(
+        self,
+        book_title: str,
+        author: str,
+        highlight_texts: List[str]
+    ) -> List[Tuple[List[str], Optional[str]]]:
+        """
+        批量生成同一本书多条划线的标签和摘要
+
+        缓存中已有结果的划线直接使用缓存；其余每 ai.batch_size 条划线共用书名、
+        作者上下文打包为一次调用，按序号返回 JSON，多个批次并发请求。结果缺失的划线
+        先重新打包重试一次，仍缺失的再逐条生成。
+
+        Args:
+            book_title: 书名
+            author: 作者
+            highlight_texts: 划线内容列表
+
+        Returns:
+            List[Tuple[List[str], Optional[str]]]: 与输入一一对应的 (标签列表, 摘要)
+        """
+        want_tags = self.tag_generator.is_enabled() and self.tag_generator.provider == 'openai'
+        want_summary = [
+            self.summary_generator.uses_ai() and self.summary_generator.should_summarize(text)
+            for text in highlight_texts
+        ]
+        settings = config.settings
+        max_tags = settings.max_ai_tags
+        batch_size = settings.ai_batch_size
+
+        results: List[Tuple[List[str], Optional[str]]] = [([], None)] * len(highlight_texts)
+        pending = []
+        for index, text in enumerate(highlight_texts):
+            if not (want_tags or want_summary[index]):
+                continue
+            tags = self.tag_generator.lookup_tags(text) if want_tags else []
+            summary = self.summary_generator.get_cached_summary(text) if want_summary[index] else None
+            if tags is None or (want_summary[index] and summary is None):
+                pending.append(index)
+            else:
+                results[index] = (tags, summary)
+
+        def request(chunk: List[int]) -> Tuple[Dict[int, Tuple[Optional[List[str]], Optional[str]]], Optional[AIEndpoint]]:
+            try:
+                return self._request_batch(
+                    book_title, author,
+                    [(index, highlight_texts[index], want_summary[index]) for index in chunk],
+                    want_tags
+                )
+            except Exception as e:
+                print(f"   ⚠️  AI 批量调用失败: {e}")
+                return {}, None
+
+        executor = get_ai_executor()
+        prompt_template = self.batch_prompt_template()
+
+        # 首次批量请求 + 对缺失项重试一次
+        for _ in range(2):
+            missing = []
+            chunks = [pending[start:start + batch_size] for start in range(0, len(pending), batch_size)]
+            for chunk, (parsed, endpoint) in zip(chunks, executor.map(request, chunks)):
+                for index in chunk:
+                    tags, summary = parsed.get(index, (None, None))
+                    if (want_tags and tags is None) or (want_summary[index] and not summary):
+                        missing.append(index)
+                        continue
+                    if want_tags:
+                        self.tag_generator.cache_tags(highlight_texts[index], tags, endpoint, prompt_template)
+                    if want_summary[index]:
+                        self.summary_generator.cache_summary(highlight_texts[index], summary, endpoint, prompt_template)
+                    results[index] = ((tags or [])[:max_tags], summary if want_summary[index] else None)
+            pending = missing
+            if not pending:
+                break
+
+        # 仍缺失的划线逐条生成
+        fallback = executor.map(
+            lambda index: self.enrich_one(book_title, author, highlight_texts[index]),
+            pending
+        )
+        for index, result in zip(pending, fallback):
+            results[index] = result
+
+        # 本地摘要不占用 AI 调用，直接在本地生成
+        if self.summary_generator.is_local():
+            results = [
+                (tags, self.summary_generator.generate_summary(text))
+                for (tags, _), text in zip(results, highlight_texts)
+            ]
+
+        return results
+
+    def _request_batch(
+        self,
+        book_title: str,
+        author: str,
+        items: List[Tuple[int, str, bool]],
+        want_tags: bool
+    ) -> Tuple[Dict[int, Tuple[Optional[List[str]], Optional[str]]], AIEndpoint]:
+        """
+        发送一次批量请求
+
+        Args:
+            book_title: 书名
+            author: 作者
+            items: [(原始序号, 划线内容, 是否需要摘要)]
+            want_tags: 是否需要标签
+
+        Returns:
+            Tuple: ({原始序号: (标签, 摘要)}, 实际应答的接口)
+        """
+        any_summary = any(need_summary for _, _, need_summary in items)
+
+        parts = []
+        if any_summary:
+            parts.append(config.get('ai.summary_prompt', '').format(
+                highlight_text="（见下方标注【需要摘要】的划线）",
+                book_title=book_title or '',
+                author=author or ''
+            ))
+        parts.append(f"以下是《{book_title}》（{author}）中的 {len(items)} 条划线，请逐条处理：")
+        if want_tags:
+            parts.append(f"- tags：按以下要求生成标签\n{tag_instructions()}")
+        if any_summary:
+            parts.append("- summary：只为标注【需要摘要】的划线按上面的要求写一句话概述，其余填空字符串")
+        for number, (_, text, need_summary) in enumerate(items, 1):
+            marker = "【需要摘要】" if need_summary else ""
+            parts.append(f"[{number}]{marker} {text}")
+        parts.append(BATCH_OUTPUT_INSTRUCTIONS)
+
+        content, endpoint = get_ai_client().chat_with_source(
+            "\n\n".join(parts),
+            max_tokens=100 + 150 * len(items)
+        )
+        results = {
+            items[number - 1][0]: parsed
+            for number, parsed in self.parse_batch(content).items()
+            if 1 <= number <= len(items)
+        }
+        return results, endpoint
+
+    @staticmethod
+    def parse_batch(content: str) -> Dict[int, Tuple[Optional[List[str]], Optional[str]]]:
+        """
+        解析批量调用的返回内容
+
+        Args:
+            content: AI 返回的文本
+
+        Returns:
+            Dict[int, Tuple]: 序号（从 1 开始）-> (标签, 摘要)
+        """
+        text = _CODE_FENCE.sub('', content.strip())
+        data = _extract_json(text, '[', ']')
+        if isinstance(data, dict):
+            data = data.get('items') or data.get('results')
+        if not isinstance(data, list):
+            return {}
+
+        parsed = {}
+        for number, element in enumerate(data, 1):
+            if not isinstance(element, dict):
+                continue
+            try:
+                index = int(element.get('index', number))
+            except (TypeError, ValueError):
+                index = number
+            summary = element.get('summary')
+            summary = str(summary).strip() if summary else None
+            parsed[index] = (_normalize_tags(element.get('tags')), summary or None)
+        return parsed
+
+    @staticmethod
+    def parse_enrichment(content: str) -> Tuple[Optional[List[str]], Optional[str]]:
+        """
+        解析合并调用的返回内容
+
+        支持纯 JSON、代码块包裹的 JSON、夹杂说明文字的 JSON，
+        以及"标签：… / 摘要：…"形式的纯文本
+
+        Args:
+            content: AI 返回的文本
+
+        Returns:
+            Tuple[Optional[List[str]], Optional[str]]: (标签, 摘要)，缺少的部分为 None
+        """
+        text = _CODE_FENCE.sub('', content.strip())
+
+        data = _extract_json(text, '{', '}')
+        if isinstance(data, dict):
+            tags = _normalize_tags(data.get('tags'))
+            summary = data.get('summary')
+            summary = str(summary).strip() if summary else None
+            return tags, summary or None
+
+        # 非 JSON：逐行查找标签和摘要
+        tags = []
+        summary = None
+        for line in text.split('\n'):
+            match = _SUMMARY_LINE.match(line)
+            if match:
+                summary = match.group(1).strip()
+            else:
+                tags.extend(_HASHTAG.findall(line))
+        return (tags or None), summary
+
+
+def _extract_json(text: str, open_char: str, close_char: str):
+    """从文本中提取 JSON（对象或数组），失败返回 None"""
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    start, end = text.find(open_char), text.rfind(close_char)
+    if 0 <= start < end:
+        try:
+            return json.loads(text[start:end + 1])
+        except ValueError:
+            pass
+    return None
+
+
+def _normalize_tags(value) -> Optional[List[str]]:
+    """把 AI 返回的标签统一为 ['#标签', ...]"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = re.split(r"[\s,，、]+", value)
+    tags = []
+    for tag in value:
+        tag = str(tag).strip().strip('"\'').replace(' ', '')
+        if not tag or tag == '#':
+            continue
+        tags.append(tag if tag.startswith('#') else f"#{tag}")
+    return tags
@@ -0,0 +1,166 @@
+"""
+AI 并发执行器
+多个 AI 请求并行发出，同时遵守每分钟请求数和每分钟 token 数限制；
+达到限制时排队等待而不是报错
+"""
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, TypeVar
+from .config_manager import config
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+# 中日韩文字（含全角标点），常见分词器下约 1~1.5 个 token/字
+_CJK_CHAR = re.compile(r"[　-〿㐀-䶿一-鿿豈-﫿＀-￯]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本的 token 数
+
+    中文按每字 1.5 个 token、其余字符按每 4 个字符 1 个 token 估算，宁多勿少
+
+    Args:
+        text: 文本内容
+
+    Returns:
+        估算的 token 数
+    """
+    if not text:
+        return 0
+    cjk_count = len(_CJK_CHAR.findall(text))
+    other_count = len(text) - cjk_count
+    return int(cjk_count * 1.5 + other_count / 4) + 1
+
+
+class RequestBudget:
+    """每分钟请求数 / token 数预算（滑动窗口），线程安全"""
+
+    WINDOW = 60.0
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        """
+        初始化预算
+
+        Args:
+            requests_per_minute: 每分钟最多请求数（0 表示不限制）
+            tokens_per_minute: 每分钟最多 token 数（0 表示不限制）
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.window = deque()  # [(时间戳, token 数)]
+        self.window_tokens = 0
+        self.lock = threading.Lock()
+
+        # 统计
+        self.queued_count = 0
+        self.total_wait = 0.0
+
+    def _expire(self, now: float):
+        """移除窗口外的记录"""
+        while self.window and now - self.window[0][0] >= self.WINDOW:
+            _, tokens = self.window.popleft()
+            self.window_tokens -= tokens
+
+    def _fits(self, tokens: int) -> bool:
+        """当前窗口是否还能容纳一次请求"""
+        if self.requests_per_minute > 0 and len(self.window) >= self.requests_per_minute:
+            return False
+        # 单次请求超过整个 token 预算时，等窗口清空后放行，避免永远等待
+        if self.tokens_per_minute > 0 and self.window and self.window_tokens + tokens > self.tokens_per_minute:
+            return False
+        return True
+
+    def acquire(self, tokens: int):
+        """
+        申请一次请求的预算，超出限制时阻塞等待
+
+        Args:
+            tokens: 本次请求预计消耗的 token 数（输入 + 最大输出）
+        """
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.time()
+                self._expire(now)
+                if self._fits(tokens):
+                    self.window.append((now, tokens))
+                    self.window_tokens += tokens
+                    if waited > 0:
+                        self.queued_count += 1
+                        self.total_wait += waited
+                    return
+                wait = self.window[0][0] + self.WINDOW - now
+            wait = min(max(wait, 0.05), self.WINDOW)
+            time.sleep(wait)
+            waited += wait
+
+    def get_stats(self) -> Dict:
+        """获取排队统计"""
+        return {
+            "queued_count": self.queued_count,
+            "total_wait": self.total_wait,
+        }
+
+
+class AIExecutor:
+    """AI 请求并发执行器"""
+
+    def __init__(self, max_workers: int = 4):
+        """
+        初始化执行器
+
+        Args:
+            max_workers: 最多同时进行的 AI 请求数（1 表示逐个执行）
+        """
+        self.max_workers = max(int(max_workers), 1)
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def map(self, func: Callable[[T], R], items: Iterable[T]) -> List[R]:
+        """
+        并发执行并按输入顺序返回结果
+
+        Args:
+            func: 处理单个元素的函数（异常会在取结果时抛出）
+            items: 待处理元素
+
+        Returns:
+            与输入一一对应的结果列表
+        """
+        items = list(items)
+        if self.max_workers <= 1 or len(items) <= 1:
+            return [func(item) for item in items]
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ai")
+        return list(self._pool.map(func, items))
+
+
+# 共享的执行器和预算实例（延迟创建）
+_executor: Optional[AIExecutor] = None
+_budget: Optional[RequestBudget] = None
+# 工作线程可能同时首次获取，创建时加锁
+_lock = threading.Lock()
+
+
+def get_ai_executor() -> AIExecutor:
+    """获取共享的 AI 并发执行器"""
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = AIExecutor(config.get_ai_concurrency())
+    return _executor
+
+
+def get_request_budget() -> RequestBudget:
+    """获取共享的 AI 请求预算"""
+    global _budget
+    if _budget is None:
+        with _lock:
+            if _budget is None:
+                _budget = RequestBudget(**config.get_ai_rate_limit())
+    return _budget
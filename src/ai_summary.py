@@ -1,11 +1,12 @@
 """
 AI 摘要生成器
-为长划线生成一句话摘要
+为长划线生成一句话摘要（OpenAI 兼容接口，或本地抽取式摘要）
 """
-import os
-import requests
-from typing import Optional
+from typing import List, Optional, Tuple
+from .ai_cache import AICache, get_ai_cache
+from .ai_client import AIEndpoint, get_ai_client
 from .config_manager import config
+from .local_summary import LocalSummarizer
 
 
 class AISummaryGenerator:
@@ -19,13 +20,30 @@ class AISummaryGenerator:
         self.model = config.get_ai_model()
         
         # 摘要启用阈值（字符数）
-        self.min_length = config.get('ai.summary_min_length', 100)
+        self.min_length = config.get_ai_summary_min_length()
+
+        # 摘要提供方：openai 或 local（本地抽取式摘要，不需要网络）
+        self.summary_provider = config.get_ai_summary_provider()
+        self.local_summarizer = LocalSummarizer(config.get_local_summary_max_length())
+
+        # 合并 / 批量调用的提示词（由 AIEnrichmentGenerator 设置），其生成的摘要同样可以复用
+        self.shared_prompt_templates: List[str] = []
 
     def is_enabled(self) -> bool:
         """检查 AI 摘要是否启用"""
-        enable_summary = config.get('ai.enable_summary', False, env_key='ENABLE_AI_SUMMARY')
+        enable_summary = config.settings.enable_ai_summary
+        if self.is_local():
+            return enable_summary
         return enable_summary and self.provider == 'openai' and bool(self.api_key)
 
+    def is_local(self) -> bool:
+        """是否使用本地摘要"""
+        return self.summary_provider == 'local'
+
+    def uses_ai(self) -> bool:
+        """摘要是否需要调用 AI 接口（可与标签合并或批量调用）"""
+        return self.is_enabled() and not self.is_local()
+
     def should_summarize(self, text: str) -> bool:
         """
         判断是否需要生成摘要
@@ -38,11 +56,73 @@ class AISummaryGenerator:
         """
         return self.is_enabled() and len(text) >= self.min_length
 
+    def cache_key(self, highlight_text: str, endpoint: AIEndpoint, prompt_template: Optional[str] = None) -> str:
+        """
+        获取写入缓存使用的键
+
+        Args:
+            highlight_text: 划线内容
+            endpoint: 实际应答的接口
+            prompt_template: 实际使用的提示词模板（默认为 ai.summary_prompt）
+
+        Returns:
+            缓存键
+        """
+        if prompt_template is None:
+            prompt_template = config.get('ai.summary_prompt', '')
+        return AICache.make_key(
+            'summary', self.provider, endpoint.api_base, endpoint.model,
+            prompt_template, highlight_text
+        )
+
+    def cache_keys(self, highlight_text: str) -> List[str]:
+        """获取查询缓存使用的键（任一配置的接口、任一提示词生成的摘要都可复用）"""
+        return AICache.make_keys(
+            'summary', self.provider, get_ai_client().cache_sources(),
+            [config.get('ai.summary_prompt', '')] + self.shared_prompt_templates, highlight_text
+        )
+
+    def get_cached_summary(self, highlight_text: str) -> Optional[str]:
+        """
+        读取缓存的摘要
+
+        Args:
+            highlight_text: 划线内容
+
+        Returns:
+            摘要文本，未命中返回 None
+        """
+        return get_ai_cache().get_first(self.cache_keys(highlight_text))
+
+    def has_cached_summary(self, highlight_text: str) -> bool:
+        """缓存中是否已有该划线的摘要（不计入命中统计）"""
+        return get_ai_cache().contains_any(self.cache_keys(highlight_text))
+
+    def cache_summary(
+        self,
+        highlight_text: str,
+        summary: Optional[str],
+        endpoint: Optional[AIEndpoint],
+        prompt_template: Optional[str] = None
+    ):
+        """
+        把 AI 生成的摘要写入缓存（空结果、应答接口未知时不缓存）
+
+        Args:
+            highlight_text: 划线内容
+            summary: 摘要
+            endpoint: 实际应答的接口
+            prompt_template: 实际使用的提示词模板（默认为 ai.summary_prompt）
+        """
+        if summary and endpoint is not None:
+            get_ai_cache().set(self.cache_key(highlight_text, endpoint, prompt_template), summary)
+
     def generate_summary(
         self,
         highlight_text: str,
         book_title: Optional[str] = None,
-        author: Optional[str] = None
+        author: Optional[str] = None,
+        use_cache: bool = True
     ) -> Optional[str]:
         """
         生成摘要
@@ -51,6 +131,7 @@ class AISummaryGenerator:
             highlight_text: 划线内容
             book_title: 书名（可选）
             author: 作者（可选）
+            use_cache: 是否先查询缓存（调用方已查询过时传 False）
             
         Returns:
             摘要文本，失败返回None
@@ -58,8 +139,16 @@ class AISummaryGenerator:
         if not self.should_summarize(highlight_text):
             return None
 
+        if self.is_local():
+            return self.local_summarizer.summarize(highlight_text)
+
         try:
-            return self._generate_with_openai(highlight_text, book_title, author)
+            cached = self.get_cached_summary(highlight_text) if use_cache else None
+            if cached is not None:
+                return cached
+            summary, endpoint = self._generate_with_openai(highlight_text, book_title, author)
+            self.cache_summary(highlight_text, summary, endpoint)
+            return summary
         except Exception as e:
             print(f"   ⚠️  AI 摘要生成失败: {e}")
             return None
@@ -69,10 +158,10 @@ class AISummaryGenerator:
         highlight_text: str,
         book_title: Optional[str] = None,
         author: Optional[str] = None
-    ) -> Optional[str]:
-        """使用 OpenAI 格式的 API 生成摘要"""
+    ) -> Tuple[Optional[str], Optional[AIEndpoint]]:
+        """使用 OpenAI 格式的 API 生成摘要，同时返回实际应答的接口"""
         if not self.api_key:
-            return None
+            return None, None
 
         # 构建提示词
         prompt = config.get('ai.summary_prompt', '').format(
@@ -82,27 +171,9 @@ class AISummaryGenerator:
         )
 
         # 调用 OpenAI 格式的 API
-        url = f"{self.api_base.rstrip('/')}/chat/completions"
-        headers = {
-            'Authorization': f'Bearer {self.api_key}',
-            'Content-Type': 'application/json'
-        }
-        data = {
-            'model': self.model,
-            'messages': [
-                {'role': 'user', 'content': prompt}
-            ],
-            'temperature': 0.7,
-            'max_tokens': 150
-        }
-
-        response = requests.post(url, headers=headers, json=data, timeout=30)
-        response.raise_for_status()
-
-        result = response.json()
-        summary = result['choices'][0]['message']['content'].strip()
+        summary, endpoint = get_ai_client().chat_with_source(prompt, max_tokens=150)
 
-        return summary if summary else None
+        return (summary if summary else None), endpoint
 
 
 if __name__ == "__main__":
@@ -112,6 +183,7 @@ if __name__ == "__main__":
     generator = AISummaryGenerator()
 
     print(f"AI 提供商: {generator.provider}")
+    print(f"摘要提供方: {generator.summary_provider}")
     print(f"AI 摘要已启用: {generator.is_enabled()}")
     print(f"最小长度: {generator.min_length} 字符\n")
 
@@ -2,10 +2,12 @@
 AI 标签生成器
 支持多种 AI 服务提供商
 """
-import os
-import requests
-from typing import List, Optional
+from typing import List, Optional, Tuple
+from .ai_cache import AICache, get_ai_cache
+from .ai_client import AIEndpoint, get_ai_client
 from .config_manager import config
+from .local_tagger import get_local_tagger
+from .tag_index import get_tag_index
 
 
 class AITagGenerator:
@@ -18,15 +20,101 @@ class AITagGenerator:
         self.api_base = config.get_ai_api_base()
         self.model = config.get_ai_model()
 
+        # 合并 / 批量调用的提示词（由 AIEnrichmentGenerator 设置），其生成的标签同样可以复用
+        self.shared_prompt_templates: List[str] = []
+
     def is_enabled(self) -> bool:
         """检查 AI 标签是否启用"""
-        return config.should_enable_ai_tags() and self.provider != 'none'
+        return config.settings.enable_ai_tags and self.provider != 'none'
+
+    def cache_key(self, highlight_text: str, endpoint: AIEndpoint, prompt_template: Optional[str] = None) -> str:
+        """
+        获取写入缓存使用的键
+
+        Args:
+            highlight_text: 划线内容
+            endpoint: 实际应答的接口
+            prompt_template: 实际使用的提示词模板（默认为 ai.tag_prompt）
+
+        Returns:
+            缓存键
+        """
+        if prompt_template is None:
+            prompt_template = config.get('ai.tag_prompt', '')
+        return AICache.make_key(
+            'tags', self.provider, endpoint.api_base, endpoint.model,
+            prompt_template, highlight_text
+        )
+
+    def cache_keys(self, highlight_text: str) -> List[str]:
+        """获取查询缓存使用的键（任一配置的接口、任一提示词生成的标签都可复用）"""
+        return AICache.make_keys(
+            'tags', self.provider, get_ai_client().cache_sources(),
+            [config.get('ai.tag_prompt', '')] + self.shared_prompt_templates, highlight_text
+        )
+
+    def get_cached_tags(self, highlight_text: str) -> Optional[List[str]]:
+        """
+        读取缓存的标签
+
+        Args:
+            highlight_text: 划线内容
+
+        Returns:
+            标签列表，未命中返回 None
+        """
+        tags = get_ai_cache().get_first(self.cache_keys(highlight_text))
+        return tags[:config.settings.max_ai_tags] if tags is not None else None
+
+    def has_cached_tags(self, highlight_text: str) -> bool:
+        """缓存中是否已有该划线的标签（不计入命中统计）"""
+        return get_ai_cache().contains_any(self.cache_keys(highlight_text))
+
+    def lookup_tags(self, highlight_text: str) -> Optional[List[str]]:
+        """
+        查找无需调用 AI 的标签：先查缓存，再从相似的历史划线中复用
+
+        Args:
+            highlight_text: 划线内容
+
+        Returns:
+            标签列表，都未命中返回 None
+        """
+        tags = self.get_cached_tags(highlight_text)
+        if tags is None:
+            tags = get_tag_index().lookup(highlight_text)
+            if tags is not None:
+                tags = tags[:config.settings.max_ai_tags]
+        return tags
+
+    def cache_tags(
+        self,
+        highlight_text: str,
+        tags: List[str],
+        endpoint: Optional[AIEndpoint],
+        prompt_template: Optional[str] = None
+    ):
+        """
+        把 AI 生成的标签写入缓存（空结果不缓存），同时作为本地标签引擎和复用索引的数据
+
+        Args:
+            highlight_text: 划线内容
+            tags: 标签列表
+            endpoint: 实际应答的接口（未知时不写入缓存）
+            prompt_template: 实际使用的提示词模板（默认为 ai.tag_prompt）
+        """
+        if tags:
+            if endpoint is not None:
+                get_ai_cache().set(self.cache_key(highlight_text, endpoint, prompt_template), tags)
+            get_local_tagger().learn(highlight_text, tags)
+            get_tag_index().add(highlight_text, tags)
 
     def generate_tags(
         self,
         book_title: str,
         author: str,
-        highlight_text: str
+        highlight_text: str,
+        use_cache: bool = True
     ) -> List[str]:
         """
         生成标签
@@ -35,6 +123,7 @@ class AITagGenerator:
             book_title: 书名
             author: 作者
             highlight_text: 划线内容
+            use_cache: 是否先查询缓存和复用索引（调用方已查询过时传 False）
 
         Returns:
             标签列表
@@ -44,7 +133,12 @@ class AITagGenerator:
 
         try:
             if self.provider == 'openai':
-                return self._generate_with_openai(book_title, author, highlight_text)
+                cached = self.lookup_tags(highlight_text) if use_cache else None
+                if cached is not None:
+                    return cached
+                tags, endpoint = self._generate_with_openai(book_title, author, highlight_text)
+                self.cache_tags(highlight_text, tags, endpoint)
+                return tags
             elif self.provider == 'local':
                 return self._generate_with_local(book_title, author, highlight_text)
             else:
@@ -54,16 +148,25 @@ class AITagGenerator:
             print(f"⚠️  AI 标签生成失败: {e}")
             return []
 
-    def _generate_with_openai(
+    def generate_local_tags(
         self,
         book_title: str,
         author: str,
         highlight_text: str
     ) -> List[str]:
-        """使用 OpenAI 格式的 API 生成标签"""
+        """使用本地规则生成标签（不调用 AI，AI 预算不足时使用）"""
+        return self._generate_with_local(book_title, author, highlight_text)
+
+    def _generate_with_openai(
+        self,
+        book_title: str,
+        author: str,
+        highlight_text: str
+    ) -> Tuple[List[str], Optional[AIEndpoint]]:
+        """使用 OpenAI 格式的 API 生成标签，同时返回实际应答的接口"""
         if not self.api_key:
             print("⚠️  未设置 AI API Key")
-            return []
+            return [], None
 
         # 构建提示词
         prompt = config.get('ai.tag_prompt', '').format(
@@ -73,29 +176,11 @@ class AITagGenerator:
         )
 
         # 调用 OpenAI 格式的 API
-        url = f"{self.api_base.rstrip('/')}/chat/completions"
-        headers = {
-            'Authorization': f'Bearer {self.api_key}',
-            'Content-Type': 'application/json'
-        }
-        data = {
-            'model': self.model,
-            'messages': [
-                {'role': 'user', 'content': prompt}
-            ],
-            'temperature': 0.7,
-            'max_tokens': 100
-        }
-
-        response = requests.post(url, headers=headers, json=data, timeout=30)
-        response.raise_for_status()
-
-        result = response.json()
-        content = result['choices'][0]['message']['content'].strip()
+        content, endpoint = get_ai_client().chat_with_source(prompt, max_tokens=100)
 
         # 解析标签
         tags = self._parse_tags(content)
-        return tags[:config.get('tags.max_ai_tags', 3)]
+        return tags[:config.settings.max_ai_tags], endpoint
 
     def _generate_with_local(
         self,
@@ -103,43 +188,12 @@ class AITagGenerator:
         author: str,
         highlight_text: str
     ) -> List[str]:
-        """使用本地规则生成标签（基于关键词匹配）"""
-        tags = []
-
-        # 定义关键词到标签的映射
-        keyword_tags = {
-            '思维': '#思维模型',
-            '认知': '#认知科学',
-            '心理': '#心理学',
-            '效率': '#效率提升',
-            '时间': '#时间管理',
-            '习惯': '#习惯养成',
-            '沟通': '#沟通技巧',
-            '领导': '#领导力',
-            '管理': '#管理',
-            '创新': '#创新思维',
-            '决策': '#决策',
-            '学习': '#学习方法',
-            '成长': '#个人成长',
-            '目标': '#目标管理',
-            '专注': '#专注力',
-            '情绪': '#情绪管理',
-            '关系': '#人际关系',
-            '健康': '#健康',
-            '财富': '#财富',
-            '投资': '#投资理财',
-        }
-
-        # 检查文本中的关键词
-        text = f"{highlight_text} {book_title}".lower()
-
-        for keyword, tag in keyword_tags.items():
-            if keyword in text and tag not in tags:
-                tags.append(tag)
-                if len(tags) >= config.get('tags.max_ai_tags', 3):
-                    break
-
-        return tags
+        """使用本地标签引擎生成标签（从历史 AI 标签和词表中学习，不调用 API）"""
+        return get_local_tagger().tag(
+            highlight_text,
+            book_title=book_title,
+            max_tags=config.settings.max_ai_tags
+        )
 
     def _parse_tags(self, content: str) -> List[str]:
         """
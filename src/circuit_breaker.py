@@ -0,0 +1,149 @@
+"""
+服务健康度
+熔断器（连续失败后暂停调用，冷却后放行一次探测请求）和基于延迟分位数的自适应超时
+"""
+import math
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+# 熔断器状态
+STATE_CLOSED = 'closed'  # 正常
+STATE_OPEN = 'open'  # 熔断中，直接拒绝请求
+STATE_HALF_OPEN = 'half_open'  # 冷却结束，放行一次探测请求
+
+
+class CircuitBreaker:
+    """连续失败熔断器，线程安全"""
+
+    def __init__(self, failure_threshold: int = 3, recovery_time: float = 60):
+        """
+        初始化熔断器
+
+        Args:
+            failure_threshold: 连续失败多少次后熔断（0 表示不熔断）
+            recovery_time: 熔断后多少秒放行探测请求
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.state = STATE_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.lock = threading.Lock()
+
+        # 统计
+        self.trip_count = 0
+        self.rejected_count = 0
+
+    def is_open(self) -> bool:
+        """是否处于熔断中（冷却未结束）"""
+        with self.lock:
+            return self.state == STATE_OPEN and time.time() - self.opened_at < self.recovery_time
+
+    def allow_request(self) -> bool:
+        """
+        是否放行本次请求
+
+        Returns:
+            熔断中返回 False；冷却结束后只放行一次探测请求
+        """
+        with self.lock:
+            if self.state == STATE_OPEN and time.time() - self.opened_at >= self.recovery_time:
+                self.state = STATE_HALF_OPEN
+            if self.state == STATE_CLOSED:
+                return True
+            if self.state == STATE_HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+            self.rejected_count += 1
+            return False
+
+    def record_success(self):
+        """记录一次成功，探测成功时恢复正常"""
+        with self.lock:
+            self.consecutive_failures = 0
+            self.probe_in_flight = False
+            self.state = STATE_CLOSED
+
+    def record_failure(self):
+        """记录一次失败，连续失败达到阈值或探测失败时熔断"""
+        with self.lock:
+            self.consecutive_failures += 1
+            probe_failed = self.state == STATE_HALF_OPEN
+            self.probe_in_flight = False
+            if probe_failed or (0 < self.failure_threshold <= self.consecutive_failures):
+                if self.state != STATE_OPEN:
+                    self.trip_count += 1
+                self.state = STATE_OPEN
+                self.opened_at = time.time()
+
+
+class LatencyTracker:
+    """记录最近请求耗时，按分位数给出超时时间"""
+
+    def __init__(
+        self,
+        max_timeout: float = 30,
+        min_timeout: float = 5,
+        multiplier: float = 2.0,
+        percentile: float = 95,
+        window: int = 50,
+        min_samples: int = 5
+    ):
+        """
+        初始化延迟记录
+
+        Args:
+            max_timeout: 超时上限（样本不足时使用）
+            min_timeout: 超时下限
+            multiplier: 超时 = 分位数耗时 × 倍数
+            percentile: 使用的分位数
+            window: 保留最近多少次耗时
+            min_samples: 至少多少个样本后才自适应
+        """
+        self.max_timeout = max_timeout
+        self.min_timeout = min_timeout
+        self.multiplier = multiplier
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.samples = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def record(self, elapsed: float):
+        """记录一次请求的耗时（秒，超时的请求按当时的超时时间记录）"""
+        with self.lock:
+            self.samples.append(elapsed)
+
+    def get_percentile(self, percentile: Optional[float] = None) -> Optional[float]:
+        """
+        获取耗时分位数
+
+        Args:
+            percentile: 分位数（默认使用初始化时的设置）
+
+        Returns:
+            耗时（秒），没有样本时返回 None
+        """
+        with self.lock:
+            samples = sorted(self.samples)
+        if not samples:
+            return None
+        rank = math.ceil((percentile or self.percentile) / 100 * len(samples)) - 1
+        return samples[min(max(rank, 0), len(samples) - 1)]
+
+    def get_timeout(self) -> float:
+        """获取当前超时时间（样本不足时使用上限）"""
+        if len(self.samples) < self.min_samples:
+            return self.max_timeout
+        return min(max(self.get_percentile() * self.multiplier, self.min_timeout), self.max_timeout)
+
+    def get_stats(self) -> Dict:
+        """获取延迟统计"""
+        return {
+            "samples": len(self.samples),
+            "p50": self.get_percentile(50),
+            "p95": self.get_percentile(95),
+            "timeout": self.get_timeout(),
+        }
@@ -3,29 +3,198 @@
 
 优先级：环境变量 > config.yaml > 默认值
 """
+import copy
+import hashlib
+import json
 import os
-import yaml
-from typing import Dict, Any, Optional
+from types import MappingProxyType
+from typing import Callable, Dict, Any, List, Mapping, NamedTuple, Optional, Set, Tuple
 from pathlib import Path
-from dotenv import load_dotenv
+from .env_loader import load_env
+from .keyword_matcher import KeywordMatcher
 
 # 加载环境变量
-load_dotenv()
+load_env()
+
+# .env 变化时传给重新加载回调的配置段名（环境变量可能覆盖任意配置段）
+ENV_SECTION = '.env'
+
+
+class Settings(NamedTuple):
+    """
+    运行时配置快照（只读）
+
+    启动时按“环境变量 > config.yaml > 默认值”解析一次，各字段的值与对应的
+    ConfigManager getter 完全一致；逐条划线的热路径直接读取属性，不再每次
+    拆分点号路径、查环境变量、解析数字和布尔值
+    """
+
+    ai_provider: str
+    enable_ai_tags: bool
+    enable_ai_summary: bool
+    combine_ai_enrichment: bool
+    ai_batch_size: int
+    max_ai_tags: int
+    add_book_title_tag: bool
+    add_author_tag: bool
+    use_hierarchical_tags: bool
+    default_tags: Tuple[str, ...]
+    category_tags: Mapping[str, Tuple[str, ...]]
+
+    @classmethod
+    def from_config(cls, manager: "ConfigManager") -> "Settings":
+        """
+        从配置管理器解析配置快照
+
+        Args:
+            manager: 配置管理器
+
+        Returns:
+            Settings
+        """
+        categories = manager.get('book_categories', {}) or {}
+        return cls(
+            ai_provider=manager.get_ai_provider(),
+            enable_ai_tags=manager.should_enable_ai_tags(),
+            enable_ai_summary=manager.should_enable_ai_summary(),
+            combine_ai_enrichment=manager.should_combine_ai_enrichment(),
+            ai_batch_size=manager.get_ai_batch_size(),
+            max_ai_tags=manager.get_max_ai_tags(),
+            add_book_title_tag=manager.should_add_book_title_tag(),
+            add_author_tag=manager.should_add_author_tag(),
+            use_hierarchical_tags=manager.get('tags.use_hierarchical_tags', True),
+            default_tags=tuple(manager.get('tags.default', ['#微信读书'])),
+            category_tags=MappingProxyType({
+                name: tuple(category_config.get('tags', []))
+                for name, category_config in categories.items()
+            }),
+        )
 
 
 class ConfigManager:
     """配置管理器"""
 
-    def __init__(self, config_path: str = "config.yaml"):
+    def __init__(
+        self,
+        config_path: str = "config.yaml",
+        env_path: str = ".env",
+        cache_path: Optional[str] = None
+    ):
         """
         初始化配置管理器
 
         Args:
             config_path: 配置文件路径
+            env_path: .env 文件路径（只用于检查是否需要重新加载）
+            cache_path: 解析结果缓存文件路径（默认读取 CONFIG_CACHE_FILE，空字符串表示不缓存）
         """
         self.config_path = config_path
+        self.env_path = env_path
+        if cache_path is None:
+            cache_path = os.getenv('CONFIG_CACHE_FILE', '.config_cache.json')
+        self.cache_path = cache_path
+        self._source_mtimes = self._stat_sources()
         self.config = self.load_config()
 
+        # 书籍分类匹配器（首次使用时构建）和按书籍缓存的分类结果
+        self._category_matcher: Optional[KeywordMatcher] = None
+        self._category_priority: Dict[str, float] = {}
+        self._category_cache: Dict[Any, Optional[str]] = {}
+
+        # 运行时配置快照（首次访问 settings 时解析）
+        self._settings: Optional[Settings] = None
+
+        # 重新加载回调：参数为发生变化的配置段名集合
+        self._reload_listeners: List[Callable[[Set[str]], None]] = []
+
+    @property
+    def settings(self) -> Settings:
+        """运行时配置快照（只读，热路径使用）"""
+        settings = self._settings
+        if settings is None:
+            settings = self._settings = Settings.from_config(self)
+        return settings
+
+    def _stat_sources(self) -> Tuple[Optional[int], Optional[int]]:
+        """获取 config.yaml 和 .env 的修改时间（文件不存在时为 None）"""
+        mtimes = []
+        for path in (self.config_path, self.env_path):
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    def add_reload_listener(self, listener: Callable[[Set[str]], None]):
+        """
+        注册配置重新加载回调，用于清理依赖配置的缓存
+
+        Args:
+            listener: 回调函数，参数为发生变化的配置段名集合
+                     （.env 变化时包含所有配置段和 ENV_SECTION）
+        """
+        self._reload_listeners.append(listener)
+
+    def reload_if_changed(self) -> Set[str]:
+        """
+        config.yaml 或 .env 的修改时间变化时重新加载配置
+
+        新配置解析、生成配置快照都成功后才一起替换；解析失败时保留当前配置。
+        只有内容实际变化的配置段会通知回调。适合在处理两本书之间调用，
+        未变化时只需两次 stat。.env 以覆盖方式重新加载，从中删除的变量不会从环境中移除
+
+        Returns:
+            发生变化的配置段名集合（空集合表示没有变化）
+        """
+        mtimes = self._stat_sources()
+        if mtimes == self._source_mtimes:
+            return set()
+
+        config_changed = mtimes[0] != self._source_mtimes[0]
+        env_changed = mtimes[1] != self._source_mtimes[1]
+        self._source_mtimes = mtimes
+
+        new_config = self.config
+        if config_changed:
+            try:
+                new_config = self.read_config_file() or self.get_default_config()
+                if not isinstance(new_config, dict):
+                    raise ValueError("配置文件顶层必须是映射")
+            except Exception as e:
+                print(f"⚠️  重新加载配置文件失败: {e}，继续使用当前配置")
+                return set()
+
+        if env_changed:
+            load_env(self.env_path, override=True)
+            changed = set(self.config) | set(new_config) | {ENV_SECTION}
+        else:
+            changed = {
+                section for section in set(self.config) | set(new_config)
+                if self.config.get(section) != new_config.get(section)
+            }
+            if not changed:
+                return set()
+
+        # 先用新配置生成快照（校验），成功后再替换
+        staged = copy.copy(self)
+        staged.config = new_config
+        try:
+            settings = Settings.from_config(staged)
+        except Exception as e:
+            print(f"⚠️  新配置无效: {e}，继续使用当前配置")
+            return set()
+
+        self.config, self._settings = new_config, settings
+
+        if 'book_categories' in changed:
+            self._category_matcher = None
+            self._category_priority = {}
+            self._category_cache = {}
+
+        for listener in self._reload_listeners:
+            listener(changed)
+        return changed
+
     def load_config(self) -> Dict[str, Any]:
         """加载配置文件"""
         if not os.path.exists(self.config_path):
@@ -33,13 +202,76 @@ class ConfigManager:
             return self.get_default_config()
 
         try:
-            with open(self.config_path, 'r', encoding='utf-8') as f:
-                config = yaml.safe_load(f)
-                return config or self.get_default_config()
+            return self.read_config_file() or self.get_default_config()
         except Exception as e:
             print(f"⚠️  加载配置文件失败: {e}，使用默认配置")
             return self.get_default_config()
 
+    def read_config_file(self) -> Any:
+        """
+        读取并解析配置文件
+
+        解析结果以 JSON 缓存在 cache_path，按文件修改时间和大小、再按内容哈希校验：
+        文件未变化时不导入也不运行 YAML 解析器（纯 Python 解析约需数十毫秒）；
+        只有修改时间变化、内容相同时（如重新 checkout）按哈希命中
+
+        Returns:
+            解析后的配置
+        """
+        stat = os.stat(self.config_path)
+        path = os.path.abspath(self.config_path)
+        cached = self._load_config_cache()
+        if cached is not None and cached.get('path') == path:
+            if cached.get('mtime_ns') == stat.st_mtime_ns and cached.get('size') == stat.st_size:
+                return cached['config']
+        else:
+            cached = None
+
+        with open(self.config_path, 'rb') as f:
+            raw = f.read()
+        digest = hashlib.sha1(raw).hexdigest()
+
+        if cached is not None and cached.get('sha1') == digest:
+            parsed = cached['config']
+        else:
+            import yaml
+            parsed = yaml.safe_load(raw.decode('utf-8'))
+
+        self._save_config_cache({
+            'path': path,
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'sha1': digest,
+            'config': parsed,
+        })
+        return parsed
+
+    def _load_config_cache(self) -> Optional[Dict[str, Any]]:
+        """读取配置解析缓存（不存在或损坏时返回 None）"""
+        if not self.cache_path:
+            return None
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return cached if isinstance(cached, dict) and 'config' in cached else None
+
+    def _save_config_cache(self, cached: Dict[str, Any]):
+        """写入配置解析缓存（JSON 无法原样表示的配置，如日期、非字符串键，不缓存）"""
+        if not self.cache_path:
+            return
+        try:
+            data = json.dumps(cached, ensure_ascii=False)
+            if json.loads(data)['config'] != cached['config']:
+                return
+            temp_path = f"{self.cache_path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(temp_path, self.cache_path)
+        except (OSError, TypeError, ValueError):
+            pass
+
     def get_default_config(self) -> Dict[str, Any]:
         """获取默认配置"""
         return {
@@ -141,30 +373,43 @@ class ConfigManager:
 
 {tags}"""
 
-    def get_book_category(self, book_title: str, author: str = "") -> Optional[str]:
+    def get_book_category(self, book_title: str, author: str = "", book_id: Optional[str] = None) -> Optional[str]:
         """
         根据书名和作者判断书籍分类
 
+        所有分类的关键词编译为一个匹配器，单次扫描书名和作者；多个分类命中时，
+        命中关键词权重（keyword_weight，默认 1）之和最高的分类胜出，相同时按
+        priority（默认按配置顺序，靠前的优先）决定。结果按 book_id 缓存
+
         Args:
             book_title: 书名
             author: 作者
+            book_id: 书籍ID（提供时缓存分类结果）
 
         Returns:
             分类名称，如果无法分类则返回None
         """
-        categories = self.get('book_categories', {})
-
-        # 检查每个分类的关键词
-        for category_name, category_config in categories.items():
-            keywords = category_config.get('keywords', [])
-
-            # 检查书名或作者是否包含关键词
-            text = f"{book_title} {author}".lower()
-            for keyword in keywords:
-                if keyword.lower() in text:
-                    return category_name
-
-        return None
+        cache_key = book_id or (book_title, author)
+        if cache_key in self._category_cache:
+            return self._category_cache[cache_key]
+
+        if self._category_matcher is None:
+            self._build_category_matcher()
+
+        category = self._category_matcher.best(f"{book_title} {author}", self._category_priority)
+        self._category_cache[cache_key] = category
+        return category
+
+    def _build_category_matcher(self):
+        """根据 book_categories 构建分类关键词匹配器"""
+        categories = self.get('book_categories', {}) or {}
+        entries = []
+        self._category_priority = {}
+        for order, (category_name, category_config) in enumerate(categories.items()):
+            weight = category_config.get('keyword_weight', 1)
+            entries.extend((keyword, category_name, weight) for keyword in category_config.get('keywords', []))
+            self._category_priority[category_name] = category_config.get('priority', -order)
+        self._category_matcher = KeywordMatcher(entries)
 
     def get_category_tags(self, category: str) -> list:
         """
@@ -208,8 +453,11 @@ class ConfigManager:
         return self.get('ai.provider', 'none')
     
     def get_ai_api_key(self) -> str:
-        """获取AI API Key（从 .env 环境变量，敏感信息）"""
-        return os.getenv('AI_API_KEY', '')
+        """获取AI API Key（从 .env 环境变量，敏感信息；未设置时使用 ai.endpoints 中第一个可用的 Key）"""
+        api_key = os.getenv('AI_API_KEY', '')
+        if not api_key:
+            api_key = next((endpoint['api_key'] for endpoint in self.get_ai_endpoints() if endpoint['api_key']), '')
+        return api_key
     
     def get_ai_api_base(self) -> str:
         """获取AI API Base URL（从 config.yaml）"""
@@ -219,6 +467,58 @@ class ConfigManager:
         """获取AI模型名称（从 config.yaml）"""
         return self.get('ai.model', 'gpt-3.5-turbo')
 
+    def get_ai_endpoints(self) -> list:
+        """
+        获取 AI 接口列表
+
+        优先使用 ai.endpoints（每项包含 api_base、model、api_key_env、weight），
+        未配置时使用 ai.api_base + ai.model + AI_API_KEY 作为唯一接口
+        """
+        endpoints = self.get('ai.endpoints') or []
+        if not endpoints:
+            return [{
+                'api_base': self.get_ai_api_base(),
+                'model': self.get_ai_model(),
+                'api_key': os.getenv('AI_API_KEY', ''),
+                'weight': 1,
+            }]
+        return [
+            {
+                'api_base': endpoint.get('api_base', self.get_ai_api_base()),
+                'model': endpoint.get('model', self.get_ai_model()),
+                'api_key': os.getenv(endpoint.get('api_key_env', 'AI_API_KEY'), ''),
+                'weight': endpoint.get('weight', 1),
+                'name': endpoint.get('name'),
+            }
+            for endpoint in endpoints
+        ]
+
+    def get_ai_hedge(self) -> Dict[str, Any]:
+        """获取对冲请求参数（首选接口超过近期耗时分位数仍未返回时，向备选接口再发一次）"""
+        return {
+            'enabled': self.get('ai.hedge.enabled', True),
+            'percentile': self.get('ai.hedge.percentile', 90),
+        }
+
+    def get_ai_timeout(self) -> float:
+        """获取 AI 请求超时上限（秒）"""
+        return self.get('ai.timeout', 30, env_key='AI_TIMEOUT')
+
+    def get_ai_adaptive_timeout(self) -> Dict[str, Any]:
+        """获取 AI 自适应超时参数（按近期耗时 p95 × 倍数计算，不超过 ai.timeout）"""
+        return {
+            'enabled': self.get('ai.adaptive_timeout.enabled', True),
+            'min_timeout': self.get('ai.adaptive_timeout.min_timeout', 5),
+            'multiplier': self.get('ai.adaptive_timeout.multiplier', 2.0),
+        }
+
+    def get_ai_circuit_breaker(self) -> Dict[str, float]:
+        """获取 AI 熔断参数（连续失败次数阈值、熔断后的探测间隔秒数）"""
+        return {
+            'failure_threshold': self.get('ai.circuit_breaker.failure_threshold', 3),
+            'recovery_time': self.get('ai.circuit_breaker.recovery_time', 60),
+        }
+
     def get_days_limit(self) -> int:
         """获取天数限制"""
         return self.get('sync.days_limit', 0, env_key='SYNC_DAYS_LIMIT')
@@ -239,6 +539,78 @@ class ConfigManager:
         """获取最大重试次数"""
         return self.get('advanced.max_retries', 3, env_key='MAX_RETRIES')
     
+    def get_flomo_daily_limit(self) -> int:
+        """获取 flomo 每日 API 调用上限"""
+        return self.get('flomo.daily_limit', 100, env_key='FLOMO_DAILY_LIMIT')
+
+    def get_flomo_utc_offset(self) -> float:
+        """获取 flomo 服务器时区（相对 UTC 的小时数），用于划分每日配额"""
+        return self.get('flomo.utc_offset', 8, env_key='FLOMO_UTC_OFFSET')
+
+    def get_flomo_rate_limit(self) -> Dict[str, float]:
+        """
+        获取 flomo 发送速率限制参数
+
+        节流时的最低速率由 advanced.request_delay 决定（每次发送至少间隔该秒数）
+        """
+        request_delay = self.get_request_delay()
+        return {
+            'initial_rate': self.get('flomo.rate_limit.initial_rate', 5.0),
+            'max_rate': self.get('flomo.rate_limit.max_rate', 10.0),
+            'increase_step': self.get('flomo.rate_limit.increase_step', 0.5),
+            'min_rate': 1.0 / request_delay if request_delay > 0 else 1.0,
+        }
+
+    def get_flomo_send_log_file(self) -> str:
+        """获取 flomo 发送幂等记录文件路径"""
+        return self.get('flomo.send_log_file', 'flomo_sent.json', env_key='FLOMO_SEND_LOG_FILE')
+
+    def get_flomo_ambiguous_policy(self) -> str:
+        """获取发送结果不确定时的处理方式（resend 或 assume_sent）"""
+        policy = str(self.get('flomo.ambiguous_policy', 'resend', env_key='FLOMO_AMBIGUOUS_POLICY')).lower()
+        return policy if policy in ('assume_sent', 'resend') else 'resend'
+
+    def get_flomo_timeout(self) -> float:
+        """获取 flomo 单次请求超时（秒）"""
+        return self.get('flomo.timeout', 10, env_key='FLOMO_TIMEOUT')
+
+    def get_usage_ledger_file(self) -> str:
+        """获取用量账本文件路径"""
+        return self.get('flomo.ledger_file', 'usage_ledger.json', env_key='USAGE_LEDGER_FILE')
+
+    def get_content_index_file(self) -> str:
+        """获取重复划线内容指纹索引文件路径"""
+        return self.get('sync.content_index_file', 'content_index.json', env_key='CONTENT_INDEX_FILE')
+
+    def get_content_index_max_entries(self) -> int:
+        """获取内容指纹索引最多保存的条目数（0 表示不限制）"""
+        return self.get('sync.content_index_max_entries', 20000, env_key='CONTENT_INDEX_MAX_ENTRIES')
+
+    def get_outbox_file(self) -> str:
+        """获取发件箱文件路径"""
+        return self.get('outbox.file', 'outbox.json', env_key='OUTBOX_FILE')
+
+    def get_outbox_order(self) -> str:
+        """获取发件箱的发送顺序（fifo 或 priority）"""
+        order = str(self.get('outbox.order', 'fifo', env_key='OUTBOX_ORDER')).lower()
+        return order if order in ('fifo', 'priority') else 'fifo'
+
+    def get_outbox_max_size(self) -> int:
+        """获取发件箱最多保存的笔记条数"""
+        return self.get('outbox.max_size', 1000, env_key='OUTBOX_MAX_SIZE')
+
+    def get_outbox_max_attempts(self) -> int:
+        """获取发件箱笔记最多发送失败次数，超过后移入死信列表（0 表示不限制）"""
+        return self.get('outbox.max_attempts', 5, env_key='OUTBOX_MAX_ATTEMPTS')
+
+    def should_hot_reload(self) -> bool:
+        """是否在处理书籍之间检查 config.yaml / .env 的变化并重新加载"""
+        return self.get('sync.hot_reload', False, env_key='CONFIG_HOT_RELOAD')
+
+    def should_backfill(self) -> bool:
+        """是否启用全量回填模式"""
+        return self.get('sync.backfill', False, env_key='SYNC_BACKFILL')
+
     def should_sync_reviews(self) -> bool:
         """是否同步笔记"""
         return self.get('sync.sync_reviews', True, env_key='SYNC_REVIEWS')
@@ -259,10 +631,177 @@ class ConfigManager:
         """是否启用AI摘要"""
         return self.get('ai.enable_summary', False, env_key='ENABLE_AI_SUMMARY')
     
+    def should_combine_ai_enrichment(self) -> bool:
+        """AI 标签和摘要都启用时，是否合并为一次 AI 调用"""
+        return self.get('ai.combined_enrichment', True, env_key='AI_COMBINED_ENRICHMENT')
+
+    def get_ai_batch_size(self) -> int:
+        """获取每次 AI 调用最多处理的划线数（0 或 1 表示逐条调用）"""
+        return self.get('ai.batch_size', 8, env_key='AI_BATCH_SIZE')
+
+    def get_ai_concurrency(self) -> int:
+        """获取同时进行的 AI 请求数（1 表示逐个请求）"""
+        return self.get('ai.concurrency', 4, env_key='AI_CONCURRENCY')
+
+    def get_ai_rate_limit(self) -> Dict[str, int]:
+        """获取 AI 请求速率限制（每分钟请求数、每分钟 token 数，0 表示不限制）"""
+        return {
+            'requests_per_minute': self.get('ai.rate_limit.requests_per_minute', 60, env_key='AI_RPM'),
+            'tokens_per_minute': self.get('ai.rate_limit.tokens_per_minute', 90000, env_key='AI_TPM'),
+        }
+
+    def get_ai_budget(self) -> Dict[str, float]:
+        """获取 AI 用量预算（token 数、费用上限和单价，0 表示不限制）"""
+        return {
+            'run_tokens': self.get('ai.budget.run_tokens', 0, env_key='AI_RUN_TOKENS'),
+            'daily_tokens': self.get('ai.budget.daily_tokens', 0, env_key='AI_DAILY_TOKENS'),
+            'run_cost': self.get('ai.budget.run_cost', 0, env_key='AI_RUN_COST'),
+            'daily_cost': self.get('ai.budget.daily_cost', 0, env_key='AI_DAILY_COST'),
+            'input_price': self.get('ai.budget.input_price', 0),
+            'output_price': self.get('ai.budget.output_price', 0),
+            'reduce_below': self.get('ai.budget.reduce_below', 0.5),
+            'local_below': self.get('ai.budget.local_below', 0.2),
+        }
+
+    def get_ai_budget_priority_length(self) -> int:
+        """获取预算精简模式下仍调用 AI 的最小划线长度"""
+        return self.get('ai.budget.priority_length', 200)
+
+    def get_tag_vocabulary(self) -> Dict[str, list]:
+        """
+        获取本地标签词表（标签 -> 关键词列表）
+
+        tags.vocabulary 可以是映射（标签: [关键词, ...]），也可以是标签列表（以标签名作为关键词）
+        """
+        vocabulary = self.get('tags.vocabulary') or {}
+        if isinstance(vocabulary, list):
+            vocabulary = {tag: [str(tag).lstrip('#')] for tag in vocabulary}
+        normalized = {}
+        for tag, keywords in vocabulary.items():
+            tag = str(tag).strip()
+            if not tag.startswith('#'):
+                tag = f"#{tag}"
+            if isinstance(keywords, str):
+                keywords = [keywords]
+            normalized[tag] = [str(keyword) for keyword in (keywords or [tag.lstrip('#')])]
+        return normalized
+
+    def get_tag_history_file(self) -> str:
+        """获取标签历史文件路径（本地标签引擎的训练数据）"""
+        return self.get('tags.history_file', 'tag_history.json', env_key='TAG_HISTORY_FILE')
+
+    def get_tag_history_max_entries(self) -> int:
+        """获取标签历史最多保留的条目数"""
+        return self.get('tags.history_max_entries', 5000)
+
+    def get_tag_reuse(self) -> Dict[str, Any]:
+        """获取标签复用参数（与历史划线足够相似时直接复用其标签）"""
+        return {
+            'enabled': self.get('tags.reuse.enabled', True, env_key='TAG_REUSE_ENABLED'),
+            'threshold': self.get('tags.reuse.threshold', 0.8),
+            'dimensions': self.get('tags.reuse.dimensions', 1024),
+        }
+
+    def get_ai_router(self) -> Dict[str, Any]:
+        """获取 AI 生成分流参数（哪些划线值得调用大模型，其余本地处理）"""
+        return {
+            'enabled': self.get('ai.router.enabled', False, env_key='AI_ROUTER_ENABLED'),
+            'min_length': self.get('ai.router.min_length', 120),
+            'length_weight': self.get('ai.router.length_weight', 1.0),
+            'note_weight': self.get('ai.router.note_weight', 1.0),
+            'category_weights': self.get('ai.router.category_weights', {}) or {},
+            'threshold': self.get('ai.router.threshold', 1.0),
+        }
+
+    def should_enable_ai_cache(self) -> bool:
+        """是否启用 AI 结果缓存"""
+        return self.get('ai.cache.enabled', True, env_key='AI_CACHE_ENABLED')
+
+    def get_ai_cache_file(self) -> str:
+        """获取 AI 结果缓存文件路径"""
+        return self.get('ai.cache.file', 'ai_cache.json', env_key='AI_CACHE_FILE')
+
+    def get_ai_cache_max_entries(self) -> int:
+        """获取 AI 结果缓存最多保存的条目数"""
+        return self.get('ai.cache.max_entries', 5000, env_key='AI_CACHE_MAX_ENTRIES')
+
+    def get_ai_cache_ttl_days(self) -> float:
+        """获取 AI 结果缓存有效天数（0 表示永不过期）"""
+        return self.get('ai.cache.ttl_days', 0, env_key='AI_CACHE_TTL_DAYS')
+
+    def get_ai_summary_provider(self) -> str:
+        """获取摘要提供方（openai 或 local，默认与 ai.provider 一致）"""
+        provider = str(self.get('ai.summary_provider', self.get_ai_provider(), env_key='AI_SUMMARY_PROVIDER')).lower()
+        return provider if provider in ('openai', 'local') else 'openai'
+
+    def get_local_summary_max_length(self) -> int:
+        """获取本地摘要的最大字符数"""
+        return self.get('ai.local_summary_max_length', 60)
+
     def get_ai_summary_min_length(self) -> int:
         """获取AI摘要的最小文本长度"""
         return self.get('ai.summary_min_length', 100, env_key='AI_SUMMARY_MIN_LENGTH')
 
+    def should_merge_highlights(self) -> bool:
+        """是否合并同一章节中重叠或相邻的划线"""
+        return self.get('sync.merge_highlights', False, env_key='MERGE_HIGHLIGHTS')
+
+    def get_merge_gap(self) -> int:
+        """获取合并相邻划线允许的最大间隔（字符数）"""
+        return self.get('sync.merge_gap', 1, env_key='MERGE_GAP')
+
+    def should_enable_digest(self) -> bool:
+        """是否启用摘要模式（多条划线合并为一条 flomo 笔记）"""
+        return self.get('sync.digest.enabled', False, env_key='DIGEST_ENABLED')
+
+    def get_digest_group_by(self) -> str:
+        """获取摘要模式的分组方式（book 或 chapter）"""
+        group_by = str(self.get('sync.digest.group_by', 'book', env_key='DIGEST_GROUP_BY')).lower()
+        return group_by if group_by in ('book', 'chapter') else 'book'
+
+    def get_digest_max_items(self) -> int:
+        """获取每条摘要笔记最多包含的划线数"""
+        return self.get('sync.digest.max_items', 20, env_key='DIGEST_MAX_ITEMS')
+
+    def get_digest_max_chars(self) -> int:
+        """获取每条摘要笔记正文的最大字符数"""
+        return self.get('sync.digest.max_chars', 3000, env_key='DIGEST_MAX_CHARS')
+
+    def get_digest_template(self) -> str:
+        """获取摘要笔记模板"""
+        template = self.get('templates.digest.format')
+        return template or self.get_default_digest_template()
+
+    def get_digest_item_template(self) -> str:
+        """获取摘要笔记中单条划线的模板"""
+        template = self.get('templates.digest.item_format')
+        return template or "▍{highlight_text}\n{ai_summary_section}{note_section}"
+
+    def get_default_digest_template(self) -> str:
+        """获取默认摘要笔记模板"""
+        return """📚 《{book_title}》· {author}（{item_count} 条划线）
+
+{chapter_info}
+
+{items}
+
+{tags}"""
+
+    def get_duplicate_policy(self) -> str:
+        """
+        获取重复划线的处理策略
+
+        - off: 不检查重复
+        - skip: 跳过已发送过的相同内容
+        - reuse: 复用已有的 AI 标签和摘要，仍然发送
+        - link: 发送一条指向已收录来源的简短笔记
+        """
+        policy = str(self.get('sync.duplicate_policy', 'reuse', env_key='DUPLICATE_POLICY')).lower()
+        if policy not in ('off', 'skip', 'reuse', 'link'):
+            print(f"⚠️  未知的重复划线策略: {policy}，使用 reuse")
+            return 'reuse'
+        return policy
+
 
 # 全局配置实例
 config = ConfigManager()
@@ -294,3 +833,11 @@ if __name__ == "__main__":
     print("\n=== 模板示例 ===")
     template = config.get_template('simple')
     print(template)
+
+    print("\n=== 配置读取开销 ===")
+    import timeit
+    count = 100000
+    getter_time = timeit.timeit(config.should_enable_ai_tags, number=count)
+    settings_time = timeit.timeit(lambda: config.settings.enable_ai_tags, number=count)
+    print(f"config.should_enable_ai_tags(): {getter_time / count * 1e6:.2f} 微秒/次")
+    print(f"config.settings.enable_ai_tags: {settings_time / count * 1e6:.2f} 微秒/次")
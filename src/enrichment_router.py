@@ -0,0 +1,129 @@
+"""
+AI 生成分流
+按划线长度、是否有笔记、书籍分类和缓存情况，为每条划线选择处理方式：
+缓存（已有结果）、大模型（值得调用 AI）或本地（本地标签 + 本地摘要）
+"""
+import threading
+from typing import Dict, Optional
+from .ai_summary import AISummaryGenerator
+from .ai_tags import AITagGenerator
+
+TIER_CACHE = 'cache'
+TIER_LLM = 'llm'
+TIER_LOCAL = 'local'
+
+TIER_NAMES = {
+    TIER_CACHE: '缓存',
+    TIER_LLM: '大模型',
+    TIER_LOCAL: '本地',
+}
+
+
+class EnrichmentRouter:
+    """AI 生成分流器"""
+
+    def __init__(
+        self,
+        tag_generator: AITagGenerator,
+        summary_generator: AISummaryGenerator,
+        enabled: bool = False,
+        min_length: int = 120,
+        length_weight: float = 1.0,
+        note_weight: float = 1.0,
+        category_weights: Optional[Dict[str, float]] = None,
+        threshold: float = 1.0
+    ):
+        """
+        初始化分流器
+
+        Args:
+            tag_generator: AI 标签生成器
+            summary_generator: AI 摘要生成器
+            enabled: 是否启用分流（不启用时所有划线都交给大模型）
+            min_length: 划线达到该长度时加 length_weight 分
+            length_weight: 长划线的得分
+            note_weight: 有笔记的划线的得分
+            category_weights: 书籍分类 -> 得分
+            threshold: 得分达到该值的划线交给大模型，否则本地处理
+        """
+        self.tag_generator = tag_generator
+        self.summary_generator = summary_generator
+        self.enabled = enabled
+        self.min_length = min_length
+        self.length_weight = length_weight
+        self.note_weight = note_weight
+        self.category_weights = category_weights or {}
+        self.threshold = threshold
+        self.lock = threading.Lock()
+
+        # 统计：分流方式 -> 条数 / 耗时
+        self.counts = {tier: 0 for tier in TIER_NAMES}
+        self.durations = {tier: 0.0 for tier in TIER_NAMES}
+
+    def score(self, text: str, has_note: bool, category: Optional[str]) -> float:
+        """
+        计算划线调用大模型的价值得分
+
+        Args:
+            text: 划线内容
+            has_note: 是否有笔记
+            category: 书籍分类
+
+        Returns:
+            得分
+        """
+        score = 0.0
+        if len(text) >= self.min_length:
+            score += self.length_weight
+        if has_note:
+            score += self.note_weight
+        if category:
+            score += self.category_weights.get(category, 0)
+        return score
+
+    def is_cached(self, text: str) -> bool:
+        """需要 AI 生成的部分（标签、摘要）是否都已有缓存"""
+        need_tags = self.tag_generator.is_enabled() and self.tag_generator.provider == 'openai'
+        need_summary = self.summary_generator.uses_ai() and self.summary_generator.should_summarize(text)
+        if not (need_tags or need_summary):
+            return False
+        if need_tags and not self.tag_generator.has_cached_tags(text):
+            return False
+        if need_summary and not self.summary_generator.has_cached_summary(text):
+            return False
+        return True
+
+    def route(self, text: str, has_note: bool, category: Optional[str]) -> str:
+        """
+        为划线选择处理方式
+
+        Args:
+            text: 划线内容
+            has_note: 是否有笔记
+            category: 书籍分类
+
+        Returns:
+            TIER_CACHE、TIER_LLM 或 TIER_LOCAL
+        """
+        if not self.enabled:
+            return TIER_LLM
+        if self.is_cached(text):
+            return TIER_CACHE
+        return TIER_LLM if self.score(text, has_note, category) >= self.threshold else TIER_LOCAL
+
+    def record(self, tier: str, count: int, elapsed: float):
+        """记录一批划线的分流结果和耗时"""
+        with self.lock:
+            self.counts[tier] += count
+            self.durations[tier] += elapsed
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """获取各分流方式的条数、总耗时和平均耗时"""
+        return {
+            tier: {
+                "count": self.counts[tier],
+                "duration": self.durations[tier],
+                "avg_ms": (self.durations[tier] / self.counts[tier]) * 1000 if self.counts[tier] else 0.0,
+            }
+            for tier in TIER_NAMES
+        }
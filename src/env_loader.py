@@ -0,0 +1,24 @@
+"""
+环境变量加载
+整个进程只加载一次 .env：各模块导入时调用 load_env()，重复调用直接返回
+"""
+from typing import Optional
+
+_loaded = False
+
+
+def load_env(path: Optional[str] = None, override: bool = False):
+    """
+    加载 .env 中的环境变量
+
+    Args:
+        path: .env 文件路径（默认从调用位置向上查找）
+        override: 是否覆盖已有的环境变量（重新加载 .env 时使用，每次调用都会重新读取）
+    """
+    global _loaded
+    if _loaded and not override:
+        return
+
+    from dotenv import load_dotenv
+    load_dotenv(path, override=override)
+    _loaded = True
@@ -2,34 +2,183 @@
 Flomo API 客户端
 """
 import os
+import sys
+import hashlib
+import threading
+import time
 import requests
 import json
 from typing import Dict, Optional
-from dotenv import load_dotenv
 
-load_dotenv()
+try:
+    from .env_loader import load_env
+    from .rate_limiter import AdaptiveRateLimiter, parse_retry_after
+    from .usage_ledger import UsageLedger
+except ImportError:
+    # 如果相对导入失败，使用绝对导入（直接运行）
+    # 将项目根目录添加到 sys.path
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from src.env_loader import load_env
+    from src.rate_limiter import AdaptiveRateLimiter, parse_retry_after
+    from src.usage_ledger import UsageLedger
+
+load_env()
+
+
+class FlomoSendLog:
+    """
+    flomo 发送幂等记录
+
+    每次发送前把内容指纹记为 pending，成功后记为 sent，确定未送达时记为 failed，
+    结果不确定时记为 unknown。再次发送相同内容时据此判断是否已经发送过，避免重试产生重复笔记。
+    状态只在内存中更新，由 flush() 批量写入文件（每本书处理完和运行结束时）。
+    """
+
+    def __init__(self, path: str = "flomo_sent.json", keep_days: int = 30):
+        """
+        初始化发送记录
+
+        Args:
+            path: 记录文件路径
+            keep_days: 保留最近多少天的记录
+        """
+        self.path = path
+        self.keep_days = keep_days
+        self.records = self.load()
+        self.dirty = False
+
+    def load(self) -> Dict[str, Dict]:
+        """加载记录文件"""
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    return json.load(f).get("records", {})
+            except Exception as e:
+                print(f"⚠️  加载发送记录失败: {e}")
+        return {}
+
+    def save(self):
+        """保存记录文件（先写临时文件再替换，避免中断时损坏）"""
+        cutoff = time.time() - self.keep_days * 86400
+        self.records = {
+            key: record for key, record in self.records.items()
+            if record.get("updated_at", 0) >= cutoff
+        }
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"records": self.records}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"⚠️  保存发送记录失败: {e}")
+
+    def get_status(self, key: str) -> Optional[str]:
+        """获取内容的发送状态（pending / sent / unknown），没有记录时返回 None"""
+        record = self.records.get(key)
+        return record.get("status") if record else None
+
+    def mark(self, key: str, status: str):
+        """更新内容的发送状态（调用 flush 后写入文件）"""
+        record = self.records.setdefault(key, {"attempts": 0})
+        if status == "pending":
+            record["attempts"] = record.get("attempts", 0) + 1
+        record["status"] = status
+        record["updated_at"] = time.time()
+        self.dirty = True
+
+    def flush(self):
+        """有未保存的状态变化时写入文件"""
+        if self.dirty:
+            self.save()
+            self.dirty = False
 
 
 class FlomoClient:
     """Flomo API 客户端"""
 
-    def __init__(self, api_url: Optional[str] = None):
+    # 账本中记录 flomo 调用次数的用量名称
+    LEDGER_COUNTER = "flomo_requests"
+
+    def __init__(
+        self,
+        api_url: Optional[str] = None,
+        daily_limit: int = 100,
+        ledger: Optional[UsageLedger] = None,
+        rate_limiter: Optional[AdaptiveRateLimiter] = None,
+        send_log: Optional[FlomoSendLog] = None,
+        max_retries: int = 3,
+        ambiguous_policy: str = "resend",
+        timeout: float = 10
+    ):
         """
         初始化 Flomo 客户端
 
         Args:
             api_url: flomo API 地址，如果不提供则从环境变量读取
+            daily_limit: 每日 API 调用上限
+            ledger: 持久化用量账本，多次运行共享当天额度；不提供则只在本进程内计数
+            rate_limiter: 发送速率限制器，不提供则使用默认参数
+            send_log: 发送幂等记录，不提供则只在本进程内记录
+            max_retries: 可安全重试的失败（连接失败、429/503）最多重试次数
+            ambiguous_policy: 结果不确定（超时等）时的处理方式：
+                resend 重新发送（保证送达，可能产生重复笔记）；
+                assume_sent 视为已发送，不再重试（避免重复笔记，但可能丢失笔记）
+            timeout: 单次请求超时（秒）
         """
         self.api_url = api_url or os.getenv("FLOMO_API")
         if not self.api_url:
             raise ValueError("请设置 FLOMO_API 环境变量或提供 api_url 参数")
 
-        self.daily_limit = 100
+        self.daily_limit = daily_limit
         self.request_count = 0
+        self.ledger = ledger
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter()
+        self.send_log = send_log
+        self.max_retries = max_retries
+        self.ambiguous_policy = ambiguous_policy
+        self.timeout = timeout
+
+        # 本进程内的发送状态（没有持久化记录时使用）和正在发送中的内容
+        self._local_status: Dict[str, str] = {}
+        self._in_flight: Dict[str, threading.Event] = {}
+        self._in_flight_lock = threading.Lock()
+
+        # 统计
+        self.retry_count = 0
+        self.ambiguous_count = 0
+        self.deduplicated_count = 0
+
+    @staticmethod
+    def content_key(content: str) -> str:
+        """计算笔记内容的幂等键"""
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def _get_status(self, key: str) -> Optional[str]:
+        if self.send_log:
+            return self.send_log.get_status(key)
+        return self._local_status.get(key)
+
+    def _mark(self, key: str, status: str):
+        if self.send_log:
+            self.send_log.mark(key, status)
+        else:
+            self._local_status[key] = status
+
+    def flush(self):
+        """把发送状态写入幂等记录文件"""
+        if self.send_log:
+            self.send_log.flush()
+
+    def _is_delivered(self, status: Optional[str]) -> bool:
+        """按发送状态和 ambiguous_policy 判断内容是否视为已送达"""
+        return status == "sent" or (status == "unknown" and self.ambiguous_policy == "assume_sent")
 
     def send_memo(self, content: str) -> bool:
         """
-        发送笔记到 flomo
+        发送笔记到 flomo（幂等，失败时有限次重试）
+
+        相同内容已发送成功时直接返回成功；同一内容正在发送时等待其结果。
+        上次发送结果不确定（超时、进程中断）时按 ambiguous_policy 处理。
 
         Args:
             content: 笔记内容，支持 Markdown 和标签（使用 # 符号）
@@ -37,9 +186,100 @@ class FlomoClient:
         Returns:
             bool: 是否成功
         """
-        if self.request_count >= self.daily_limit:
-            print(f"已达到每日API调用限制（{self.daily_limit}次）")
-            return False
+        key = self.content_key(content)
+
+        # 同一内容正在发送中：等待并复用其结果
+        with self._in_flight_lock:
+            event = self._in_flight.get(key)
+            if event is None:
+                self._in_flight[key] = threading.Event()
+        if event is not None:
+            event.wait()
+            self.deduplicated_count += 1
+            return self._is_delivered(self._get_status(key))
+
+        try:
+            return self._send_with_retries(key, content)
+        finally:
+            with self._in_flight_lock:
+                self._in_flight.pop(key).set()
+
+    def _send_with_retries(self, key: str, content: str) -> bool:
+        """按幂等记录发送笔记，可安全重试的失败会自动重试"""
+        status = self._get_status(key)
+        if status == "sent":
+            print("✓ 相同内容已发送过，跳过（幂等）")
+            self.deduplicated_count += 1
+            return True
+        if status in ("pending", "unknown"):
+            # 上次发送结果不确定，flomo 没有查询接口，按策略核对
+            if self.ambiguous_policy == "assume_sent":
+                print("⚠️  相同内容上次发送结果不确定，视为已发送（ambiguous_policy=assume_sent）")
+                self._mark(key, "sent")
+                self.deduplicated_count += 1
+                return True
+            print("⚠️  相同内容上次发送结果不确定，重新发送（ambiguous_policy=resend）")
+
+        # 上一次尝试的结果：决定配额用完或重试用尽时记录的状态
+        last_outcome = None
+        for attempt in range(self.max_retries + 1):
+            if self.get_remaining_quota() <= 0:
+                print(f"已达到每日API调用限制（{self.daily_limit}次）")
+                self._mark_unsent(key, last_outcome)
+                return False
+
+            if attempt > 0:
+                self.retry_count += 1
+                print(f"   ↻ 第 {attempt} 次重试...")
+
+            # 发送前记录 pending，进程中断时下次可识别为结果不确定
+            self._mark(key, "pending")
+            outcome = self._post(content)
+            last_outcome = outcome
+
+            if outcome == "sent":
+                self._mark(key, "sent")
+                return True
+            if outcome == "ambiguous":
+                self.ambiguous_count += 1
+                if self.ambiguous_policy == "assume_sent":
+                    # 请求可能已被 flomo 处理，不重试以免重复
+                    self._mark(key, "unknown")
+                    print("⚠️  发送结果不确定，视为已发送（请在 flomo 中核对）")
+                    return True
+                continue
+            if outcome == "failed":
+                self._mark(key, "failed")
+                return False
+            # retry：请求确定未被处理，可以安全重试
+
+        self._mark_unsent(key, last_outcome)
+        return False
+
+    def _mark_unsent(self, key: str, last_outcome: Optional[str]):
+        """
+        放弃发送时记录状态：最后一次尝试结果不确定时记为 unknown，
+        确定未送达时记为 failed（下次按未发送处理，不会被当作已发送跳过）
+
+        Args:
+            key: 内容幂等键
+            last_outcome: 最后一次尝试的结果（本次没有发出请求时为 None，保留原有状态）
+        """
+        if last_outcome == "ambiguous":
+            self._mark(key, "unknown")
+        elif last_outcome is not None:
+            self._mark(key, "failed")
+
+    def _post(self, content: str) -> str:
+        """
+        执行一次发送请求
+
+        Returns:
+            str: sent（成功）、retry（确定未处理，可安全重试）、
+                ambiguous（可能已处理）、failed（不可重试的失败）
+        """
+        # 按当前速率等待发送令牌（被限流后自动放慢）
+        self.rate_limiter.acquire()
 
         try:
             data = {"content": content}
@@ -47,21 +287,54 @@ class FlomoClient:
                 self.api_url,
                 headers={"Content-Type": "application/json"},
                 json=data,
-                timeout=10
+                timeout=self.timeout
             )
+        except requests.exceptions.ConnectTimeout as e:
+            # 连接都没建立，请求肯定没有送达
+            self.rate_limiter.on_throttle()
+            print(f"✗ 连接 flomo 超时: {e}")
+            return "retry"
+        except requests.exceptions.ConnectionError as e:
+            self.rate_limiter.on_throttle()
+            if "NewConnectionError" in str(e) or "Failed to establish" in str(e):
+                print(f"✗ 无法连接 flomo: {e}")
+                return "retry"
+            self._count_request()
+            print(f"✗ 发送笔记时连接中断: {e}")
+            return "ambiguous"
+        except requests.exceptions.Timeout as e:
+            # 读取超时：请求已发出，flomo 可能已经创建了笔记
+            self.rate_limiter.on_throttle()
+            self._count_request()
+            print(f"✗ 等待 flomo 响应超时: {e}")
+            return "ambiguous"
+        except Exception as e:
+            print(f"✗ 发送笔记时出错: {e}")
+            return "failed"
 
-            self.request_count += 1
+        self._count_request()
 
-            if response.ok:
-                print(f"✓ 成功发送笔记到 flomo (第 {self.request_count} 次)")
-                return True
-            else:
-                print(f"✗ 发送失败: {response.status_code} - {response.text}")
-                return False
+        if response.ok:
+            self.rate_limiter.on_success()
+            print(f"✓ 成功发送笔记到 flomo (第 {self.request_count} 次)")
+            return "sent"
 
-        except Exception as e:
-            print(f"✗ 发送笔记时出错: {e}")
-            return False
+        print(f"✗ 发送失败: {response.status_code} - {response.text}")
+        if response.status_code == 429 or response.status_code >= 500:
+            self.rate_limiter.on_throttle(parse_retry_after(response.headers.get("Retry-After")))
+        if response.status_code in (429, 502, 503):
+            # 限流或网关未转发，请求没有被处理
+            return "retry"
+        if response.status_code == 504:
+            # 网关等待超时，flomo 可能已经处理
+            return "ambiguous"
+        return "failed"
+
+    def _count_request(self):
+        """记录一次到达 flomo 的调用"""
+        self.request_count += 1
+        if self.ledger:
+            self.ledger.add(self.LEDGER_COUNTER)
 
     def send_weread_highlight(
         self,
@@ -125,13 +398,23 @@ class FlomoClient:
         """获取当前请求计数"""
         return self.request_count
 
+    def get_daily_usage(self) -> int:
+        """获取今天（flomo 服务器时区）已用的调用次数，包括之前的运行"""
+        if self.ledger:
+            return int(max(self.ledger.get(self.LEDGER_COUNTER), self.request_count))
+        return self.request_count
+
+    def get_remaining_quota(self) -> int:
+        """获取今天剩余的调用次数"""
+        return max(self.daily_limit - self.get_daily_usage(), 0)
+
     def reset_count(self):
         """重置请求计数"""
         self.request_count = 0
 
 
 if __name__ == "__main__":
-    # 测试代码
+    # 测试代码（python -m src.flomo_client 或 python src/flomo_client.py）
     client = FlomoClient()
 
     # 测试发送简单笔记
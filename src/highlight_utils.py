@@ -0,0 +1,167 @@
+"""
+划线处理工具
+提供文本归一化、内容指纹等与具体 API 无关的纯函数
+"""
+import hashlib
+import re
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+# 归一化时忽略的字符：空白和常见中英文标点
+_IGNORED_CHARS = re.compile(
+    r"[\s!-/:-@\[-`{-~\u00b7\u2010-\u2027\u2030-\u205e\u3000-\u303f\uff00-\uff0f\uff1a-\uff20\uff3b-\uff40\uff5b-\uff65]+"
+)
+
+# bookmarkId / range 中的字符范围，如 "3300140235_5_9983-10065"
+_RANGE_PATTERN = re.compile(r"(\d+)-(\d+)$")
+
+
+def normalize_text(text: str) -> str:
+    """
+    归一化划线文本，用于判断不同书籍中的同一段内容
+
+    规则：
+    1. NFKC 归一化（全角/半角、兼容字符统一）
+    2. 转为小写
+    3. 去除空白和标点
+
+    Args:
+        text: 原始文本
+
+    Returns:
+        归一化后的文本
+    """
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    return _IGNORED_CHARS.sub('', text)
+
+
+def content_hash(text: str) -> Optional[str]:
+    """
+    计算划线内容指纹（基于归一化文本）
+
+    Args:
+        text: 原始文本
+
+    Returns:
+        16 位十六进制指纹；归一化后为空（空白或纯标点）时返回 None，不参与去重
+    """
+    normalized = normalize_text(text)
+    if not normalized:
+        return None
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:16]
+
+
+def parse_range(bookmark: Dict) -> Optional[Tuple[int, int]]:
+    """
+    解析划线在章节中的字符范围
+
+    优先使用 range 字段，其次从 bookmarkId 末尾的 `_start-end` 解析
+
+    Args:
+        bookmark: 划线信息
+
+    Returns:
+        (start, end)，无法解析时返回 None
+    """
+    candidates = [bookmark.get("range") or "", bookmark.get("bookmarkId") or ""]
+    for candidate in candidates:
+        match = _RANGE_PATTERN.search(str(candidate))
+        if match:
+            start, end = int(match.group(1)), int(match.group(2))
+            return (start, end) if start <= end else (end, start)
+    return None
+
+
+def _merge_overlapping_text(first: str, second: str, overlap_hint: int) -> Optional[str]:
+    """拼接两段重叠的划线文本，找不到重叠部分时返回 None"""
+    if second in first:
+        return first
+    if first in second:
+        return second
+    # 先按字符范围推算的重叠长度尝试，再搜索最长的公共前后缀
+    if 0 < overlap_hint <= min(len(first), len(second)) and first.endswith(second[:overlap_hint]):
+        return first + second[overlap_hint:]
+    for size in range(min(len(first), len(second)) - 1, 0, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return None
+
+
+def merge_highlight_ranges(
+    bookmarks: List[Dict],
+    gap: int = 0,
+    separator: str = "……"
+) -> List[Dict]:
+    """
+    合并同一章节中重叠或相邻的划线
+
+    按 chapterUid 分组并按起始位置排序，起点不超过上一段终点 + gap 的划线
+    合并为一条；合并结果的 mergedIds 记录所有组成划线的 bookmarkId。
+    无法解析范围的划线原样保留。
+
+    Args:
+        bookmarks: 待同步的划线列表
+        gap: 允许合并的最大间隔（字符数）
+        separator: 不重叠的两段之间使用的连接符
+
+    Returns:
+        合并后的划线列表（保持原有先后顺序）
+    """
+    results = []  # [(原始顺序, 划线)]
+    positioned = []
+    for index, bookmark in enumerate(bookmarks):
+        text_range = parse_range(bookmark)
+        if text_range is None:
+            results.append((index, bookmark))
+        else:
+            positioned.append((bookmark.get("chapterUid", 0), text_range[0], text_range[1], index, bookmark))
+
+    positioned.sort(key=lambda item: (item[0], item[1], item[2]))
+
+    group = None
+    for chapter_uid, start, end, index, bookmark in positioned:
+        if group and group["chapterUid"] == chapter_uid and start <= group["end"] + gap:
+            text = None
+            if start <= group["end"]:
+                text = _merge_overlapping_text(group["markText"], bookmark.get("markText", ""), group["end"] - start)
+            if text is None:
+                text = group["markText"] + separator + bookmark.get("markText", "")
+            group["markText"] = text
+            group["end"] = max(group["end"], end)
+            group["index"] = min(group["index"], index)
+            group["createTime"] = max(group["createTime"], bookmark.get("createTime", 0))
+            group["members"].append(bookmark)
+            continue
+
+        if group:
+            results.append(_finish_group(group))
+        group = {
+            "chapterUid": chapter_uid,
+            "start": start,
+            "end": end,
+            "index": index,
+            "markText": bookmark.get("markText", ""),
+            "createTime": bookmark.get("createTime", 0),
+            "members": [bookmark],
+        }
+    if group:
+        results.append(_finish_group(group))
+
+    results.sort(key=lambda item: item[0])
+    return [bookmark for _, bookmark in results]
+
+
+def _finish_group(group: Dict) -> Tuple[int, Dict]:
+    """把合并分组转换为划线结构"""
+    members = group["members"]
+    if len(members) == 1:
+        return group["index"], members[0]
+
+    merged = dict(members[0])
+    merged.update({
+        "markText": group["markText"],
+        "createTime": group["createTime"],
+        "range": f"{group['start']}-{group['end']}",
+        "mergedIds": [member.get("bookmarkId") for member in members],
+    })
+    return group["index"], merged
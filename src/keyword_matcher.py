@@ -0,0 +1,96 @@
+"""
+多关键词匹配器
+所有关键词编译为一个匹配器，单次扫描文本找出全部命中（包括相互重叠的关键词），
+用于书籍分类和本地标签词表，关键词数量增加到上千个也只扫描一遍
+"""
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class KeywordMatcher:
+    """编译后的多关键词匹配器（不区分大小写）"""
+
+    def __init__(self, entries: Iterable[Tuple[str, str, float]]):
+        """
+        构建匹配器
+
+        Args:
+            entries: [(关键词, 标签, 权重)]，同一关键词可以对应多个标签
+        """
+        self.labels: Dict[str, List[Tuple[str, float]]] = defaultdict(list)
+        for keyword, label, weight in entries:
+            keyword = str(keyword).strip().lower()
+            if keyword:
+                self.labels[keyword].append((label, weight))
+
+        # 按首字符记录关键词长度：扫描到候选位置后，只需按这几种长度切片查表
+        self.buckets: Dict[str, List[int]] = defaultdict(list)
+        for keyword in self.labels:
+            if len(keyword) not in self.buckets[keyword[0]]:
+                self.buckets[keyword[0]].append(len(keyword))
+
+        # 所有关键词首字符组成的字符集：扫描时只在可能出现关键词的位置停下，
+        # 再按桶校验（关键词可以重叠）。比上千个分支的并集正则快得多
+        self.pattern = None
+        if self.labels:
+            first_chars = "".join(re.escape(char) for char in sorted(self.buckets))
+            self.pattern = re.compile(f"[{first_chars}]")
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def find_keywords(self, text: str) -> List[str]:
+        """
+        找出文本中出现的全部关键词（去重，按首次出现顺序）
+
+        Args:
+            text: 文本内容
+
+        Returns:
+            关键词列表（小写）
+        """
+        if self.pattern is None or not text:
+            return []
+        text = text.lower()
+        found = {}
+        for match in self.pattern.finditer(text):
+            position = match.start()
+            for length in self.buckets[text[position]]:
+                keyword = text[position:position + length]
+                if keyword in self.labels:
+                    found[keyword] = None
+        return list(found)
+
+    def score(self, text: str) -> Dict[str, float]:
+        """
+        计算各标签得分（每个命中的关键词计一次权重）
+
+        Args:
+            text: 文本内容
+
+        Returns:
+            标签 -> 得分
+        """
+        scores: Dict[str, float] = defaultdict(float)
+        for keyword in self.find_keywords(text):
+            for label, weight in self.labels[keyword]:
+                scores[label] += weight
+        return dict(scores)
+
+    def best(self, text: str, priority: Optional[Dict[str, float]] = None) -> Optional[str]:
+        """
+        返回得分最高的标签
+
+        Args:
+            text: 文本内容
+            priority: 标签 -> 优先级，得分相同时优先级高的胜出
+
+        Returns:
+            标签，没有命中时返回 None
+        """
+        scores = self.score(text)
+        if not scores:
+            return None
+        priority = priority or {}
+        return max(scores, key=lambda label: (scores[label], priority.get(label, 0)))
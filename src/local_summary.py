@@ -0,0 +1,122 @@
+"""
+本地摘要生成器
+抽取式摘要：按句切分后用字符二元组的重合度给句子打分，选出最能代表全文的句子。
+完全在本地运行，不需要网络
+"""
+import re
+from collections import Counter
+from typing import List, Optional
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[。！？!?；;])|\n+")
+_NON_WORD = re.compile(r"[^\w]|_")
+
+# 常见虚词构成的二元组信息量低，不参与打分
+_STOP_CHARS = set("的了是在和与及或也就都而但这那之其我你他她它们个")
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    中文分句（按 。！？；及换行切分，保留句末标点）
+
+    Args:
+        text: 文本内容
+
+    Returns:
+        句子列表（已去除空白句）
+    """
+    return [sentence.strip() for sentence in _SENTENCE_SPLIT.split(text) if sentence and sentence.strip()]
+
+
+def _bigrams(sentence: str) -> List[str]:
+    """提取句子的字符二元组（忽略标点和虚词）"""
+    chars = _NON_WORD.sub('', sentence.lower())
+    return [
+        chars[i:i + 2] for i in range(len(chars) - 1)
+        if not (chars[i] in _STOP_CHARS and chars[i + 1] in _STOP_CHARS)
+    ]
+
+
+class LocalSummarizer:
+    """本地抽取式摘要生成器"""
+
+    def __init__(self, max_length: int = 60):
+        """
+        初始化本地摘要生成器
+
+        Args:
+            max_length: 摘要最大字符数
+        """
+        self.max_length = max_length
+
+    def summarize(self, text: str) -> Optional[str]:
+        """
+        生成摘要
+
+        与其他句子共享高频二元组越多的句子越能代表全文；首句、末句（中文常见的
+        总起和总结位置）额外加权。按得分选句直到达到长度上限，再按原文顺序拼接
+
+        Args:
+            text: 文本内容
+
+        Returns:
+            摘要文本，文本为空时返回 None
+        """
+        sentences = split_sentences(text)
+        if not sentences:
+            return None
+        if len(sentences) == 1:
+            return self._truncate(sentences[0])
+
+        sentence_grams = [set(_bigrams(sentence)) for sentence in sentences]
+        frequency = Counter(gram for grams in sentence_grams for gram in grams)
+
+        scores = []
+        for position, grams in enumerate(sentence_grams):
+            # 只统计在其他句子中也出现的二元组，按句长开方归一，避免偏向长句
+            shared = sum(frequency[gram] - 1 for gram in grams)
+            score = shared / (len(grams) ** 0.5) if grams else 0.0
+            if position == 0:
+                score *= 1.2
+            elif position == len(sentences) - 1:
+                score *= 1.1
+            scores.append(score)
+
+        ranked = sorted(range(len(sentences)), key=lambda index: (-scores[index], index))
+        chosen = []
+        length = 0
+        for index in ranked:
+            if chosen and length + len(sentences[index]) > self.max_length:
+                continue
+            chosen.append(index)
+            length += len(sentences[index])
+            if length >= self.max_length:
+                break
+
+        return self._truncate("".join(sentences[index] for index in sorted(chosen)))
+
+    def _truncate(self, text: str) -> str:
+        """超出长度上限时截断"""
+        if len(text) <= self.max_length:
+            return text
+        return text[:self.max_length - 1] + "…"
+
+
+if __name__ == "__main__":
+    import time
+
+    summarizer = LocalSummarizer()
+    sample = (
+        "系统1的运作是无意识且快速的，不怎么费脑力，没有感觉，完全处于自主控制状态。"
+        "系统2将注意力转移到需要费脑力的大脑活动上来，例如复杂的运算。"
+        "系统2的运作通常与行为、选择和专注等主观体验相关联。"
+        "系统1和系统2的分工是非常高效的：将工作量最小化。"
+        "通常，系统1自动运行，而系统2则处于不费力的放松状态，运行时只动用一部分能力。"
+    )
+    print(f"摘要: {summarizer.summarize(sample)}")
+
+    rounds = 2000
+    start = time.perf_counter()
+    for _ in range(rounds):
+        summarizer.summarize(sample)
+    elapsed = time.perf_counter() - start
+    print(f"速度: {rounds / elapsed:.0f} 条/秒")
@@ -0,0 +1,272 @@
+"""
+本地标签引擎
+从历史 AI 标签（tag_history.json）和用户词表（tags.vocabulary）中学习，
+用字符 n-gram TF-IDF 计算划线与各标签的相似度，不调用任何 API
+"""
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+from .config_manager import config
+from .keyword_matcher import KeywordMatcher
+
+# 内置词表：没有历史数据时的兜底规则（标签 -> 关键词）
+DEFAULT_VOCABULARY = {
+    '#思维模型': ['思维'],
+    '#认知科学': ['认知'],
+    '#心理学': ['心理'],
+    '#效率提升': ['效率'],
+    '#时间管理': ['时间'],
+    '#习惯养成': ['习惯'],
+    '#沟通技巧': ['沟通'],
+    '#领导力': ['领导'],
+    '#管理': ['管理'],
+    '#创新思维': ['创新'],
+    '#决策': ['决策'],
+    '#学习方法': ['学习'],
+    '#个人成长': ['成长'],
+    '#目标管理': ['目标'],
+    '#专注力': ['专注'],
+    '#情绪管理': ['情绪'],
+    '#人际关系': ['关系'],
+    '#健康': ['健康'],
+    '#财富': ['财富'],
+    '#投资理财': ['投资'],
+}
+
+_NON_WORD = re.compile(r"[^\w]|_")
+
+
+def char_ngrams(text: str, sizes: Tuple[int, ...] = (2, 3)) -> Counter:
+    """
+    提取字符 n-gram 词频（忽略标点和空白）
+
+    Args:
+        text: 文本内容
+        sizes: n-gram 长度
+
+    Returns:
+        n-gram -> 出现次数
+    """
+    chars = _NON_WORD.sub('', text.lower())
+    grams = Counter()
+    for size in sizes:
+        for i in range(len(chars) - size + 1):
+            grams[chars[i:i + size]] += 1
+    return grams
+
+
+class LocalTagger:
+    """基于 TF-IDF 的本地标签引擎"""
+
+    def __init__(
+        self,
+        history_path: str = "tag_history.json",
+        vocabulary: Optional[Dict[str, List[str]]] = None,
+        max_history: int = 5000,
+        min_score: float = 0.05,
+        profile_size: int = 200
+    ):
+        """
+        初始化标签引擎
+
+        Args:
+            history_path: 标签历史文件路径（AI 生成标签时记录的划线和标签）
+            vocabulary: 词表（标签 -> 关键词列表），与内置词表合并
+            max_history: 最多保留的历史条目数
+            min_score: 相似度低于该值的标签不返回
+            profile_size: 每个标签保留权重最高的 n-gram 数
+        """
+        self.history_path = history_path
+        self.max_history = max_history
+        self.min_score = min_score
+        self.profile_size = profile_size
+        self.set_vocabulary(vocabulary)
+        self.history = self.load()
+        self.dirty = False
+        self.lock = threading.Lock()
+
+        # 索引（首次使用时构建）
+        self.idf: Dict[str, float] = {}
+        self.postings: Dict[str, List[Tuple[str, float]]] = {}
+        self.indexed = False
+
+    def set_vocabulary(self, vocabulary: Optional[Dict[str, List[str]]] = None):
+        """
+        设置词表并重建关键词匹配器（历史索引不受影响）
+
+        Args:
+            vocabulary: 词表（标签 -> 关键词列表），与内置词表合并
+        """
+        merged = dict(DEFAULT_VOCABULARY)
+        merged.update(vocabulary or {})
+        self.matcher = KeywordMatcher(
+            (keyword, tag, 1.0)
+            for tag, keywords in merged.items()
+            for keyword in keywords
+        )
+        self.vocabulary = merged
+
+    def load(self) -> List[Dict]:
+        """加载标签历史"""
+        if os.path.exists(self.history_path):
+            try:
+                with open(self.history_path, 'r', encoding='utf-8') as f:
+                    return json.load(f).get("items", [])
+            except Exception as e:
+                print(f"⚠️  加载标签历史失败: {e}")
+        return []
+
+    def save(self):
+        """保存标签历史（没有变化时跳过）"""
+        if not self.dirty:
+            return
+        with self.lock:
+            items = self.history[-self.max_history:]
+        tmp_path = f"{self.history_path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"items": items}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.history_path)
+            self.dirty = False
+        except Exception as e:
+            print(f"⚠️  保存标签历史失败: {e}")
+
+    def learn(self, text: str, tags: List[str]):
+        """
+        记录一条 AI 生成的标签，下次运行时参与训练
+
+        Args:
+            text: 划线内容
+            tags: 标签列表
+        """
+        if not text or not tags:
+            return
+        with self.lock:
+            self.history.append({"text": text, "tags": list(tags)})
+            if len(self.history) > self.max_history:
+                del self.history[:len(self.history) - self.max_history]
+            self.dirty = True
+
+    def build_index(self):
+        """
+        构建索引：按历史划线计算 n-gram 的 IDF，把每个标签下所有划线的
+        TF-IDF 向量求和、归一化作为标签画像，再倒排为 n-gram -> [(标签, 权重)]
+        """
+        documents = [(char_ngrams(item["text"]), item["tags"]) for item in self.history if item.get("text")]
+        document_count = len(documents)
+        document_frequency = Counter(gram for grams, _ in documents for gram in grams)
+        self.idf = {
+            gram: math.log((1 + document_count) / (1 + count)) + 1
+            for gram, count in document_frequency.items()
+        }
+
+        profiles: Dict[str, Counter] = defaultdict(Counter)
+        for grams, tags in documents:
+            vector = self._weigh(grams)
+            for tag in tags:
+                profiles[tag].update(vector)
+
+        postings: Dict[str, List[Tuple[str, float]]] = defaultdict(list)
+        for tag, profile in profiles.items():
+            top = profile.most_common(self.profile_size)
+            norm = math.sqrt(sum(weight * weight for _, weight in top)) or 1.0
+            for gram, weight in top:
+                postings[gram].append((tag, weight / norm))
+
+        self.postings = dict(postings)
+        self.indexed = True
+
+    def _weigh(self, grams: Counter) -> Dict[str, float]:
+        """计算 TF-IDF 向量（只保留历史中出现过的 n-gram）"""
+        return {
+            gram: (1 + math.log(count)) * self.idf[gram]
+            for gram, count in grams.items() if gram in self.idf
+        }
+
+    def rank(self, highlight_text: str, book_title: str = "") -> List[Tuple[str, float]]:
+        """
+        计算各标签的得分
+
+        Args:
+            highlight_text: 划线内容
+            book_title: 书名（只用于词表关键词匹配）
+
+        Returns:
+            [(标签, 得分)]，按得分从高到低排列
+        """
+        if not self.indexed:
+            with self.lock:
+                if not self.indexed:
+                    self.build_index()
+
+        scores: Dict[str, float] = defaultdict(float)
+
+        # 与历史标签画像的余弦相似度
+        if self.postings:
+            vector = self._weigh(char_ngrams(highlight_text))
+            norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+            for gram, weight in vector.items():
+                for tag, tag_weight in self.postings.get(gram, ()):
+                    scores[tag] += weight / norm * tag_weight
+
+        # 词表关键词命中直接加分（每个标签最多加 1 分）
+        for tag in self.matcher.score(f"{highlight_text} {book_title}"):
+            scores[tag] += 1.0
+
+        return sorted(
+            ((tag, score) for tag, score in scores.items() if score >= self.min_score),
+            key=lambda pair: -pair[1]
+        )
+
+    def tag(self, highlight_text: str, book_title: str = "", max_tags: int = 3) -> List[str]:
+        """
+        生成标签
+
+        Args:
+            highlight_text: 划线内容
+            book_title: 书名
+            max_tags: 最多返回的标签数
+
+        Returns:
+            按得分排序的标签列表
+        """
+        return [tag for tag, _ in self.rank(highlight_text, book_title)[:max_tags]]
+
+
+# 共享的标签引擎实例（延迟创建）
+_tagger: Optional[LocalTagger] = None
+# 工作线程可能同时首次获取，创建时加锁
+_lock = threading.Lock()
+
+
+def get_local_tagger() -> LocalTagger:
+    """获取共享的本地标签引擎"""
+    global _tagger
+    if _tagger is None:
+        with _lock:
+            if _tagger is None:
+                _tagger = LocalTagger(
+                    history_path=config.get_tag_history_file(),
+                    vocabulary=config.get_tag_vocabulary(),
+                    max_history=config.get_tag_history_max_entries()
+                )
+    return _tagger
+
+
+def save_local_tagger():
+    """保存共享标签引擎的标签历史（本次运行没有用到时不加载、不保存）"""
+    if _tagger is not None:
+        _tagger.save()
+
+
+def _on_config_reload(sections):
+    """tags 配置变化后更新共享标签引擎的词表"""
+    if _tagger is not None and 'tags' in sections:
+        _tagger.set_vocabulary(config.get_tag_vocabulary())
+
+
+config.add_reload_listener(_on_config_reload)
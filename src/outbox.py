@@ -0,0 +1,168 @@
+"""
+发件箱
+持久化保存已渲染但尚未发送成功的 flomo 笔记（发送失败或超出每日配额），
+下次运行时优先发送，避免重复获取数据和重复调用 AI。
+多次发送失败的笔记移入死信列表（保留在文件中供核对），不再阻塞后面的笔记
+"""
+import json
+import os
+import time
+import uuid
+from typing import Dict, List, Optional, Set, Tuple
+
+
+class Outbox:
+    """持久化的 flomo 笔记发件箱"""
+
+    def __init__(
+        self,
+        path: str = "outbox.json",
+        order: str = "fifo",
+        max_size: int = 1000,
+        max_attempts: int = 5
+    ):
+        """
+        初始化发件箱
+
+        Args:
+            path: 发件箱文件路径
+            order: 发送顺序，fifo（先进先出）或 priority（优先级高的先发）
+            max_size: 最多保存的笔记条数
+            max_attempts: 发送失败多少次后移入死信列表（0 表示不限制）
+        """
+        self.path = path
+        self.order = order
+        self.max_size = max_size
+        self.max_attempts = max_attempts
+        self.entries, self.dead = self.load()
+        self.pending_ids = {
+            bookmark_id
+            for entry in self.entries
+            for bookmark_id in entry.get("bookmark_ids", [])
+        }
+        # 死信中的划线不再重新同步（重新渲染通常会得到同样被拒绝的内容），
+        # 但也不会再发送，水位线可以越过它们；从文件的 dead 列表中删除即可让其重新同步
+        self.dead_ids = {
+            bookmark_id
+            for entry in self.dead
+            for bookmark_id in entry.get("bookmark_ids", [])
+        }
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def load(self) -> Tuple[List[Dict], List[Dict]]:
+        """加载发件箱文件，返回 (待发送条目, 死信条目)"""
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                return data.get("entries", []), data.get("dead", [])
+            except Exception as e:
+                print(f"⚠️  加载发件箱失败: {e}")
+        return [], []
+
+    def save(self):
+        """
+        保存发件箱文件（先写临时文件再替换，避免中断时损坏）
+
+        每次放入、移除条目后都会立即保存，运行中途崩溃也不会丢失已渲染的笔记
+        """
+        tmp_path = f"{self.path}.tmp"
+        try:
+            data = json.dumps({"entries": self.entries, "dead": self.dead}, ensure_ascii=False)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"⚠️  保存发件箱失败: {e}")
+
+    def is_full(self) -> bool:
+        """发件箱是否已满"""
+        return len(self.entries) >= self.max_size
+
+    def enqueue(
+        self,
+        content: str,
+        bookmark_ids: List[str],
+        book_id: str = "",
+        book_title: str = "",
+        priority: int = 0,
+        content_index: Optional[Dict[str, Dict]] = None
+    ) -> Dict:
+        """
+        放入一条已渲染的笔记
+
+        Args:
+            content: 渲染后的笔记内容
+            bookmark_ids: 笔记包含的划线ID
+            book_id: 书籍ID
+            book_title: 书名
+            priority: 优先级（越大越先发送，仅 priority 顺序下生效）
+            content_index: 发送成功后写入内容指纹索引的条目（包含 AI 标签和摘要）
+
+        Returns:
+            Dict: 发件箱条目
+        """
+        entry = {
+            "id": uuid.uuid4().hex,
+            "content": content,
+            "bookmark_ids": list(bookmark_ids),
+            "book_id": book_id,
+            "book_title": book_title,
+            "priority": priority,
+            "content_index": content_index or {},
+            "enqueued_at": time.time(),
+            "attempts": 0,
+        }
+        self.entries.append(entry)
+        self.pending_ids.update(entry["bookmark_ids"])
+        self.save()
+        return entry
+
+    def ordered_entries(self) -> List[Dict]:
+        """按发送顺序返回所有条目"""
+        if self.order == "priority":
+            return sorted(self.entries, key=lambda entry: (-entry.get("priority", 0), entry.get("enqueued_at", 0)))
+        return list(self.entries)
+
+    def remove(self, entry_id: str):
+        """移除已发送的条目"""
+        removed = [entry for entry in self.entries if entry["id"] == entry_id]
+        self.entries = [entry for entry in self.entries if entry["id"] != entry_id]
+        for entry in removed:
+            self.pending_ids.difference_update(entry.get("bookmark_ids", []))
+        self.save()
+
+    def mark_failed(self, entry_id: str) -> bool:
+        """
+        记录一次发送失败，失败次数达到 max_attempts 时移入死信列表
+
+        Args:
+            entry_id: 条目ID
+
+        Returns:
+            bool: 是否已移入死信列表
+        """
+        dead = False
+        for entry in list(self.entries):
+            if entry["id"] != entry_id:
+                continue
+            entry["attempts"] = entry.get("attempts", 0) + 1
+            if 0 < self.max_attempts <= entry["attempts"]:
+                entry["dead_at"] = time.time()
+                self.entries.remove(entry)
+                self.dead.append(entry)
+                self.pending_ids.difference_update(entry.get("bookmark_ids", []))
+                self.dead_ids.update(entry.get("bookmark_ids", []))
+                dead = True
+        self.save()
+        return dead
+
+    def get_pending_ids(self) -> Set[str]:
+        """获取发件箱中等待发送的划线ID（不含死信）"""
+        return self.pending_ids
+
+    def is_dead(self, bookmark_id: str) -> bool:
+        """划线是否已在死信列表中"""
+        return bookmark_id in self.dead_ids
@@ -0,0 +1,132 @@
+"""
+自适应速率限制器
+令牌桶 + AIMD（加性增、乘性减）：正常时尽快发送，服务端限流时自动退避
+"""
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    解析 Retry-After 响应头
+
+    Args:
+        value: 秒数或 HTTP 日期
+
+    Returns:
+        需要等待的秒数，无法解析时返回 None
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveRateLimiter:
+    """自适应令牌桶速率限制器"""
+
+    def __init__(
+        self,
+        initial_rate: float = 5.0,
+        min_rate: float = 1.0,
+        max_rate: float = 10.0,
+        increase_step: float = 0.5,
+        decrease_factor: float = 0.5,
+        burst: float = 1.0
+    ):
+        """
+        初始化速率限制器
+
+        Args:
+            initial_rate: 初始速率（次/秒），开始时尽量激进
+            min_rate: 退避后的最低速率（次/秒）
+            max_rate: 最高速率（次/秒）
+            increase_step: 每次成功后增加的速率（加性增）
+            decrease_factor: 被限流时速率乘以的系数（乘性减）
+            burst: 令牌桶容量（允许的突发请求数）
+        """
+        self.min_rate = min_rate
+        self.max_rate = max(max_rate, min_rate)
+        self.rate = min(max(initial_rate, self.min_rate), self.max_rate)
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.burst = max(burst, 1.0)
+
+        self.tokens = self.burst
+        self.last_refill = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+        # 统计
+        self.throttle_count = 0
+        self.total_wait = 0.0
+        self.min_rate_seen = self.rate
+
+    def _refill(self, now: float):
+        """按当前速率补充令牌"""
+        self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def acquire(self) -> float:
+        """
+        获取一个发送令牌，必要时等待
+
+        Returns:
+            float: 本次等待的秒数
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.blocked_until:
+                    delay = self.blocked_until - now
+                elif self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    self.total_wait += waited
+                    return waited
+                else:
+                    delay = (1.0 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def on_success(self):
+        """请求成功：加性提高速率"""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def on_throttle(self, retry_after: Optional[float] = None):
+        """
+        服务端限流或出错：乘性降低速率，并遵守 Retry-After
+
+        Args:
+            retry_after: 服务端要求等待的秒数
+        """
+        with self._lock:
+            self.throttle_count += 1
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            self.min_rate_seen = min(self.min_rate_seen, self.rate)
+            self.tokens = 0.0
+            wait = retry_after if retry_after is not None else 1.0 / self.rate
+            self.blocked_until = max(self.blocked_until, time.monotonic() + wait)
+
+    def get_stats(self) -> Dict[str, float]:
+        """获取限速器状态"""
+        return {
+            "rate": self.rate,
+            "min_rate_seen": self.min_rate_seen,
+            "throttle_count": self.throttle_count,
+            "total_wait": self.total_wait,
+        }
@@ -7,7 +7,10 @@ import sys
 import time
 import json
 from datetime import datetime, timedelta
-from typing import Dict, List, Set, Optional
+from typing import Dict, Iterable, Iterator, List, Set, Optional, Tuple
+
+# 启动计时起点：统计从导入各模块到发出第一个请求的耗时
+_IMPORT_START = time.perf_counter()
 
 # 支持两种运行方式：直接运行和作为模块导入
 try:
@@ -20,11 +23,23 @@ try:
         get_bookinfo,
         get_review_list
     )
-    from .flomo_client import FlomoClient
-    from .config_manager import config
+    from .flomo_client import FlomoClient, FlomoSendLog
+    from .outbox import Outbox
+    from .rate_limiter import AdaptiveRateLimiter
+    from .usage_ledger import get_usage_ledger
+    from .config_manager import config, ENV_SECTION
     from .template_renderer import TemplateRenderer, TagGenerator
     from .ai_tags import AITagGenerator
     from .ai_summary import AISummaryGenerator
+    from .ai_enrichment import AIEnrichmentGenerator
+    from .enrichment_router import EnrichmentRouter, TIER_CACHE, TIER_LLM, TIER_LOCAL, TIER_NAMES
+    from .ai_cache import get_ai_cache, save_ai_cache
+    from .local_tagger import save_local_tagger
+    from .tag_index import get_tag_index
+    from .ai_client import get_ai_client
+    from .ai_executor import get_ai_executor, get_request_budget
+    from .ai_budget import get_ai_budget, LEVEL_FULL, LEVEL_REDUCED, LEVEL_LOCAL, LEVEL_OFF, LEVEL_NAMES
+    from .highlight_utils import content_hash, merge_highlight_ranges
 except ImportError:
     # 如果相对导入失败，使用绝对导入（直接运行）
     # 将项目根目录添加到 sys.path
@@ -37,11 +52,23 @@ except ImportError:
         get_bookinfo,
         get_review_list
     )
-    from src.flomo_client import FlomoClient
-    from src.config_manager import config
+    from src.flomo_client import FlomoClient, FlomoSendLog
+    from src.outbox import Outbox
+    from src.rate_limiter import AdaptiveRateLimiter
+    from src.usage_ledger import get_usage_ledger
+    from src.config_manager import config, ENV_SECTION
     from src.template_renderer import TemplateRenderer, TagGenerator
     from src.ai_tags import AITagGenerator
     from src.ai_summary import AISummaryGenerator
+    from src.ai_enrichment import AIEnrichmentGenerator
+    from src.enrichment_router import EnrichmentRouter, TIER_CACHE, TIER_LLM, TIER_LOCAL, TIER_NAMES
+    from src.ai_cache import get_ai_cache, save_ai_cache
+    from src.local_tagger import save_local_tagger
+    from src.tag_index import get_tag_index
+    from src.ai_client import get_ai_client
+    from src.ai_executor import get_ai_executor, get_request_budget
+    from src.ai_budget import get_ai_budget, LEVEL_FULL, LEVEL_REDUCED, LEVEL_LOCAL, LEVEL_OFF, LEVEL_NAMES
+    from src.highlight_utils import content_hash, merge_highlight_ranges
 
 
 class SyncStatistics:
@@ -54,12 +81,20 @@ class SyncStatistics:
         self.synced_highlights = 0
         self.skipped_highlights = 0
         self.failed_highlights = 0
+        self.duplicate_highlights = 0  # 复用已有结果的重复划线
+        self.merged_highlights = 0  # 合并到其他笔记中的划线
+        self.digest_memos = 0  # 发送的摘要笔记数
+        self.queued_highlights = 0  # 放入发件箱的划线
+        self.outbox_highlights = 0  # 从发件箱发送的划线
+        self.config_reloads = 0  # 配置热重载次数
         
         # AI 统计
         self.ai_summary_generated = 0
         self.ai_summary_attempted = 0
         self.ai_tags_generated = 0
         self.ai_tags_attempted = 0
+        self.ai_cache_hits = 0
+        self.ai_cache_misses = 0
         
         # 书籍详情
         self.book_details = []  # [(书名, 作者, 同步数量)]
@@ -91,11 +126,24 @@ class SyncStatistics:
             return (self.ai_tags_generated / self.ai_tags_attempted) * 100
         return 0.0
 
+    def get_ai_cache_hit_rate(self) -> float:
+        """获取 AI 缓存命中率"""
+        total = self.ai_cache_hits + self.ai_cache_misses
+        if total > 0:
+            return (self.ai_cache_hits / total) * 100
+        return 0.0
+
 
 class WeRead2FlomoV2:
     """微信读书到 Flomo 的增强同步器"""
 
+    # 发件箱连续多少条笔记发送失败时停止发送（视为 flomo 暂时不可用）
+    OUTBOX_FAILURE_LIMIT = 3
+
     def __init__(self):
+        # 启动耗时：导入模块、加载配置到发出第一个请求
+        self.startup_time = time.perf_counter() - _IMPORT_START
+
         # 初始化微信读书API（获取cookie并初始化session）
         if not initialize_api():
             raise RuntimeError(
@@ -106,19 +154,53 @@ class WeRead2FlomoV2:
                 "参考文档：README.md 或 COOKIE_CLOUD_GUIDE.md"
             )
 
-        self.flomo_client = FlomoClient()
+        # 用量账本按 flomo 服务器时区记录每天的调用次数，多次运行共享配额
+        self.usage_ledger = get_usage_ledger()
+        self.flomo_client = FlomoClient(
+            daily_limit=config.get_flomo_daily_limit(),
+            ledger=self.usage_ledger,
+            rate_limiter=AdaptiveRateLimiter(**config.get_flomo_rate_limit()),
+            send_log=FlomoSendLog(config.get_flomo_send_log_file()),
+            max_retries=config.get_max_retries(),
+            ambiguous_policy=config.get_flomo_ambiguous_policy(),
+            timeout=config.get_flomo_timeout()
+        )
         self.template_renderer = TemplateRenderer()
         self.tag_generator = TagGenerator()
-        self.ai_tag_generator = AITagGenerator()
-        self.ai_summary_generator = AISummaryGenerator()
+        self.build_ai_generators()
+
+        # 配置参数
+        self.backfill = config.should_backfill()
+        # 回填模式同步整个书库，忽略时间限制
+        self.days_limit = 0 if self.backfill else config.get_days_limit()
 
         self.synced_file = "synced_bookmarks.json"
-        self.synced_ids = self.load_synced_ids()
+        sync_record = self.load_sync_record()
+        self.synced_ids = set(sync_record.get("synced_ids", []))
+        self.watermarks = self.load_watermarks(sync_record)
+        # 已发送内容的指纹索引（跨书籍去重），单独保存，不随同步记录提交
+        self.content_index_file = config.get_content_index_file()
+        self.content_index_max_entries = config.get_content_index_max_entries()
+        self.content_index = self.load_content_index(sync_record)
+
+        # 发件箱：保存已渲染但未发送成功的笔记
+        self.outbox = Outbox(
+            path=config.get_outbox_file(),
+            order=config.get_outbox_order(),
+            max_size=config.get_outbox_max_size(),
+            max_attempts=config.get_outbox_max_attempts()
+        )
 
-        # 配置参数
-        self.days_limit = config.get_days_limit()
         self.max_highlights = config.get_max_highlights()
         self.request_delay = config.get_request_delay()
+        self.load_sync_options()
+
+        # 配置热重载：处理书籍之间检查 config.yaml / .env 是否变化
+        self.hot_reload = config.should_hot_reload()
+
+        # AI 预算：剩余不足时逐级降级
+        self.ai_level = LEVEL_FULL
+        self.ai_priority_length = config.get_ai_budget_priority_length()
         
         # 统计信息
         self.stats = SyncStatistics()
@@ -132,7 +214,20 @@ class WeRead2FlomoV2:
         print(f"   - 时间限制: {self.days_limit}天" if self.days_limit > 0 else "   - 时间限制: 无限制（同步所有）")
         print(f"   - 每次最大划线数: {self.max_highlights}")
         print(f"   - 同步笔记: {'是' if config.should_sync_reviews() else '否'}")
-        print(f"   - 请求延迟: {self.request_delay}秒")
+        print(f"   - 重复划线策略: {self.duplicate_policy}")
+        if self.backfill:
+            print(f"   - 回填模式: 启用（忽略时间限制，超出配额的笔记放入发件箱）")
+        if len(self.outbox):
+            print(f"   - 发件箱: {len(self.outbox)} 条待发送（{self.outbox.order}）")
+        if self.outbox.dead:
+            print(f"   - 发件箱死信: {len(self.outbox.dead)} 条多次发送失败的笔记，请在 {self.outbox.path} 中核对")
+        if self.merge_highlights:
+            print(f"   - 合并相邻划线: 启用（间隔 ≤ {self.merge_gap} 字符）")
+        if self.digest_enabled:
+            group_name = '章节' if self.digest_group_by == 'chapter' else '书籍'
+            print(f"   - 摘要模式: 按{group_name}打包（每条最多 {self.digest_max_items} 条划线 / {self.digest_max_chars} 字符）")
+        print(f"   - 请求延迟: 自适应（限流时最长 {self.request_delay} 秒）")
+        print(f"   - 启动耗时: {self.startup_time * 1000:.0f} 毫秒（导入到首个请求）")
         
         # 模板配置
         print(f"\n📝 模板配置:")
@@ -146,7 +241,7 @@ class WeRead2FlomoV2:
         print(f"   - AI 提供商: {ai_provider}")
         if self.ai_tag_generator.is_enabled():
             print(f"   - AI 标签: ✅ 启用")
-            print(f"     · 最大标签数: {config.get('tags.max_ai_tags', 3)}")
+            print(f"     · 最大标签数: {config.settings.max_ai_tags}")
         else:
             print(f"   - AI 标签: ❌ 禁用")
         
@@ -154,25 +249,93 @@ class WeRead2FlomoV2:
             print(f"   - AI 摘要: ✅ 启用")
             print(f"     · 模型: {config.get_ai_model()}")
             print(f"     · 最小长度: {self.ai_summary_generator.min_length} 字符")
+            if self.ai_enrichment_generator.is_enabled():
+                print(f"     · 与 AI 标签合并为一次调用")
         else:
             print(f"   - AI 摘要: ❌ 禁用")
-        
+
+        # 批量生成同时适用于 AI 标签和 AI 摘要
+        if self.ai_enrichment_generator.supports_batch():
+            print(f"   - 批量生成: 每次最多 {config.get_ai_batch_size()} 条划线")
+
         # Flomo 配置
         print(f"\n📤 Flomo 配置:")
         print(f"   - 每日限制: {self.flomo_client.daily_limit} 次")
+        print(f"   - 今日已用: {self.flomo_client.get_daily_usage()} 次（剩余 {self.flomo_client.get_remaining_quota()} 次）")
+        print(f"   - 失败重试: 最多 {self.flomo_client.max_retries} 次（结果不确定时: {self.flomo_client.ambiguous_policy}）")
         
         print(f"\n{'='*70}\n")
 
-    def load_synced_ids(self) -> Set[str]:
-        """加载已同步的划线ID"""
+    def load_sync_record(self) -> Dict:
+        """加载同步记录文件"""
         if os.path.exists(self.synced_file):
             try:
                 with open(self.synced_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    return set(data.get("synced_ids", []))
+                    return json.load(f)
             except Exception as e:
                 print(f"⚠️  加载同步记录失败: {e}")
-        return set()
+        return {}
+
+    def load_synced_ids(self) -> Set[str]:
+        """加载已同步的划线ID"""
+        return set(self.load_sync_record().get("synced_ids", []))
+
+    def load_watermarks(self, sync_record: Dict) -> Dict[str, int]:
+        """
+        加载每本书的同步水位线
+
+        水位线是某本书中已完整同步的最新 createTime，水位线及以下的划线
+        要么已同步、要么超出时间限制。时间限制变化后旧水位线不再可靠，
+        此时丢弃水位线，本次运行退回逐条检查并重新建立。
+
+        Args:
+            sync_record: 同步记录文件内容
+
+        Returns:
+            Dict[str, int]: bookId -> 水位线时间戳
+        """
+        if sync_record.get("watermark_days_limit") != self.days_limit:
+            return {}
+        return {
+            book_id: int(mark)
+            for book_id, mark in sync_record.get("watermarks", {}).items()
+        }
+
+    def load_content_index(self, sync_record: Dict) -> Dict[str, Dict]:
+        """
+        加载内容指纹索引
+
+        旧版本把索引保存在同步记录中，索引文件不存在时从同步记录迁移，
+        下次保存同步记录时不再写入
+
+        Args:
+            sync_record: 同步记录文件内容
+
+        Returns:
+            Dict[str, Dict]: 内容指纹 -> 首次发送的划线信息（含 AI 标签和摘要）
+        """
+        if os.path.exists(self.content_index_file):
+            try:
+                with open(self.content_index_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"⚠️  加载内容指纹索引失败: {e}")
+        return dict(sync_record.get("content_index", {}))
+
+    def save_content_index(self):
+        """保存内容指纹索引（超出上限时淘汰最早加入的条目）"""
+        limit = self.content_index_max_entries
+        if limit > 0 and len(self.content_index) > limit:
+            keys = list(self.content_index)
+            for key in keys[:len(keys) - limit]:
+                del self.content_index[key]
+        tmp_path = f"{self.content_index_file}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.content_index, f, ensure_ascii=False)
+            os.replace(tmp_path, self.content_index_file)
+        except Exception as e:
+            print(f"⚠️  保存内容指纹索引失败: {e}")
 
     def save_synced_ids(self):
         """保存已同步的划线ID"""
@@ -180,6 +343,8 @@ class WeRead2FlomoV2:
             with open(self.synced_file, 'w', encoding='utf-8') as f:
                 json.dump({
                     "synced_ids": list(self.synced_ids),
+                    "watermarks": self.watermarks,
+                    "watermark_days_limit": self.days_limit,
                     "last_sync": datetime.now().isoformat(),
                     "total_synced": len(self.synced_ids)
                 }, f, ensure_ascii=False, indent=2)
@@ -196,35 +361,577 @@ class WeRead2FlomoV2:
                     return f"第{level}章 - {title}"
         return ""
 
-    def should_sync_bookmark(self, bookmark: Dict) -> bool:
+    def get_cutoff_time(self) -> int:
+        """获取时间限制对应的最早 createTime（0 表示不限制）"""
+        if self.days_limit > 0:
+            cutoff_date = datetime.now() - timedelta(days=self.days_limit)
+            return int(cutoff_date.timestamp())
+        return 0
+
+    def should_sync_bookmark(
+        self,
+        bookmark: Dict,
+        watermark: int = 0,
+        cutoff_time: Optional[int] = None
+    ) -> bool:
         """
         判断是否应该同步该划线
 
         Args:
             bookmark: 划线信息
+            watermark: 本书的同步水位线（0 表示没有水位线）
+            cutoff_time: 时间限制对应的最早 createTime，不传则按当前时间计算
 
         Returns:
             bool: 是否应该同步
         """
-        bookmark_id = bookmark.get("bookmarkId")
+        create_time = bookmark.get("createTime", 0)
 
-        # 检查是否已同步
-        if bookmark_id in self.synced_ids:
+        # 水位线及以下的划线已处理完毕，一次整数比较即可跳过
+        if 0 < create_time <= watermark:
             return False
 
-        # 检查时间限制
-        if self.days_limit > 0:
-            create_time = bookmark.get("createTime", 0)
-            if create_time > 0:
-                # 将秒转换为日期
-                bookmark_date = datetime.fromtimestamp(create_time)
-                cutoff_date = datetime.now() - timedelta(days=self.days_limit)
+        # 只有水位线以上的少量划线才需要精确检查是否已同步（或已在发件箱中等待发送、已成为死信）
+        bookmark_id = bookmark.get("bookmarkId")
+        if bookmark_id in self.synced_ids or bookmark_id in self.outbox.pending_ids:
+            return False
+        if self.outbox.is_dead(bookmark_id):
+            return False
 
-                if bookmark_date < cutoff_date:
-                    return False
+        # 检查时间限制
+        if cutoff_time is None:
+            cutoff_time = self.get_cutoff_time()
+        if cutoff_time > 0 and 0 < create_time < cutoff_time:
+            return False
 
         return True
 
+    def advance_watermark(self, book_id: str, bookmarks: List[Dict], cutoff_time: int) -> int:
+        """
+        推进本书的同步水位线
+
+        按 createTime 从旧到新检查水位线以上的划线，只要某个时间点上的划线
+        全部已同步（或超出时间限制、已成为发件箱死信），水位线就越过该时间点；
+        遇到第一条未同步的划线（例如因配额或发送失败被跳过、仍在发件箱中等待发送）
+        即停止，保证它下次仍会被检查。
+
+        Args:
+            book_id: 书籍ID
+            bookmarks: 本书的全部划线
+            cutoff_time: 时间限制对应的最早 createTime（0 表示不限制）
+
+        Returns:
+            int: 推进后的水位线
+        """
+        watermark = self.watermarks.get(book_id, 0)
+        pending = sorted(
+            (bm.get("createTime", 0), bm.get("bookmarkId"))
+            for bm in bookmarks
+            if bm.get("createTime", 0) > watermark
+        )
+
+        index = 0
+        while index < len(pending):
+            create_time = pending[index][0]
+            end = index
+            # 同一时间戳的划线必须全部完成，水位线才能越过该时间点
+            while end < len(pending) and pending[end][0] == create_time:
+                end += 1
+            if create_time >= cutoff_time and any(
+                bookmark_id not in self.synced_ids and not self.outbox.is_dead(bookmark_id)
+                for _, bookmark_id in pending[index:end]
+            ):
+                break
+            watermark = create_time
+            index = end
+
+        if watermark > 0:
+            self.watermarks[book_id] = watermark
+        return watermark
+
+    def enrich_highlight(
+        self,
+        book_title: str,
+        author: str,
+        marked_text: str
+    ) -> Tuple[List[str], Optional[str]]:
+        """
+        为划线生成 AI 标签和摘要
+
+        Args:
+            book_title: 书名
+            author: 作者
+            marked_text: 划线内容
+
+        Returns:
+            Tuple[List[str], Optional[str]]: (AI 标签, AI 摘要)
+        """
+        # 标签和摘要都需要时合并为一次 AI 调用
+        if self.ai_enrichment_generator.is_enabled():
+            self.stats.ai_tags_attempted += 1
+            self.stats.ai_summary_attempted += 1
+            try:
+                ai_tags, ai_summary = self.ai_enrichment_generator.enrich(
+                    book_title=book_title,
+                    author=author,
+                    highlight_text=marked_text
+                )
+            except Exception as e:
+                error_msg = f"AI生成失败: {e}"
+                print(f"   ⚠️  {error_msg}")
+                self.stats.warnings.append(error_msg)
+                return [], None
+            if ai_tags:
+                self.stats.ai_tags_generated += 1
+            if ai_summary:
+                self.stats.ai_summary_generated += 1
+                print(f"   🤖 AI提炼: {ai_summary[:50]}...")
+            return ai_tags, ai_summary
+
+        # 生成AI标签
+        ai_tags = []
+        if self.ai_tag_generator.is_enabled():
+            self.stats.ai_tags_attempted += 1
+            try:
+                ai_tags = self.ai_tag_generator.generate_tags(
+                    book_title=book_title,
+                    author=author,
+                    highlight_text=marked_text
+                )
+                if ai_tags:
+                    self.stats.ai_tags_generated += 1
+            except Exception as e:
+                error_msg = f"AI标签生成失败: {e}"
+                print(f"   ⚠️  {error_msg}")
+                self.stats.warnings.append(error_msg)
+
+        # 生成AI摘要
+        ai_summary = None
+        if self.ai_summary_generator.is_enabled():
+            self.stats.ai_summary_attempted += 1
+            try:
+                ai_summary = self.ai_summary_generator.generate_summary(
+                    highlight_text=marked_text,
+                    book_title=book_title,
+                    author=author
+                )
+                if ai_summary:
+                    self.stats.ai_summary_generated += 1
+                    print(f"   🤖 AI提炼: {ai_summary[:50]}...")
+            except Exception as e:
+                error_msg = f"AI摘要生成失败: {e}"
+                print(f"   ⚠️  {error_msg}")
+                self.stats.warnings.append(error_msg)
+
+        return ai_tags, ai_summary
+
+    def commit_sent(self, bookmark_ids: List[str], index_entries: Dict[str, Dict]):
+        """
+        记录发送成功的划线
+
+        Args:
+            bookmark_ids: 笔记包含的划线ID
+            index_entries: 写入内容指纹索引的条目
+        """
+        self.synced_ids.update(bookmark_ids)
+        self.content_index.update(index_entries)
+
+    def drain_outbox(self) -> int:
+        """
+        优先发送发件箱中的笔记
+
+        Returns:
+            int: 发送成功的划线数量
+        """
+        if not len(self.outbox):
+            return 0
+
+        print(f"\n📮 发件箱中有 {len(self.outbox)} 条待发送笔记")
+        sent_count = 0
+        # 单条笔记失败时跳过继续发送后面的笔记；连续多条失败时视为 flomo 暂时不可用
+        consecutive_failures = 0
+        for entry in self.outbox.ordered_entries():
+            if self.flomo_client.get_remaining_quota() <= 0:
+                warning_msg = f"已达到 flomo 每日API调用限制，发件箱剩余 {len(self.outbox)} 条"
+                print(f"\n⚠️  {warning_msg}")
+                self.stats.warnings.append(warning_msg)
+                break
+
+            if self.flomo_client.send_memo(entry["content"]):
+                # 先写入发送记录和同步记录，再移出发件箱：中途崩溃时下次运行能识别为已发送，不会重复发送
+                self.commit_sent(entry["bookmark_ids"], entry.get("content_index", {}))
+                self.flomo_client.flush()
+                self.save_synced_ids()
+                self.outbox.remove(entry["id"])
+                sent_count += len(entry["bookmark_ids"])
+                consecutive_failures = 0
+                continue
+
+            if self.outbox.mark_failed(entry["id"]):
+                error_msg = (f"发件箱笔记（《{entry.get('book_title', '')}》）已失败 {self.outbox.max_attempts} 次，"
+                             f"移入死信列表（{self.outbox.path}），不再重试")
+            else:
+                error_msg = f"发件箱笔记发送失败（《{entry.get('book_title', '')}》），下次重试"
+            print(f"   ⚠️  {error_msg}")
+            self.stats.errors.append(error_msg)
+
+            consecutive_failures += 1
+            if consecutive_failures >= self.OUTBOX_FAILURE_LIMIT:
+                warning_msg = f"发件箱连续 {consecutive_failures} 条笔记发送失败，flomo 可能暂时不可用，停止发送"
+                print(f"   ⚠️  {warning_msg}")
+                self.stats.warnings.append(warning_msg)
+                break
+
+        self.flomo_client.flush()
+        if sent_count > 0:
+            print(f"   ✓ 从发件箱发送了 {sent_count} 条划线")
+            self.stats.outbox_highlights += sent_count
+        return sent_count
+
+    def enrich_highlights(
+        self,
+        book_title: str,
+        author: str,
+        marked_texts: List[str]
+    ) -> List[Tuple[List[str], Optional[str]]]:
+        """
+        批量为同一本书的多条划线生成 AI 标签和摘要
+
+        Args:
+            book_title: 书名
+            author: 作者
+            marked_texts: 划线内容列表
+
+        Returns:
+            List[Tuple[List[str], Optional[str]]]: 与输入一一对应的 (AI 标签, AI 摘要)
+        """
+        executor = get_ai_executor()
+        # 没有需要调用 AI 接口的生成任务（AI 关闭或只用本地生成）时逐条处理，不占用线程池
+        if len(marked_texts) <= 1 or not self.ai_enrichment_generator.uses_ai() or not (
+            self.ai_enrichment_generator.supports_batch() or executor.max_workers > 1
+        ):
+            return [self.enrich_highlight(book_title, author, text) for text in marked_texts]
+
+        try:
+            if self.ai_enrichment_generator.supports_batch():
+                print(f"   🤖 批量生成 AI 标签/摘要: {len(marked_texts)} 条划线")
+                results = self.ai_enrichment_generator.enrich_batch(book_title, author, marked_texts)
+            else:
+                print(f"   🤖 并发生成 AI 标签/摘要: {len(marked_texts)} 条划线")
+                results = executor.map(
+                    lambda text: self.ai_enrichment_generator.enrich_one(book_title, author, text),
+                    marked_texts
+                )
+        except Exception as e:
+            error_msg = f"AI批量生成失败: {e}"
+            print(f"   ⚠️  {error_msg}")
+            self.stats.warnings.append(error_msg)
+            return [self.enrich_highlight(book_title, author, text) for text in marked_texts]
+
+        tags_enabled = self.ai_tag_generator.is_enabled()
+        summary_enabled = self.ai_summary_generator.is_enabled()
+        for ai_tags, ai_summary in results:
+            if tags_enabled:
+                self.stats.ai_tags_attempted += 1
+                if ai_tags:
+                    self.stats.ai_tags_generated += 1
+            if summary_enabled:
+                self.stats.ai_summary_attempted += 1
+                if ai_summary:
+                    self.stats.ai_summary_generated += 1
+        return results
+
+    def find_duplicate(self, marked_text: str) -> Optional[Dict]:
+        """按重复划线策略查找已发送过的相同内容"""
+        if self.duplicate_policy == 'off':
+            return None
+        text_hash = content_hash(marked_text)
+        if text_hash is None:
+            return None
+        return self.content_index.get(text_hash)
+
+    def update_ai_level(self) -> str:
+        """获取当前 AI 降级等级（预算不足或服务熔断时降级），等级变化时提示"""
+        level = get_ai_budget().get_level()
+        reason = "AI 预算不足"
+        client = get_ai_client()
+        if level in (LEVEL_FULL, LEVEL_REDUCED) and client.provider == 'openai' and client.endpoints and not client.is_healthy():
+            level = LEVEL_LOCAL
+            reason = "AI 服务不可用（熔断中）"
+
+        if level != self.ai_level:
+            if level == LEVEL_FULL:
+                print(f"   ✓ AI 服务已恢复")
+            else:
+                warning_msg = f"{reason}，切换为{LEVEL_NAMES[level]}模式"
+                print(f"   ⚠️  {warning_msg}")
+                self.stats.warnings.append(warning_msg)
+            self.ai_level = level
+        return level
+
+    @staticmethod
+    def has_note(bookmark: Dict, book_context: Dict) -> bool:
+        """划线（合并后的任一划线）是否带有笔记"""
+        reviews = book_context["reviews"]
+        bookmark_ids = bookmark.get("mergedIds") or [bookmark.get("bookmarkId")]
+        return any(reviews.get(item_id) for item_id in bookmark_ids)
+
+    def is_priority_highlight(self, bookmark: Dict, book_context: Dict) -> bool:
+        """预算精简模式下仍调用 AI 的划线：足够长，或带有笔记"""
+        if len(bookmark.get("markText", "")) >= self.ai_priority_length:
+            return True
+        return self.has_note(bookmark, book_context)
+
+    def local_enrichment(
+        self,
+        book_context: Dict,
+        marked_text: str,
+        with_summary: bool = False
+    ) -> Tuple[List[str], Optional[str]]:
+        """
+        不调用 AI 的结果：启用 AI 标签时改用本地标签引擎生成
+
+        Args:
+            book_context: 本书的上下文
+            marked_text: 划线内容
+            with_summary: 是否生成本地摘要（分流到本地时生成；预算降级时不生成）
+
+        Returns:
+            Tuple[List[str], Optional[str]]: (标签, 摘要)
+        """
+        if self.ai_level == LEVEL_OFF:
+            return [], None
+        tags = []
+        if self.ai_tag_generator.is_enabled():
+            tags = self.ai_tag_generator.generate_local_tags(
+                book_context["book_title"], book_context["author"], marked_text
+            )
+        summary = None
+        if with_summary and self.ai_summary_generator.should_summarize(marked_text):
+            summary = self.ai_summary_generator.local_summarizer.summarize(marked_text)
+        return tags, summary
+
+    def prepare_highlights(self, bookmarks: List[Dict], book_context: Dict) -> Iterator[Dict]:
+        """
+        分批准备待发送的划线
+
+        每 ai.batch_size × ai.concurrency 条划线先统一（并发）生成 AI 结果（重复划线
+        不调用 AI），再逐条准备，下游发送失败或达到配额时后续批次不会再调用 AI
+
+        Args:
+            bookmarks: 待同步的划线列表
+            book_context: 本书的上下文
+
+        Yields:
+            Dict: 待渲染的划线条目
+        """
+        chunk_size = max(config.get_ai_batch_size(), 1) * get_ai_executor().max_workers
+        for start in range(0, len(bookmarks), chunk_size):
+            chunk = bookmarks[start:start + chunk_size]
+            need_ai = [
+                bookmark for bookmark in chunk
+                if not self.find_duplicate(bookmark.get("markText", ""))
+            ]
+
+            # 按剩余 AI 预算和分流结果决定哪些划线调用 AI，其余本地处理或不生成
+            level = self.update_ai_level()
+            cached, local = [], []
+            if level == LEVEL_FULL:
+                routes = {
+                    id(bookmark): self.enrichment_router.route(
+                        bookmark.get("markText", ""),
+                        self.has_note(bookmark, book_context),
+                        book_context["category"]
+                    )
+                    for bookmark in need_ai
+                }
+                cached = [bookmark for bookmark in need_ai if routes[id(bookmark)] == TIER_CACHE]
+                local = [bookmark for bookmark in need_ai if routes[id(bookmark)] == TIER_LOCAL]
+                need_ai = [bookmark for bookmark in need_ai if routes[id(bookmark)] == TIER_LLM]
+            elif level == LEVEL_REDUCED:
+                local = [bookmark for bookmark in need_ai if not self.is_priority_highlight(bookmark, book_context)]
+                need_ai = [bookmark for bookmark in need_ai if self.is_priority_highlight(bookmark, book_context)]
+            else:
+                local, need_ai = need_ai, []
+
+            enrichments = {}
+            started = time.time()
+            for bookmark in local:
+                enrichments[id(bookmark)] = self.local_enrichment(
+                    book_context, bookmark.get("markText", ""), with_summary=level == LEVEL_FULL
+                )
+            self.enrichment_router.record(TIER_LOCAL, len(local), time.time() - started)
+
+            for tier, tier_bookmarks in ((TIER_CACHE, cached), (TIER_LLM, need_ai)):
+                if not tier_bookmarks:
+                    continue
+                started = time.time()
+                enrichments.update(zip(
+                    (id(bookmark) for bookmark in tier_bookmarks),
+                    self.enrich_highlights(
+                        book_context["book_title"],
+                        book_context["author"],
+                        [bookmark.get("markText", "") for bookmark in tier_bookmarks]
+                    )
+                ))
+                self.enrichment_router.record(tier, len(tier_bookmarks), time.time() - started)
+            for bookmark in chunk:
+                item = self.prepare_highlight(bookmark, book_context, enrichments.get(id(bookmark)))
+                if item is not None:
+                    yield item
+
+    def prepare_highlight(
+        self,
+        bookmark: Dict,
+        book_context: Dict,
+        enrichment: Optional[Tuple[List[str], Optional[str]]] = None
+    ) -> Optional[Dict]:
+        """
+        准备一条待发送的划线：查重、生成 AI 标签/摘要和完整标签
+
+        Args:
+            bookmark: 划线信息（可能是合并后的划线）
+            book_context: 本书的上下文（书名、作者、分类、章节、笔记等）
+            enrichment: 已批量生成的 (AI 标签, AI 摘要)，不提供则逐条生成
+
+        Returns:
+            Optional[Dict]: 待渲染的划线条目，按重复策略跳过时返回 None
+        """
+        book_title = book_context["book_title"]
+        author = book_context["author"]
+        reviews = book_context["reviews"]
+
+        bookmark_id = bookmark.get("bookmarkId")
+        # 合并后的笔记包含多条划线
+        bookmark_ids = bookmark.get("mergedIds") or [bookmark_id]
+        marked_text = bookmark.get("markText", "")
+        chapter_uid = bookmark.get("chapterUid", 0)
+        create_time = bookmark.get("createTime", 0)
+
+        # 获取章节名称
+        chapter_name = self.get_chapter_name(book_context["chapters"], chapter_uid)
+
+        # 获取笔记
+        note_text = "\n".join(
+            reviews[item_id] for item_id in bookmark_ids if reviews.get(item_id)
+        )
+
+        # 格式化时间
+        if create_time > 0:
+            create_time_str = datetime.fromtimestamp(create_time).strftime("%Y-%m-%d")
+        else:
+            create_time_str = datetime.now().strftime("%Y-%m-%d")
+
+        # 检查是否为已发送过的重复内容（跨书籍）
+        text_hash = content_hash(marked_text)
+        duplicate = self.find_duplicate(marked_text)
+
+        if duplicate and self.duplicate_policy == 'skip':
+            print(f"   ⏭️  跳过重复划线（已收录于《{duplicate.get('book_title', '')}》）: {marked_text[:30]}...")
+            self.synced_ids.update(bookmark_ids)
+            self.stats.skipped_highlights += len(bookmark_ids)
+            return None
+
+        if duplicate:
+            # 复用已有的 AI 结果，不再调用 AI
+            ai_tags = list(duplicate.get("ai_tags", []))
+            ai_summary = duplicate.get("ai_summary")
+            self.stats.duplicate_highlights += 1
+        elif enrichment is not None:
+            ai_tags, ai_summary = enrichment
+        else:
+            ai_tags, ai_summary = self.enrich_highlight(book_title, author, marked_text)
+
+        # 生成所有标签（书名 / 分类 / 作者标签按书预先算好，只合并 AI 标签）
+        tags = book_context["tag_context"].merge(ai_tags)
+
+        return {
+            "bookmark_id": bookmark_id,
+            "bookmark_ids": bookmark_ids,
+            "highlight_text": marked_text,
+            "text_hash": text_hash,
+            "chapter_uid": chapter_uid,
+            "chapter_name": chapter_name,
+            "note_text": note_text,
+            "create_time": create_time_str,
+            "duplicate": duplicate,
+            "ai_tags": ai_tags,
+            "ai_summary": ai_summary,
+            "tags": tags,
+        }
+
+    def render_highlight(self, item: Dict, book_context: Dict) -> str:
+        """渲染单条划线笔记"""
+        duplicate = item["duplicate"]
+        if duplicate and self.duplicate_policy == 'link':
+            # 只发送指向首次收录来源的简短笔记
+            return self.template_renderer.render_duplicate_link(
+                highlight_text=item["highlight_text"],
+                source_book_title=duplicate.get("book_title", ""),
+                source_time=duplicate.get("create_time", ""),
+                tags=item["tags"]
+            )
+
+        # 渲染内容（AI 摘要作为独立参数传递）
+        return self.template_renderer.render(
+            template=book_context["template"],
+            book_title=book_context["book_title"],
+            author=book_context["author"],
+            highlight_text=item["highlight_text"],
+            chapter_name=item["chapter_name"],
+            book_url=book_context["book_url"],
+            note_text=item["note_text"],
+            create_time=item["create_time"],
+            tags=item["tags"],
+            ai_summary=item["ai_summary"] or ""
+        )
+
+    def group_digest_items(self, items: Iterable[Dict]) -> Iterator[List[Dict]]:
+        """
+        把划线条目打包为摘要笔记
+
+        按书（或章节）分组，每组不超过 max_items 条、正文不超过 max_chars 字符
+
+        Args:
+            items: 待发送的划线条目
+
+        Yields:
+            List[Dict]: 一条摘要笔记包含的划线条目
+        """
+        batch = []
+        batch_chars = 0
+        for item in items:
+            item_chars = len(item["highlight_text"]) + len(item["note_text"]) + len(item["ai_summary"] or "")
+            if batch and (
+                len(batch) >= self.digest_max_items
+                or batch_chars + item_chars > self.digest_max_chars
+                or (self.digest_group_by == 'chapter' and item["chapter_uid"] != batch[0]["chapter_uid"])
+            ):
+                yield batch
+                batch = []
+                batch_chars = 0
+            batch.append(item)
+            batch_chars += item_chars
+        if batch:
+            yield batch
+
+    def render_digest(self, items: List[Dict], book_context: Dict) -> str:
+        """渲染包含多条划线的摘要笔记"""
+        # 合并所有条目的标签（去重并保持顺序）
+        tags = list(dict.fromkeys(tag for item in items for tag in item["tags"]))
+        chapter_name = items[0]["chapter_name"] if self.digest_group_by == 'chapter' else ""
+
+        return self.template_renderer.render_digest(
+            template=config.get_digest_template(),
+            item_template=config.get_digest_item_template(),
+            book_title=book_context["book_title"],
+            author=book_context["author"],
+            items=items,
+            chapter_name=chapter_name,
+            book_url=book_context["book_url"],
+            tags=tags
+        )
+
     def sync_book(self, book: Dict, max_count: Optional[int] = None) -> int:
         """
         同步单本书的划线
@@ -247,7 +954,7 @@ class WeRead2FlomoV2:
         book_synced_count = 0  # 本书同步的划线数
 
         # 判断书籍分类
-        category = config.get_book_category(book_title, author)
+        category = config.get_book_category(book_title, author, book_id=bookId)
         if category:
             print(f"   分类: {category}")
 
@@ -283,10 +990,12 @@ class WeRead2FlomoV2:
                 if bookmark_id:
                     reviews[bookmark_id] = review.get("content", "")
 
-        # 过滤需要同步的划线
+        # 过滤需要同步的划线（先用水位线跳过历史划线）
+        watermark = self.watermarks.get(bookId, 0)
+        cutoff_time = self.get_cutoff_time()
         new_bookmarks = [
             bm for bm in bookmarks
-            if self.should_sync_bookmark(bm)
+            if self.should_sync_bookmark(bm, watermark, cutoff_time)
         ]
         
         # 详细输出过滤信息
@@ -296,6 +1005,7 @@ class WeRead2FlomoV2:
 
         if not new_bookmarks:
             print(f"   ⚠️  没有新的划线需要同步")
+            self.advance_watermark(bookId, bookmarks, cutoff_time)
             return 0
 
         # 限制数量（使用全局配额或默认限制）
@@ -306,107 +1016,105 @@ class WeRead2FlomoV2:
         else:
             print(f"   找到 {len(new_bookmarks)} 条新划线")
 
-        synced_count = 0
-
-        for bookmark in new_bookmarks:
-            bookmark_id = bookmark.get("bookmarkId")
-            marked_text = bookmark.get("markText", "")
-            chapter_uid = bookmark.get("chapterUid", 0)
-            create_time = bookmark.get("createTime", 0)
-
-            # 获取章节名称
-            chapter_name = self.get_chapter_name(chapters, chapter_uid)
+        # 合并同一章节中重叠或相邻的划线
+        if self.merge_highlights:
+            merged_bookmarks = merge_highlight_ranges(new_bookmarks, gap=self.merge_gap)
+            if len(merged_bookmarks) < len(new_bookmarks):
+                print(f"   🔗 合并相邻划线: {len(new_bookmarks)} 条 → {len(merged_bookmarks)} 条笔记")
+                self.stats.merged_highlights += len(new_bookmarks) - len(merged_bookmarks)
+            new_bookmarks = merged_bookmarks
+
+        # 摘要模式下按章节分组时，先让同一章节的划线相邻
+        if self.digest_enabled and self.digest_group_by == 'chapter':
+            new_bookmarks = sorted(new_bookmarks, key=lambda bm: bm.get("chapterUid", 0))
+
+        book_context = {
+            "book_title": book_title,
+            "author": author,
+            "category": category,
+            "template": template,
+            "book_url": book_url,
+            "chapters": chapters,
+            "reviews": reviews,
+            "tag_context": self.tag_generator.book_context(book_title, author, category),
+        }
+
+        # 分批准备（去重、AI 生成、标签），按需逐条或打包发送
+        prepared_items = self.prepare_highlights(new_bookmarks, book_context)
+        if self.digest_enabled:
+            batches = self.group_digest_items(prepared_items)
+        else:
+            batches = ([item] for item in prepared_items)
 
-            # 获取笔记
-            note_text = reviews.get(bookmark_id, "")
+        synced_count = 0
 
-            # 格式化时间
-            if create_time > 0:
-                create_time_str = datetime.fromtimestamp(create_time).strftime("%Y-%m-%d")
+        for batch in batches:
+            if len(batch) == 1:
+                content = self.render_highlight(batch[0], book_context)
             else:
-                create_time_str = datetime.now().strftime("%Y-%m-%d")
-
-            # 生成AI标签
-            ai_tags = []
-            if self.ai_tag_generator.is_enabled():
-                self.stats.ai_tags_attempted += 1
-                try:
-                    ai_tags = self.ai_tag_generator.generate_tags(
-                        book_title=book_title,
-                        author=author,
-                        highlight_text=marked_text
-                    )
-                    if ai_tags:
-                        self.stats.ai_tags_generated += 1
-                except Exception as e:
-                    error_msg = f"AI标签生成失败: {e}"
-                    print(f"   ⚠️  {error_msg}")
-                    self.stats.warnings.append(error_msg)
-
-            # 生成AI摘要
-            ai_summary = None
-            if self.ai_summary_generator.is_enabled():
-                self.stats.ai_summary_attempted += 1
-                try:
-                    ai_summary = self.ai_summary_generator.generate_summary(
-                        highlight_text=marked_text,
-                        book_title=book_title,
-                        author=author
-                    )
-                    if ai_summary:
-                        self.stats.ai_summary_generated += 1
-                        print(f"   🤖 AI提炼: {ai_summary[:50]}...")
-                except Exception as e:
-                    error_msg = f"AI摘要生成失败: {e}"
-                    print(f"   ⚠️  {error_msg}")
-                    self.stats.warnings.append(error_msg)
-
-            # 生成所有标签
-            tags = self.tag_generator.generate_tags(
-                book_title=book_title,
-                author=author,
-                highlight_text=marked_text,
-                category=category,
-                ai_tags=ai_tags
-            )
-
-            # 渲染内容（AI 摘要作为独立参数传递）
-            content = self.template_renderer.render(
-                template=template,
-                book_title=book_title,
-                author=author,
-                highlight_text=marked_text,
-                chapter_name=chapter_name,
-                book_url=book_url,
-                note_text=note_text,
-                create_time=create_time_str,
-                tags=tags,
-                ai_summary=ai_summary or ""
-            )
+                content = self.render_digest(batch, book_context)
+
+            bookmark_ids = [item_id for item in batch for item_id in item["bookmark_ids"]]
+            index_entries = {
+                item["text_hash"]: {
+                    "bookmark_id": item["bookmark_id"],
+                    "book_title": book_title,
+                    "create_time": item["create_time"],
+                    "ai_tags": item["ai_tags"],
+                    "ai_summary": item["ai_summary"]
+                }
+                for item in batch if not item["duplicate"] and item["text_hash"]
+            }
+
+            # 配额已用完时（只有回填模式会走到这里），渲染结果直接放入发件箱
+            quota_exhausted = self.flomo_client.get_remaining_quota() <= 0
 
             # 发送到 flomo
-            success = self.flomo_client.send_memo(content)
+            success = not quota_exhausted and self.flomo_client.send_memo(content)
 
             if success:
-                self.synced_ids.add(bookmark_id)
-                synced_count += 1
-                book_synced_count += 1
-                # 添加延迟
-                time.sleep(self.request_delay)
+                self.commit_sent(bookmark_ids, index_entries)
+                synced_count += len(bookmark_ids)
+                book_synced_count += len(bookmark_ids)
+                if len(batch) > 1:
+                    self.stats.digest_memos += 1
             else:
-                self.stats.failed_highlights += 1
-                error_msg = f"发送失败: {marked_text[:30]}..."
-                print(f"   跳过划线: {marked_text[:30]}...")
-                self.stats.errors.append(error_msg)
-                break
+                # 已渲染的内容（包括 AI 结果）放入发件箱，下次运行优先发送
+                self.outbox.enqueue(
+                    content=content,
+                    bookmark_ids=bookmark_ids,
+                    book_id=bookId,
+                    book_title=book_title,
+                    priority=1 if any(item["note_text"] for item in batch) else 0,
+                    content_index=index_entries
+                )
+                self.stats.queued_highlights += len(bookmark_ids)
+
+                if not quota_exhausted:
+                    self.stats.failed_highlights += len(bookmark_ids)
+                    marked_text = batch[0]["highlight_text"]
+                    error_msg = f"发送失败（已放入发件箱）: {marked_text[:30]}..."
+                    print(f"   跳过划线: {marked_text[:30]}...")
+                    self.stats.errors.append(error_msg)
+                    break
+
+                if self.outbox.is_full():
+                    warning_msg = f"发件箱已满（{self.outbox.max_size} 条），停止回填"
+                    print(f"\n⚠️  {warning_msg}")
+                    self.stats.warnings.append(warning_msg)
+                    break
+                continue
 
-            # 检查是否达到每日限制
-            if self.flomo_client.get_request_count() >= self.flomo_client.daily_limit:
+            # 检查是否达到每日限制（回填模式继续渲染并放入发件箱）
+            if self.flomo_client.get_remaining_quota() <= 0 and not self.backfill:
                 warning_msg = "已达到 flomo 每日API调用限制"
                 print(f"\n⚠️  {warning_msg}")
                 self.stats.warnings.append(warning_msg)
                 break
 
+        # 推进水位线（被配额或失败跳过的划线会挡住水位线，下次继续处理）
+        self.advance_watermark(bookId, bookmarks, cutoff_time)
+
         # 记录本书的同步详情
         if book_synced_count > 0:
             self.stats.book_details.append((book_title, author, book_synced_count))
@@ -419,22 +1127,45 @@ class WeRead2FlomoV2:
         print("🚀 开始同步微信读书划线到 flomo")
         print("=" * 70)
 
+        # 先发送上次遗留在发件箱中的笔记
+        outbox_synced = self.drain_outbox()
+        self.stats.synced_highlights += outbox_synced
+
+        # 今日配额已用完时不再请求微信读书，避免白白拉取数据
+        # （回填模式下只要发件箱未满，仍继续渲染并放入发件箱）
+        flomo_remaining = self.flomo_client.get_remaining_quota()
+        if flomo_remaining <= 0 and (not self.backfill or self.outbox.is_full()):
+            warning_msg = f"今日 flomo 配额已用完（{self.flomo_client.get_daily_usage()}/{self.flomo_client.daily_limit}），跳过本次同步"
+            print(f"\n⚠️  {warning_msg}")
+            self.stats.warnings.append(warning_msg)
+            self.save_state()
+            self._print_detailed_summary(outbox_synced, 0, 0)
+            return
+
         # 获取书籍列表
         books = get_notebooklist()
 
         if not books:
             print("❌ 没有找到任何书籍")
+            self.save_state()
             return
 
         self.stats.total_books = len(books)
         print(f"\n📖 找到 {len(books)} 本书")
 
-        total_synced = 0
+        total_synced = outbox_synced
         processed_books = 0
         remaining_quota = self.max_highlights  # 全局剩余配额
+        # 每条划线一次调用时，按 flomo 今日真实剩余配额规划本次工作量
+        if not (self.digest_enabled or self.merge_highlights or self.backfill) and flomo_remaining < remaining_quota:
+            print(f"   flomo 今日剩余 {flomo_remaining} 次调用，本次最多同步 {flomo_remaining} 条划线")
+            remaining_quota = flomo_remaining
 
         for book in books:
             try:
+                if self.hot_reload:
+                    self.reload_config()
+
                 # 如果已达到全局限制，停止处理
                 if remaining_quota <= 0:
                     warning_msg = f"已达到全局划线限制 ({self.max_highlights} 条)"
@@ -442,34 +1173,94 @@ class WeRead2FlomoV2:
                     self.stats.warnings.append(warning_msg)
                     break
 
+                queued_before = self.stats.queued_highlights
                 synced_count = self.sync_book(book, max_count=remaining_quota)
+                # 每本书处理完把发送状态写入幂等记录
+                self.flomo_client.flush()
                 total_synced += synced_count
                 self.stats.synced_highlights += synced_count
-                remaining_quota -= synced_count
+                # 放入发件箱的划线同样占用本次配额
+                remaining_quota -= synced_count + (self.stats.queued_highlights - queued_before)
                 processed_books += 1
                 self.stats.processed_books += 1
 
-                # 检查是否达到每日限制
-                if self.flomo_client.get_request_count() >= self.flomo_client.daily_limit:
+                # 检查是否达到每日限制（回填模式下直到发件箱装满）
+                if self.flomo_client.get_remaining_quota() <= 0 and (not self.backfill or self.outbox.is_full()):
                     print(f"\n⚠️  已达到每日同步限制，停止同步")
                     break
 
-                # 书籍之间添加延迟
-                if synced_count > 0:
-                    time.sleep(2)
-
             except Exception as e:
                 error_msg = f"处理书籍时出错: {e}"
                 print(f"\n⚠️  {error_msg}")
                 self.stats.errors.append(error_msg)
                 continue
 
-        # 保存同步记录
-        self.save_synced_ids()
+        # 保存同步记录、发件箱、AI 缓存和标签历史
+        self.save_state()
 
         # 输出详细统计信息
         self._print_detailed_summary(total_synced, processed_books, len(books))
 
+    def build_ai_generators(self):
+        """根据当前配置创建 AI 标签、摘要、合并生成器和分流器"""
+        self.ai_tag_generator = AITagGenerator()
+        self.ai_summary_generator = AISummaryGenerator()
+        self.ai_enrichment_generator = AIEnrichmentGenerator(
+            self.ai_tag_generator,
+            self.ai_summary_generator
+        )
+        self.enrichment_router = EnrichmentRouter(
+            self.ai_tag_generator,
+            self.ai_summary_generator,
+            **config.get_ai_router()
+        )
+
+    def load_sync_options(self):
+        """读取逐本书生效的同步选项（重复策略、合并相邻划线、摘要模式）"""
+        self.duplicate_policy = config.get_duplicate_policy()
+        self.merge_highlights = config.should_merge_highlights()
+        self.merge_gap = config.get_merge_gap()
+
+        # 摘要模式：把多条划线打包成一条 flomo 笔记
+        self.digest_enabled = config.should_enable_digest()
+        self.digest_group_by = config.get_digest_group_by()
+        self.digest_max_items = config.get_digest_max_items()
+        self.digest_max_chars = config.get_digest_max_chars()
+
+    def reload_config(self):
+        """
+        config.yaml 或 .env 变化时重新加载配置（在两本书之间调用）
+
+        分类、模板、标签相关的缓存由各模块的重新加载回调清理；这里只更新同步选项，
+        ai 配置变化时重建 AI 生成器（保留分流统计，共享的 AI 客户端、会话和缓存不变）。
+        本次运行的配额规划（时间限制、最大划线数、回填）不随重新加载变化
+        """
+        changed = config.reload_if_changed()
+        if not changed:
+            return
+
+        print(f"\n🔄 配置已重新加载（变化: {', '.join(sorted(changed))}）")
+        self.stats.config_reloads += 1
+
+        if changed & {'sync', ENV_SECTION}:
+            self.load_sync_options()
+
+        if changed & {'ai', ENV_SECTION}:
+            router = self.enrichment_router
+            self.build_ai_generators()
+            self.enrichment_router.counts = router.counts
+            self.enrichment_router.durations = router.durations
+            self.ai_priority_length = config.get_ai_budget_priority_length()
+
+    def save_state(self):
+        """保存同步记录、内容指纹索引、发件箱、AI 缓存和标签历史"""
+        self.save_synced_ids()
+        self.save_content_index()
+        self.flomo_client.flush()
+        self.outbox.save()
+        save_ai_cache()
+        save_local_tagger()
+
     def _print_detailed_summary(self, total_synced: int, processed_books: int, total_books: int):
         """输出详细的同步摘要"""
         duration = self.stats.get_duration()
@@ -485,6 +1276,16 @@ class WeRead2FlomoV2:
         print(f"   - 本次新同步: {total_synced} 条划线")
         print(f"   - 累计已同步: {len(self.synced_ids)} 条划线")
         print(f"   - 失败数量: {self.stats.failed_highlights} 条")
+        if self.stats.skipped_highlights or self.stats.duplicate_highlights:
+            print(f"   - 重复划线: 跳过 {self.stats.skipped_highlights} 条，复用 {self.stats.duplicate_highlights} 条")
+        if self.stats.merged_highlights:
+            print(f"   - 合并划线: 节省 {self.stats.merged_highlights} 条笔记")
+        if self.stats.digest_memos:
+            print(f"   - 摘要笔记: {self.stats.digest_memos} 条")
+        if self.stats.outbox_highlights or self.stats.queued_highlights:
+            print(f"   - 发件箱: 发送 {self.stats.outbox_highlights} 条，新放入 {self.stats.queued_highlights} 条，剩余 {len(self.outbox)} 条笔记")
+        if self.stats.config_reloads:
+            print(f"   - 配置热重载: {self.stats.config_reloads} 次")
         
         # 性能指标
         print(f"\n⏱️  性能指标:")
@@ -493,19 +1294,33 @@ class WeRead2FlomoV2:
             print(f"   - 平均速度: {speed:.1f} 条/分钟")
             print(f"   - 平均耗时: {duration/total_synced:.1f} 秒/条")
         
-        # API 使用情况
-        api_count = self.flomo_client.get_request_count()
+        # API 使用情况（今日累计，包括之前的运行）
+        api_count = self.flomo_client.get_daily_usage()
         api_limit = self.flomo_client.daily_limit
         api_usage = (api_count / api_limit) * 100
-        api_remaining = api_limit - api_count
+        api_remaining = self.flomo_client.get_remaining_quota()
+        run_count = self.flomo_client.get_request_count()
         
         print(f"\n📤 API 使用情况:")
         print(f"   - API 调用: {api_count}/{api_limit} 次")
+        print(f"   - 本次调用: {run_count} 次")
         print(f"   - 使用率: {api_usage:.1f}%")
         print(f"   - 剩余配额: {api_remaining} 次")
-        if api_remaining > 0 and total_synced > 0:
-            estimated_more = int(api_remaining / (api_count / total_synced))
+        if api_remaining > 0 and total_synced > 0 and run_count > 0:
+            estimated_more = int(api_remaining / (run_count / total_synced))
             print(f"   - 预计还可同步: 约 {estimated_more} 条")
+
+        # 发送速率
+        limiter_stats = self.flomo_client.rate_limiter.get_stats()
+        print(f"   - 发送速率: {limiter_stats['rate']:.1f} 次/秒（最低 {limiter_stats['min_rate_seen']:.1f}）")
+        if limiter_stats['throttle_count'] > 0:
+            print(f"   - 限流退避: {limiter_stats['throttle_count']} 次，累计等待 {limiter_stats['total_wait']:.1f} 秒")
+        if self.flomo_client.retry_count > 0:
+            print(f"   - 自动重试: {self.flomo_client.retry_count} 次")
+        if self.flomo_client.deduplicated_count > 0:
+            print(f"   - 幂等跳过: {self.flomo_client.deduplicated_count} 条（相同内容已发送）")
+        if self.flomo_client.ambiguous_count > 0:
+            print(f"   - 结果不确定: {self.flomo_client.ambiguous_count} 次（策略: {self.flomo_client.ambiguous_policy}）")
         
         # AI 功能统计
         if self.ai_summary_generator.is_enabled() or self.ai_tag_generator.is_enabled():
@@ -524,6 +1339,54 @@ class WeRead2FlomoV2:
                 print(f"     · 尝试: {self.stats.ai_tags_attempted} 次")
                 print(f"     · 成功: {self.stats.ai_tags_generated} 次")
                 print(f"     · 成功率: {tags_rate:.1f}%")
+
+            usage = get_ai_budget().get_stats()
+            if usage['request_count'] > 0:
+                print(f"   - AI 用量:")
+                print(f"     · 本次: {usage['request_count']} 次请求，{usage['total_tokens']} tokens"
+                      f"（输入 {usage['prompt_tokens']} / 输出 {usage['completion_tokens']}）")
+                if usage['cost'] > 0:
+                    print(f"     · 本次费用: {usage['cost']:.4f}（今日累计 {usage['daily_cost']:.4f}）")
+                print(f"     · 今日累计: {int(usage['daily_tokens'])} tokens")
+                if usage['level'] != LEVEL_FULL:
+                    print(f"     · 预算状态: {LEVEL_NAMES[usage['level']]}")
+
+            client_stats = get_ai_client().get_stats()
+            if client_stats['trip_count'] > 0:
+                print(f"   - AI 熔断: {client_stats['trip_count']} 次，跳过 {client_stats['rejected_count']} 次请求")
+            if client_stats['max_p95'] is not None:
+                print(f"   - AI 响应耗时 p95: {client_stats['max_p95']:.1f} 秒")
+            if len(client_stats['endpoints']) > 1:
+                print(f"   - AI 接口: 对冲 {client_stats['hedge_count']} 次，切换 {client_stats['failover_count']} 次")
+                for endpoint in client_stats['endpoints']:
+                    p90 = f"{endpoint['p90']:.1f} 秒" if endpoint['p90'] is not None else "-"
+                    print(f"     · {endpoint['name']}: 请求 {endpoint['request_count']} 次，"
+                          f"胜出 {endpoint['win_rate']:.0f}%，失败 {endpoint['failure_count']} 次，p90 {p90}")
+
+            budget_stats = get_request_budget().get_stats()
+            if budget_stats['queued_count'] > 0:
+                print(f"   - 速率限制排队: {budget_stats['queued_count']} 次，累计等待 {budget_stats['total_wait']:.1f} 秒")
+
+            if self.enrichment_router.enabled:
+                print(f"   - 分流:")
+                for tier, tier_stats in self.enrichment_router.get_stats().items():
+                    if tier_stats['count'] > 0:
+                        print(f"     · {TIER_NAMES[tier]}: {tier_stats['count']} 条，"
+                              f"耗时 {tier_stats['duration']:.1f} 秒（平均 {tier_stats['avg_ms']:.0f} 毫秒/条）")
+
+            reuse_stats = get_tag_index().get_stats()
+            if reuse_stats['hits'] + reuse_stats['misses'] > 0:
+                print(f"   - 标签复用:")
+                print(f"     · 命中: {reuse_stats['hits']} 次，未命中: {reuse_stats['misses']} 次，命中率 {reuse_stats['hit_rate']:.1f}%")
+                print(f"     · 平均查找耗时: {reuse_stats['avg_lookup_ms']:.2f} 毫秒（{reuse_stats['size']} 条历史，{reuse_stats['backend']}）")
+
+            ai_cache = get_ai_cache()
+            self.stats.ai_cache_hits = ai_cache.hits
+            self.stats.ai_cache_misses = ai_cache.misses
+            if ai_cache.hits + ai_cache.misses > 0:
+                print(f"   - AI 缓存:")
+                print(f"     · 命中: {self.stats.ai_cache_hits} 次，未命中: {self.stats.ai_cache_misses} 次")
+                print(f"     · 命中率: {self.stats.get_ai_cache_hit_rate():.1f}%（缓存 {len(ai_cache)} 条）")
         
         # 书籍处理详情
         if self.stats.book_details:
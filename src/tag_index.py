@@ -0,0 +1,201 @@
+"""
+标签复用索引
+把历史划线（tag_history.json）编码为哈希字符 n-gram 向量，新划线与最相似的历史划线
+余弦相似度超过阈值时直接复用其标签，只有真正新的内容才调用 AI。
+安装了 NumPy 时用矩阵运算查找，否则使用倒排索引
+"""
+import math
+import threading
+import time
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from .config_manager import config
+from .local_tagger import char_ngrams, get_local_tagger
+
+def _import_numpy():
+    """按需导入 NumPy（可选依赖，导入较慢，只在创建索引时导入）"""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def hashed_vector(text: str, dimensions: int) -> Dict[int, float]:
+    """
+    把文本编码为归一化的哈希 n-gram 稀疏向量
+
+    Args:
+        text: 文本内容
+        dimensions: 向量维数
+
+    Returns:
+        维度 -> 权重
+    """
+    vector: Dict[int, float] = defaultdict(float)
+    for gram, count in char_ngrams(text).items():
+        vector[zlib.crc32(gram.encode('utf-8')) % dimensions] += 1 + math.log(count)
+    norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+    return {index: weight / norm for index, weight in vector.items()}
+
+
+class TagReuseIndex:
+    """历史划线的最近邻索引"""
+
+    def __init__(self, threshold: float = 0.8, dimensions: int = 1024, use_numpy: bool = True):
+        """
+        初始化索引
+
+        Args:
+            threshold: 复用标签所需的最低余弦相似度
+            dimensions: 哈希向量维数
+            use_numpy: 已安装 NumPy 时是否使用矩阵计算（否则使用倒排索引）
+        """
+        self.threshold = threshold
+        self.dimensions = dimensions
+        self.tags: List[List[str]] = []
+        self.vectors: List[Dict[int, float]] = []
+        self.lock = threading.Lock()
+
+        # NumPy 矩阵（按需从 vectors 同步）或倒排索引
+        self.np = _import_numpy() if use_numpy else None
+        self.matrix = None
+        self.matrix_rows = 0
+        self.postings: Dict[int, List[Tuple[int, float]]] = defaultdict(list)
+
+        # 统计
+        self.hits = 0
+        self.misses = 0
+        self.lookup_time = 0.0
+
+    def __len__(self) -> int:
+        return len(self.tags)
+
+    def add(self, text: str, tags: List[str]):
+        """
+        加入一条已打标签的划线
+
+        Args:
+            text: 划线内容
+            tags: 标签列表
+        """
+        if not text or not tags:
+            return
+        vector = hashed_vector(text, self.dimensions)
+        with self.lock:
+            row = len(self.tags)
+            self.tags.append(list(tags))
+            self.vectors.append(vector)
+            if self.np is None:
+                for index, weight in vector.items():
+                    self.postings[index].append((row, weight))
+
+    def _sync_matrix(self):
+        """把新加入的向量追加到 NumPy 矩阵"""
+        if self.matrix_rows == len(self.vectors):
+            return
+        np = self.np
+        rows = np.zeros((len(self.vectors) - self.matrix_rows, self.dimensions), dtype=np.float32)
+        for offset, vector in enumerate(self.vectors[self.matrix_rows:]):
+            for index, weight in vector.items():
+                rows[offset, index] = weight
+        self.matrix = rows if self.matrix is None else np.vstack([self.matrix, rows])
+        self.matrix_rows = len(self.vectors)
+
+    def nearest(self, text: str) -> Tuple[Optional[int], float]:
+        """
+        查找最相似的历史划线
+
+        Args:
+            text: 划线内容
+
+        Returns:
+            Tuple[Optional[int], float]: (行号, 余弦相似度)，索引为空时行号为 None
+        """
+        query = hashed_vector(text, self.dimensions)
+        with self.lock:
+            if not self.tags:
+                return None, 0.0
+            np = self.np
+            if np is not None:
+                self._sync_matrix()
+                indices = np.fromiter(query.keys(), dtype=np.int64, count=len(query))
+                weights = np.fromiter(query.values(), dtype=np.float32, count=len(query))
+                scores = self.matrix[:, indices] @ weights
+                row = int(np.argmax(scores))
+                return row, float(scores[row])
+
+            scores: Dict[int, float] = defaultdict(float)
+            for index, weight in query.items():
+                for row, row_weight in self.postings.get(index, ()):
+                    scores[row] += weight * row_weight
+            if not scores:
+                return None, 0.0
+            row = max(scores, key=scores.get)
+            return row, scores[row]
+
+    def lookup(self, text: str) -> Optional[List[str]]:
+        """
+        查找可复用的标签
+
+        Args:
+            text: 划线内容
+
+        Returns:
+            最相似历史划线的标签（相似度达到阈值时），否则返回 None
+        """
+        start = time.perf_counter()
+        row, score = self.nearest(text)
+        self.lookup_time += time.perf_counter() - start
+        if row is not None and score >= self.threshold:
+            self.hits += 1
+            return list(self.tags[row])
+        self.misses += 1
+        return None
+
+    def get_stats(self) -> Dict:
+        """获取命中率和平均查找耗时"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) * 100 if lookups else 0.0,
+            "avg_lookup_ms": (self.lookup_time / lookups) * 1000 if lookups else 0.0,
+            "backend": "numpy" if self.np is not None else "inverted",
+        }
+
+
+class _DisabledIndex(TagReuseIndex):
+    """未启用标签复用时使用：始终未命中，不统计"""
+
+    def add(self, text: str, tags: List[str]):
+        pass
+
+    def lookup(self, text: str) -> Optional[List[str]]:
+        return None
+
+
+# 共享的索引实例（延迟创建，从标签历史构建）
+_index: Optional[TagReuseIndex] = None
+# 工作线程可能同时首次获取，创建时加锁
+_lock = threading.Lock()
+
+
+def get_tag_index() -> TagReuseIndex:
+    """获取共享的标签复用索引"""
+    global _index
+    if _index is None:
+        with _lock:
+            if _index is None:
+                settings = config.get_tag_reuse()
+                if settings['enabled']:
+                    # 构建完成后再赋值，其他线程不会拿到只加入了部分历史的索引
+                    index = TagReuseIndex(settings['threshold'], settings['dimensions'])
+                    for item in get_local_tagger().history:
+                        index.add(item.get("text", ""), item.get("tags", []))
+                    _index = index
+                else:
+                    _index = _DisabledIndex(use_numpy=False)
+    return _index
@@ -1,14 +1,138 @@
 """
 模板渲染器
 """
+import re
+import string
 from datetime import datetime
-from typing import Dict, Optional, List
-from .config_manager import config
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, List, Tuple
+from .config_manager import config, ENV_SECTION
+
+
+# 两个换行之间连续两行以上的空行（只含空白字符的行）：保留第一行，去掉其余。
+# 开头和结尾的空行最终会被 strip 去掉，不需要单独处理
+_BLANK_LINE_RUN = re.compile(r"\n([^\S\n]*)\n(?:[^\S\n]*\n)+")
+# 内部含空白字符的空行；没有这种行时所有空行都是 ""，可以走纯字符串替换
+_WHITESPACE_LINE = re.compile(r"\n[^\S\n]+\n")
+
+
+class CompiledTemplate:
+    """
+    预编译的模板
+
+    模板字符串只解析一次，拆分为 [(文本, 变量名)] 片段；模板内部固定的连续空行
+    在编译时就合并，渲染时只需拼接片段，再合并由空变量产生的空行
+    """
+
+    def __init__(self, template: str):
+        """
+        编译模板
+
+        Args:
+            template: 模板字符串（str.format 语法）
+        """
+        self.source = template
+        self.segments: List[Tuple[str, Optional[str]]] = []
+        self.fields = set()
+        # 含格式说明或转换（如 {x!r}、{x:>10}）的模板交给 str.format 处理
+        self.simple = True
+
+        collapsed = []
+        for literal, field_name, format_spec, conversion in string.Formatter().parse(template):
+            literal = self._collapse_literal(literal)
+            collapsed.append(literal.replace('{', '{{').replace('}', '}}'))
+            if field_name is not None:
+                if format_spec or conversion or not field_name.isidentifier():
+                    self.simple = False
+                self.fields.add(field_name)
+                collapsed.append(
+                    "{" + field_name
+                    + (f"!{conversion}" if conversion else "")
+                    + (f":{format_spec}" if format_spec else "")
+                    + "}"
+                )
+            self.segments.append((literal, field_name))
+        self.format_string = "".join(collapsed)
+
+    @staticmethod
+    def _collapse_literal(literal: str) -> str:
+        """
+        合并文本片段内部的连续空行
+
+        只处理前后都有换行符包围的空行：它们是否为空与变量取值无关
+        """
+        first, last = literal.find('\n'), literal.rfind('\n')
+        if first == last:
+            return literal
+        return literal[:first] + _BLANK_LINE_RUN.sub(r"\n\1\n", literal[first:last + 1]) + literal[last + 1:]
+
+    def render(self, values: Dict[str, str]) -> str:
+        """
+        渲染模板
+
+        Args:
+            values: 变量名 -> 值
+
+        Returns:
+            渲染并合并空行后的内容
+        """
+        if self.simple:
+            content = "".join([
+                literal + values[field_name] if field_name is not None else literal
+                for literal, field_name in self.segments
+            ])
+        else:
+            content = self.format_string.format(**values)
+        return TemplateRenderer._clean_blank_lines(content)
+
+
+@lru_cache(maxsize=64)
+def compile_template(template: str) -> CompiledTemplate:
+    """获取编译后的模板（按模板字符串缓存，每个分类 / 模板只编译一次）"""
+    return CompiledTemplate(template)
 
 
 class TemplateRenderer:
     """模板渲染器"""
 
+    @staticmethod
+    def build_values(
+        book_title: str,
+        author: str,
+        highlight_text: str,
+        chapter_name: str = "",
+        book_url: str = "",
+        note_text: str = "",
+        create_time: str = "",
+        tags: List[str] = None,
+        ai_summary: str = ""
+    ) -> Dict[str, str]:
+        """
+        准备模板变量
+
+        Args:
+            同 render
+
+        Returns:
+            变量名 -> 值
+        """
+        return {
+            "book_title": book_title,
+            "author": author,
+            "highlight_text": highlight_text,
+            # 处理章节信息
+            "chapter_info": f"📍 {chapter_name}" if chapter_name else "",
+            "book_url": book_url,
+            # 处理 AI 摘要（明确标识为 AI 生成）
+            "ai_summary_section": f"✨ AI 摘要：{ai_summary}\n" if ai_summary else "",
+            # 处理笔记部分
+            "note_section": f"💭 我的思考：{note_text}\n" if note_text else "",
+            # 处理时间
+            "create_time": create_time or datetime.now().strftime("%Y-%m-%d"),
+            # 处理标签
+            "tags": " ".join(tags) if tags else "",
+        }
+
     @staticmethod
     def render(
         template: str,
@@ -40,58 +164,237 @@ class TemplateRenderer:
         Returns:
             渲染后的内容
         """
-        # 处理章节信息
-        chapter_info = ""
-        if chapter_name:
-            chapter_info = f"📍 {chapter_name}"
+        return compile_template(template).render(TemplateRenderer.build_values(
+            book_title, author, highlight_text, chapter_name,
+            book_url, note_text, create_time, tags, ai_summary
+        ))
 
-        # 处理 AI 摘要（明确标识为 AI 生成）
-        ai_summary_section = ""
-        if ai_summary:
-            ai_summary_section = f"✨ AI 摘要：{ai_summary}\n"
+    @staticmethod
+    def render_many(
+        template: str,
+        book_title: str,
+        author: str,
+        items: Iterable[Dict],
+        book_url: str = ""
+    ) -> List[str]:
+        """
+        批量渲染同一本书的多条划线（模板只查找、编译一次）
+
+        Args:
+            template: 模板字符串
+            book_title: 书名
+            author: 作者
+            items: 划线条目，包含 highlight_text、chapter_name、note_text、
+                create_time、tags、ai_summary
+            book_url: 书籍链接
+
+        Returns:
+            与输入一一对应的渲染结果
+        """
+        compiled = compile_template(template)
+        build_values = TemplateRenderer.build_values
+        return [
+            compiled.render(build_values(
+                book_title, author,
+                item.get("highlight_text", ""),
+                item.get("chapter_name", ""),
+                book_url,
+                item.get("note_text", ""),
+                item.get("create_time", ""),
+                item.get("tags"),
+                item.get("ai_summary") or ""
+            ))
+            for item in items
+        ]
+
+    @staticmethod
+    def _clean_blank_lines(content: str) -> str:
+        """清理多余的空行（连续空行只保留一行）"""
+        if _WHITESPACE_LINE.search(content) is None:
+            while "\n\n\n" in content:
+                content = content.replace("\n\n\n", "\n\n")
+            return content.strip()
+        return _BLANK_LINE_RUN.sub(r"\n\1\n", content).strip()
 
-        # 处理笔记部分
-        note_section = ""
-        if note_text:
-            note_section = f"💭 我的思考：{note_text}\n"
+    @staticmethod
+    def render_digest(
+        template: str,
+        item_template: str,
+        book_title: str,
+        author: str,
+        items: List[Dict],
+        chapter_name: str = "",
+        book_url: str = "",
+        tags: List[str] = None
+    ) -> str:
+        """
+        渲染摘要笔记（多条划线合并为一条）
 
-        # 处理时间
-        if not create_time:
-            create_time = datetime.now().strftime("%Y-%m-%d")
+        Args:
+            template: 摘要模板字符串
+            item_template: 单条划线的模板字符串
+            book_title: 书名
+            author: 作者
+            items: 划线条目列表，包含 highlight_text、chapter_name、note_text、
+                create_time、tags、ai_summary
+            chapter_name: 章节名（按章节分组时）
+            book_url: 书籍链接
+            tags: 合并后的标签列表
 
-        # 处理标签
-        tags_str = " ".join(tags) if tags else ""
+        Returns:
+            渲染后的内容
+        """
+        rendered_items = TemplateRenderer.render_many(
+            item_template,
+            book_title,
+            author,
+            [dict(item, tags=[]) for item in items],
+            book_url=book_url
+        )
 
-        # 替换模板变量
         content = template.format(
             book_title=book_title,
             author=author,
-            highlight_text=highlight_text,
-            chapter_info=chapter_info,
+            chapter_info=f"📍 {chapter_name}" if chapter_name else "",
             book_url=book_url,
-            ai_summary_section=ai_summary_section,
-            note_section=note_section,
-            create_time=create_time,
-            tags=tags_str
+            item_count=len(items),
+            items="\n\n".join(rendered_items),
+            tags=" ".join(tags) if tags else ""
         )
 
-        # 清理多余的空行
-        lines = content.split('\n')
-        cleaned_lines = []
-        prev_empty = False
+        return TemplateRenderer._clean_blank_lines(content)
 
-        for line in lines:
-            is_empty = not line.strip()
+    @staticmethod
+    def render_duplicate_link(
+        highlight_text: str,
+        source_book_title: str,
+        source_time: str = "",
+        tags: List[str] = None,
+        preview_length: int = 40
+    ) -> str:
+        """
+        渲染重复划线的引用笔记（内容已在其他书中收录时使用）
+
+        Args:
+            highlight_text: 划线内容
+            source_book_title: 首次收录该内容的书名
+            source_time: 首次收录时间
+            tags: 标签列表
+            preview_length: 划线预览的最大字符数
+
+        Returns:
+            渲染后的内容
+        """
+        preview = highlight_text.strip()
+        if len(preview) > preview_length:
+            preview = preview[:preview_length] + "…"
+
+        source = f"《{source_book_title}》"
+        if source_time:
+            source += f"（{source_time}）"
+
+        lines = [f"> {preview}", "", f"🔁 同一段落已收录于 {source}"]
+        if tags:
+            lines.extend(["", " ".join(tags)])
+        return '\n'.join(lines)
+
+
+# 书名清理：截断到第一个括号，再移除书名号、空格（含全角）和常见标点
+_TITLE_CUT = re.compile(r"[（(【\[]")
+_TITLE_STRIP = str.maketrans("", "", "《》 　，,、：:！!？?·•")
+
+
+class BookTagContext:
+    """
+    单本书的标签上下文
+
+    书名 / 默认 / 分类 / 作者标签对同一本书的每条划线都相同，只在构造时计算一次；
+    每条划线只需合并自己的 AI 标签
+    """
+
+    def __init__(self, book_title: str, author: str, category: Optional[str] = None):
+        """
+        计算固定部分的标签
 
-            if is_empty:
-                if not prev_empty:
-                    cleaned_lines.append(line)
-                prev_empty = True
+        Args:
+            book_title: 书名
+            author: 作者
+            category: 书籍分类
+        """
+        settings = config.settings
+        tags = []
+
+        if settings.add_book_title_tag:
+            clean_title = TagGenerator._clean_book_title(book_title)
+
+            if settings.use_hierarchical_tags:
+                # 层级标签: #微信读书/书名
+                tags.append(f"#微信读书/{clean_title}")
             else:
-                cleaned_lines.append(line)
-                prev_empty = False
+                # 独立标签: #微信读书 #书名
+                tags.extend(settings.default_tags)
+                tags.append(f"#{clean_title}")
+        else:
+            tags.extend(settings.default_tags)
+
+        if category:
+            tags.extend(settings.category_tags.get(category, ()))
+
+        # 去重并保持顺序
+        self.prefix: Tuple[str, ...] = tuple(dict.fromkeys(tags))
+        self.prefix_set = frozenset(self.prefix)
+
+        self.author_tag: Optional[str] = None
+        if settings.add_author_tag:
+            self.author_tag = "#" + author.replace(' ', '_')
+
+        # 没有 AI 标签时的结果
+        if self.author_tag is None or self.author_tag in self.prefix_set:
+            self.base = self.prefix
+        else:
+            self.base = self.prefix + (self.author_tag,)
+
+    def merge(self, ai_tags: Optional[List[str]] = None) -> List[str]:
+        """
+        合并一条划线的 AI 标签
+
+        顺序与去重规则：书名 / 默认 / 分类标签 → AI 标签 → 作者标签，重复的只保留第一次出现
+
+        Args:
+            ai_tags: AI 生成的标签
+
+        Returns:
+            标签列表
+        """
+        if not ai_tags:
+            return list(self.base)
+
+        tags = list(self.prefix)
+        seen = set(self.prefix_set)
+        for tag in ai_tags:
+            if tag not in seen:
+                seen.add(tag)
+                tags.append(tag)
+        if self.author_tag is not None and self.author_tag not in seen:
+            tags.append(self.author_tag)
+        return tags
+
+
+@lru_cache(maxsize=256)
+def get_book_tag_context(book_title: str, author: str, category: Optional[str] = None) -> BookTagContext:
+    """获取书籍的标签上下文（按书名、作者、分类缓存，同一本书只计算一次）"""
+    return BookTagContext(book_title, author, category)
 
-        return '\n'.join(cleaned_lines).strip()
+
+def _on_config_reload(sections):
+    """配置重新加载后清理依赖的缓存"""
+    if 'templates' in sections:
+        compile_template.cache_clear()
+    if sections & {'tags', 'book_categories', ENV_SECTION}:
+        get_book_tag_context.cache_clear()
+
+
+config.add_reload_listener(_on_config_reload)
 
 
 class TagGenerator:
@@ -120,35 +423,24 @@ class TagGenerator:
             "思考，快与慢" -> "思考快与慢"
             "代码大全 第2版" -> "代码大全第2版"
         """
-        # 移除书名号
-        clean = book_title.replace('《', '').replace('》', '')
-        
-        # 只保留括号前的内容（无论中英文括号）
-        # 处理中文括号
-        if '（' in clean:
-            clean = clean.split('（')[0]
-        if '(' in clean:
-            clean = clean.split('(')[0]
-        
-        # 移除【】方括号及其内容
-        if '【' in clean:
-            clean = clean.split('【')[0]
-        if '[' in clean:
-            clean = clean.split('[')[0]
-        
-        # 移除常见标点符号
-        clean = clean.replace(' ', '').replace('　', '')  # 空格和全角空格
-        clean = clean.replace('，', '').replace(',', '')   # 逗号
-        clean = clean.replace('、', '')                    # 顿号
-        clean = clean.replace('：', '').replace(':', '')   # 冒号
-        clean = clean.replace('！', '').replace('!', '')   # 感叹号
-        clean = clean.replace('？', '').replace('?', '')   # 问号
-        clean = clean.replace('·', '').replace('•', '')   # 间隔号
-        
-        # 移除首尾空白
-        clean = clean.strip()
-        
-        return clean
+        # 只保留括号前的主标题（中英文圆括号、方括号），再一次性移除书名号、空格和标点
+        clean = _TITLE_CUT.split(book_title, 1)[0]
+        return clean.translate(_TITLE_STRIP).strip()
+
+    @staticmethod
+    def book_context(book_title: str, author: str, category: Optional[str] = None) -> BookTagContext:
+        """
+        获取书籍的标签上下文，同一本书的多条划线共用
+
+        Args:
+            book_title: 书名
+            author: 作者
+            category: 书籍分类
+
+        Returns:
+            BookTagContext，调用 merge(ai_tags) 得到每条划线的标签
+        """
+        return get_book_tag_context(book_title, author, category)
 
     @staticmethod
     def generate_tags(
@@ -171,55 +463,7 @@ class TagGenerator:
         Returns:
             标签列表
         """
-        tags = []
-
-        # 检查是否启用层级标签
-        use_hierarchical = config.get('tags.use_hierarchical_tags', True)
-
-        # 处理书名标签（层级或独立）
-        if config.should_add_book_title_tag():
-            # 清理书名
-            clean_title = TagGenerator._clean_book_title(book_title)
-            
-            if use_hierarchical:
-                # 使用层级标签: #微信读书/书名
-                book_tag = f"#微信读书/{clean_title}"
-                tags.append(book_tag)
-            else:
-                # 使用独立标签: #微信读书 #书名
-                default_tags = config.get('tags.default', ['#微信读书'])
-                tags.extend(default_tags)
-                book_tag = f"#{clean_title}"
-                tags.append(book_tag)
-        else:
-            # 不添加书名标签时，只添加默认标签
-            default_tags = config.get('tags.default', ['#微信读书'])
-            tags.extend(default_tags)
-
-        # 添加分类标签
-        if category:
-            category_tags = config.get_category_tags(category)
-            tags.extend(category_tags)
-
-        # 添加AI标签
-        if ai_tags:
-            tags.extend(ai_tags)
-
-        # 添加作者标签
-        if config.should_add_author_tag():
-            author_clean = author.replace(' ', '_')
-            author_tag = f"#{author_clean}"
-            tags.append(author_tag)
-
-        # 去重并保持顺序
-        seen = set()
-        unique_tags = []
-        for tag in tags:
-            if tag not in seen:
-                seen.add(tag)
-                unique_tags.append(tag)
-
-        return unique_tags
+        return get_book_tag_context(book_title, author, category).merge(ai_tags)
 
 
 if __name__ == "__main__":
@@ -276,3 +520,48 @@ if __name__ == "__main__":
         tags=tags
     )
     print(content)
+
+    print("\n" + "="*50 + "\n")
+
+    # 性能测试：渲染 10 万条划线
+    import time
+
+    print("=== 批量渲染性能 ===")
+    count = 100000
+    items = [
+        {
+            "highlight_text": f"{highlight}（第 {i} 条）",
+            "chapter_name": chapter if i % 2 else "",
+            "note_text": "可以试试用来提高决策质量" if i % 5 == 0 else "",
+            "create_time": "2024-01-01",
+            "tags": tags,
+            "ai_summary": "直觉常被低估" if i % 3 == 0 else "",
+        }
+        for i in range(count)
+    ]
+
+    start = time.perf_counter()
+    results = renderer.render_many(detailed_template, book_title, author, items)
+    elapsed = time.perf_counter() - start
+    print(f"render_many: {count} 条，{elapsed:.2f} 秒（{elapsed / count * 1e6:.1f} 微秒/条）")
+
+    # 对比：每条都重新解析模板并逐行清理空行（预编译之前的做法）
+    def legacy_render(item):
+        content = detailed_template.format(**renderer.build_values(
+            book_title, author, item["highlight_text"], item["chapter_name"], "",
+            item["note_text"], item["create_time"], item["tags"], item["ai_summary"]
+        ))
+        cleaned_lines = []
+        prev_empty = False
+        for line in content.split('\n'):
+            is_empty = not line.strip()
+            if not (is_empty and prev_empty):
+                cleaned_lines.append(line)
+            prev_empty = is_empty
+        return '\n'.join(cleaned_lines).strip()
+
+    start = time.perf_counter()
+    legacy_results = [legacy_render(item) for item in items]
+    legacy_elapsed = time.perf_counter() - start
+    print(f"逐条 format + 逐行清理: {legacy_elapsed:.2f} 秒（{legacy_elapsed / count * 1e6:.1f} 微秒/条）")
+    print(f"结果一致: {results == legacy_results}")
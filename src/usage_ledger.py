@@ -0,0 +1,113 @@
+"""
+用量账本
+按自然日持久化记录各类调用次数，多次运行（定时任务、手动触发）共享同一份额度
+"""
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+from .config_manager import config
+
+
+class UsageLedger:
+    """按自然日记录用量的持久化账本"""
+
+    def __init__(
+        self,
+        path: str = "usage_ledger.json",
+        utc_offset_hours: float = 8,
+        keep_days: int = 30
+    ):
+        """
+        初始化用量账本
+
+        Args:
+            path: 账本文件路径
+            utc_offset_hours: 计算"自然日"所用时区相对 UTC 的小时数（flomo 服务器为北京时间 +8）
+            keep_days: 保留最近多少天的记录
+        """
+        self.path = path
+        self.tz = timezone(timedelta(hours=utc_offset_hours))
+        self.keep_days = keep_days
+        self.days = self.load()
+        self.lock = threading.RLock()  # AI 用量在并发请求线程中记录
+
+    def load(self) -> Dict[str, Dict[str, float]]:
+        """加载账本文件"""
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    return json.load(f).get("days", {})
+            except Exception as e:
+                print(f"⚠️  加载用量账本失败: {e}")
+        return {}
+
+    def save(self):
+        """保存账本文件（先写临时文件再替换，避免中断时损坏）"""
+        cutoff = (datetime.now(self.tz) - timedelta(days=self.keep_days)).strftime("%Y-%m-%d")
+        tmp_path = f"{self.path}.tmp"
+        with self.lock:
+            self.days = {day: counters for day, counters in self.days.items() if day >= cutoff}
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({
+                        "timezone": str(self.tz),
+                        "days": self.days
+                    }, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                print(f"⚠️  保存用量账本失败: {e}")
+
+    def today(self) -> str:
+        """获取账本时区下的当天日期"""
+        return datetime.now(self.tz).strftime("%Y-%m-%d")
+
+    def get(self, counter: str, day: Optional[str] = None) -> float:
+        """
+        获取某天某项用量
+
+        Args:
+            counter: 用量名称，如 'flomo_requests'
+            day: 日期（YYYY-MM-DD），默认当天
+
+        Returns:
+            用量
+        """
+        return self.days.get(day or self.today(), {}).get(counter, 0)
+
+    def add(self, counter: str, amount: float = 1) -> float:
+        """
+        增加当天某项用量并立即保存
+
+        Args:
+            counter: 用量名称
+            amount: 增加量
+
+        Returns:
+            增加后的当天用量
+        """
+        with self.lock:
+            counters = self.days.setdefault(self.today(), {})
+            counters[counter] = counters.get(counter, 0) + amount
+            self.save()
+            return counters[counter]
+
+
+# 共享的用量账本实例（延迟创建），flomo 调用次数和 AI 用量记录在同一个文件中
+_ledger: Optional[UsageLedger] = None
+# 工作线程可能同时首次获取，创建时加锁
+_lock = threading.Lock()
+
+
+def get_usage_ledger() -> UsageLedger:
+    """获取共享的用量账本"""
+    global _ledger
+    if _ledger is None:
+        with _lock:
+            if _ledger is None:
+                _ledger = UsageLedger(
+                    path=config.get_usage_ledger_file(),
+                    utc_offset_hours=config.get_flomo_utc_offset()
+                )
+    return _ledger
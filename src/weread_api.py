@@ -8,10 +8,15 @@ import json
 from http.cookies import SimpleCookie
 from requests.utils import cookiejar_from_dict
 from typing import Dict, List, Optional
-from dotenv import load_dotenv
+
+try:
+    from .env_loader import load_env
+except ImportError:
+    # 直接运行本文件时
+    from env_loader import load_env
 
 # 加载环境变量
-load_dotenv()
+load_env()
 
 # 微信读书 API 端点（参考 mcp-server-weread 项目）
 WEREAD_URL = "https://weread.qq.com/"
@@ -0,0 +1,9 @@
+"""
+测试公共配置：把项目根目录加入 sys.path，使 `import src.xxx` 在任意目录下运行 pytest 都可用
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
@@ -0,0 +1,52 @@
+"""AI 用量预算和降级等级"""
+from src.ai_budget import LEVEL_FULL, LEVEL_LOCAL, LEVEL_OFF, LEVEL_REDUCED, AIBudget
+from src.usage_ledger import UsageLedger
+
+
+def test_unlimited_budget_stays_full():
+    budget = AIBudget()
+    budget.record(100000, 100000)
+    assert budget.remaining_fraction() == 1.0
+    assert budget.get_level() == LEVEL_FULL
+
+
+def test_levels_follow_remaining_run_tokens():
+    budget = AIBudget(run_tokens=1000, reduce_below=0.5, local_below=0.2)
+    assert budget.get_level() == LEVEL_FULL
+
+    budget.record(400, 200)
+    assert budget.get_level() == LEVEL_REDUCED
+
+    budget.record(150, 100)
+    assert budget.get_level() == LEVEL_LOCAL
+
+    budget.record(100, 100)
+    assert budget.get_level() == LEVEL_OFF
+    assert budget.get_stats()["total_tokens"] == 1050
+
+
+def test_cost_uses_per_thousand_prices():
+    budget = AIBudget(run_cost=1.0, input_price=0.5, output_price=1.5)
+    assert budget.cost_of(1000, 1000) == 2.0
+
+    budget.record(200, 100)
+    assert budget.cost == 0.25
+    assert budget.remaining_fraction() == 0.75
+
+
+def test_daily_limit_is_shared_through_the_ledger(tmp_path):
+    path = str(tmp_path / "usage_ledger.json")
+    AIBudget(ledger=UsageLedger(path=path), daily_tokens=1000).record(700, 200)
+
+    budget = AIBudget(ledger=UsageLedger(path=path), daily_tokens=1000)
+    assert budget.get_daily_tokens() == 900
+    assert budget.get_level() == LEVEL_LOCAL
+
+
+def test_tightest_limit_wins(tmp_path):
+    budget = AIBudget(
+        ledger=UsageLedger(path=str(tmp_path / "usage_ledger.json")),
+        run_tokens=10000, daily_tokens=1000
+    )
+    budget.record(500, 0)
+    assert budget.remaining_fraction() == 0.5
@@ -0,0 +1,144 @@
+"""AI 结果缓存：缓存键按实际应答的接口和实际使用的提示词生成"""
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src import ai_enrichment, ai_summary, ai_tags
+from src.ai_cache import AICache
+from src.ai_client import AIClient, AIEndpoint
+from src.ai_enrichment import AIEnrichmentGenerator
+from src.ai_summary import AISummaryGenerator
+from src.ai_tags import AITagGenerator
+
+PRIMARY = AIEndpoint('https://primary.example.com/v1', 'model-a', 'sk-a')
+BACKUP = AIEndpoint('https://backup.example.com/v1', 'model-b', 'sk-b')
+LONG_TEXT = "系统1的运作是无意识且快速的，不怎么费脑力。" * 10
+
+
+def test_make_keys_covers_every_source_and_prompt():
+    keys = AICache.make_keys(
+        'tags', 'openai',
+        [(PRIMARY.api_base, PRIMARY.model), (BACKUP.api_base, BACKUP.model), (PRIMARY.api_base + '/', PRIMARY.model)],
+        ['prompt-1', 'prompt-2'],
+        "同一段文字"
+    )
+    assert len(keys) == 4
+    assert keys[0] == AICache.make_key('tags', 'openai', PRIMARY.api_base, PRIMARY.model, 'prompt-1', "同一段文字")
+    assert AICache.make_key('tags', 'openai', BACKUP.api_base, BACKUP.model, 'prompt-2', "同一段，文字") in keys
+
+
+def test_get_first_counts_one_hit_or_miss(tmp_path):
+    cache = AICache(path=str(tmp_path / "ai_cache.json"))
+    cache.set("b", ["#标签"])
+    assert cache.get_first(["a", "b"]) == ["#标签"]
+    assert cache.get_first(["a", "c"]) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.contains_any(["x", "b"])
+    assert not cache.contains_any(["x", "y"])
+
+
+def make_client() -> AIClient:
+    client = object.__new__(AIClient)
+    client.provider = 'openai'
+    client.endpoints = [PRIMARY, BACKUP]
+    client.hedge = {'enabled': True, 'percentile': 90}
+    client._pool = None
+    client.lock = threading.Lock()
+    client.hedge_count = 0
+    client.failover_count = 0
+    client.rejected_count = 0
+    return client
+
+
+def test_chat_with_source_reports_failover_endpoint(monkeypatch):
+    client = make_client()
+    monkeypatch.setattr(client, '_pick_order', lambda: [PRIMARY, BACKUP])
+    monkeypatch.setattr(PRIMARY, 'get_hedge_delay', lambda max_tokens, percentile: None)
+
+    def fail(prompt, max_tokens, temperature):
+        raise RuntimeError("primary down")
+
+    monkeypatch.setattr(PRIMARY, 'chat', fail)
+    monkeypatch.setattr(BACKUP, 'chat', lambda prompt, max_tokens, temperature: "backup answer")
+
+    content, endpoint = client.chat_with_source("prompt", max_tokens=10)
+    assert (content, endpoint) == ("backup answer", BACKUP)
+    assert client.failover_count == 1
+
+
+def test_chat_with_source_reports_hedge_winner(monkeypatch):
+    client = make_client()
+    monkeypatch.setattr(PRIMARY, 'get_hedge_delay', lambda max_tokens, percentile: 0.01)
+
+    def slow(prompt, max_tokens, temperature):
+        time.sleep(0.3)
+        return "primary answer"
+
+    monkeypatch.setattr(PRIMARY, 'chat', slow)
+    monkeypatch.setattr(BACKUP, 'chat', lambda prompt, max_tokens, temperature: "backup answer")
+
+    content, endpoint = client._race(PRIMARY, BACKUP, "prompt", 10, 0.7)[:2]
+    assert (content, endpoint) == ("backup answer", BACKUP)
+    assert client.hedge_count == 1
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """各生成器共用的临时缓存，接口列表为 PRIMARY + BACKUP，不写本地标签引擎和复用索引"""
+    cache = AICache(path=str(tmp_path / "ai_cache.json"))
+    client = SimpleNamespace(cache_sources=lambda: [(PRIMARY.api_base, PRIMARY.model), (BACKUP.api_base, BACKUP.model)])
+    for module in (ai_tags, ai_summary):
+        monkeypatch.setattr(module, 'get_ai_cache', lambda: cache)
+        monkeypatch.setattr(module, 'get_ai_client', lambda: client)
+    monkeypatch.setattr(ai_tags, 'get_local_tagger', lambda: SimpleNamespace(learn=lambda text, tags: None))
+    monkeypatch.setattr(ai_tags, 'get_tag_index', lambda: SimpleNamespace(add=lambda text, tags: None, lookup=lambda text: None))
+    return cache
+
+
+def make_tag_generator() -> AITagGenerator:
+    generator = object.__new__(AITagGenerator)
+    generator.provider = 'openai'
+    generator.shared_prompt_templates = []
+    return generator
+
+
+def test_tags_are_stored_under_the_answering_endpoint(cache):
+    generator = make_tag_generator()
+    generator.cache_tags("一段划线", ["#标签"], BACKUP)
+
+    assert cache.contains(generator.cache_key("一段划线", BACKUP))
+    assert not cache.contains(generator.cache_key("一段划线", PRIMARY))
+    assert generator.get_cached_tags("一段划线") == ["#标签"]
+
+
+def test_tags_without_a_known_endpoint_are_not_cached(cache):
+    generator = make_tag_generator()
+    generator.cache_tags("一段划线", ["#标签"], None)
+    assert len(cache) == 0
+
+
+def test_combined_enrichment_is_keyed_on_the_combined_prompt(cache, monkeypatch):
+    tag_generator = make_tag_generator()
+    summary_generator = object.__new__(AISummaryGenerator)
+    summary_generator.provider = 'openai'
+    summary_generator.shared_prompt_templates = []
+    monkeypatch.setattr(summary_generator, 'should_summarize', lambda text: True)
+    generator = AIEnrichmentGenerator(tag_generator, summary_generator)
+
+    reply = '{"tags": ["#心理学"], "summary": "两个系统"}'
+    fake_client = SimpleNamespace(chat_with_source=lambda prompt, max_tokens: (reply, BACKUP))
+    monkeypatch.setattr(ai_enrichment, 'get_ai_client', lambda: fake_client)
+
+    assert generator.enrich("思考，快与慢", "卡尼曼", LONG_TEXT) == (["#心理学"], "两个系统")
+
+    combined = AIEnrichmentGenerator.enrich_prompt_template()
+    assert cache.contains(tag_generator.cache_key(LONG_TEXT, BACKUP, combined))
+    assert cache.contains(summary_generator.cache_key(LONG_TEXT, BACKUP, combined))
+    assert not cache.contains(tag_generator.cache_key(LONG_TEXT, BACKUP))
+    assert not cache.contains(summary_generator.cache_key(LONG_TEXT, BACKUP))
+
+    # 单独调用时同样可以复用合并调用的结果
+    assert tag_generator.get_cached_tags(LONG_TEXT) == ["#心理学"]
+    assert summary_generator.get_cached_summary(LONG_TEXT) == "两个系统"
@@ -0,0 +1,63 @@
+"""AI 客户端的并发统计"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from src import ai_client
+from src.ai_client import AIEndpoint
+
+
+class FakeResponse:
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"choices": [{"message": {"content": " ok "}}], "usage": {"prompt_tokens": 1, "completion_tokens": 1}}
+
+
+def test_endpoint_counters_are_exact_under_concurrency(monkeypatch):
+    monkeypatch.setattr(ai_client, 'get_request_budget', lambda: SimpleNamespace(acquire=lambda tokens: None))
+    monkeypatch.setattr(ai_client, 'get_ai_budget', lambda: SimpleNamespace(record=lambda prompt, completion: None))
+    monkeypatch.setattr(ai_client.requests, 'post', lambda *args, **kwargs: FakeResponse())
+
+    endpoint = AIEndpoint('https://api.example.com/v1', 'gpt-test', 'sk-test')
+    barrier = threading.Barrier(8)
+
+    def worker(_):
+        barrier.wait()
+        for _ in range(200):
+            assert endpoint.chat("prompt", max_tokens=10, temperature=0.7) == "ok"
+            endpoint.record_win()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(worker, range(8)))
+
+    stats = endpoint.get_stats()
+    assert stats["request_count"] == 1600
+    assert stats["win_count"] == 1600
+    assert stats["failure_count"] == 0
+    assert stats["win_rate"] == 100.0
+
+
+def test_timeouts_are_recorded_so_the_adaptive_timeout_can_grow(monkeypatch):
+    monkeypatch.setattr(ai_client, 'get_request_budget', lambda: SimpleNamespace(acquire=lambda tokens: None))
+    endpoint = AIEndpoint('https://api.example.com/v1', 'gpt-test', 'sk-test', timeout=30,
+                          adaptive_timeout={'min_timeout': 1, 'multiplier': 2.0},
+                          circuit_breaker={'failure_threshold': 0})
+    tracker = endpoint.get_tracker(10)
+    for _ in range(tracker.min_samples):
+        tracker.record(1.0)
+    assert endpoint.get_timeout(10) == 2.0
+
+    def timeout(*args, **kwargs):
+        raise ai_client.requests.exceptions.Timeout()
+
+    monkeypatch.setattr(ai_client.requests, 'post', timeout)
+    for _ in range(tracker.min_samples):
+        with pytest.raises(ai_client.requests.exceptions.Timeout):
+            endpoint.chat("prompt", max_tokens=10, temperature=0.7)
+
+    assert endpoint.get_timeout(10) > 2.0
+    assert endpoint.get_stats()["failure_count"] == tracker.min_samples
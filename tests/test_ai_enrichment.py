@@ -0,0 +1,67 @@
+"""合并 / 批量 AI 调用的提示词和返回解析"""
+from src.ai_enrichment import AIEnrichmentGenerator, tag_instructions
+from src.config_manager import config
+
+parse_batch = AIEnrichmentGenerator.parse_batch
+parse_enrichment = AIEnrichmentGenerator.parse_enrichment
+
+
+def test_parse_batch_json_array():
+    content = '[{"index": 1, "tags": ["#心理学", "决策"], "summary": "两个系统"}, {"index": 2, "tags": "#a, #b", "summary": ""}]'
+    assert parse_batch(content) == {
+        1: (["#心理学", "#决策"], "两个系统"),
+        2: (["#a", "#b"], None),
+    }
+
+
+def test_parse_batch_code_fence_and_surrounding_text():
+    content = '```json\n以下是结果：[{"index": 3, "tags": ["#x"]}] 完毕\n```'
+    assert parse_batch(content) == {3: (["#x"], None)}
+
+
+def test_parse_batch_falls_back_to_position_and_wrapped_lists():
+    assert parse_batch('{"items": [{"tags": ["#a"]}, {"index": "x", "tags": ["#b"]}]}') == {
+        1: (["#a"], None),
+        2: (["#b"], None),
+    }
+    assert parse_batch('[{"index": 1}, "oops"]') == {1: (None, None)}
+
+
+def test_parse_batch_invalid():
+    assert parse_batch("没有 JSON") == {}
+    assert parse_batch('{"index": 1}') == {}
+
+
+def test_parse_enrichment_json():
+    assert parse_enrichment('{"tags": ["#认知 偏差", "#"], "summary": " 直觉常被低估 "}') == (["#认知偏差"], "直觉常被低估")
+    assert parse_enrichment('```\n{"tags": []}\n```') == ([], None)
+
+
+def test_parse_enrichment_plain_text():
+    assert parse_enrichment("#心理学 #决策\n摘要：直觉常被低估") == (["#心理学", "#决策"], "直觉常被低估")
+    assert parse_enrichment("没有标签") == (None, None)
+
+
+def test_combined_and_batch_prompts_follow_tag_prompt_and_max_tags(monkeypatch):
+    original_get = config.get
+
+    def fake_get(key, default=None, **kwargs):
+        if key == 'ai.tag_prompt':
+            return "请生成英文标签。\n只返回标签\n\n划线：{highlight_text}\n"
+        return original_get(key, default, **kwargs)
+
+    monkeypatch.setattr(config, 'get', fake_get)
+    monkeypatch.setattr(config, '_settings', config.settings._replace(max_ai_tags=5))
+
+    assert tag_instructions() == "请生成英文标签。\n标签数量不超过 5 个"
+    generator = object.__new__(AIEnrichmentGenerator)
+    assert tag_instructions() in generator.build_prompt("书", "作者", "划线")
+    assert "1-3个" not in generator.build_prompt("书", "作者", "划线")
+
+    # 标签要求变化时缓存键使用的提示词模板随之变化
+    combined = AIEnrichmentGenerator.enrich_prompt_template()
+    batch = AIEnrichmentGenerator.batch_prompt_template()
+    assert tag_instructions() in combined and tag_instructions() in batch
+    monkeypatch.setattr(config, '_settings', config.settings._replace(max_ai_tags=2))
+    assert AIEnrichmentGenerator.enrich_prompt_template() != combined
+    assert AIEnrichmentGenerator.batch_prompt_template() != batch
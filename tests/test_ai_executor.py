@@ -0,0 +1,113 @@
+"""AI 并发执行器和每分钟请求预算"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from src import ai_executor, sync
+from src.ai_executor import AIExecutor, RequestBudget, estimate_tokens
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd" * 10) == 11
+    assert estimate_tokens("你好") == 4
+    assert estimate_tokens("你好abcd") == 5
+
+
+def use_clock(monkeypatch):
+    clock = [1000.0]
+    sleeps = []
+
+    def sleep(delay):
+        sleeps.append(delay)
+        clock[0] += delay
+
+    monkeypatch.setattr(ai_executor.time, 'time', lambda: clock[0])
+    monkeypatch.setattr(ai_executor.time, 'sleep', sleep)
+    return clock, sleeps
+
+
+def test_requests_per_minute_queue_instead_of_failing(monkeypatch):
+    clock, sleeps = use_clock(monkeypatch)
+    budget = RequestBudget(requests_per_minute=2)
+    budget.acquire(10)
+    clock[0] += 10
+    budget.acquire(10)
+    assert sleeps == []
+
+    budget.acquire(10)
+    assert sleeps == [50.0]
+    assert budget.get_stats() == {"queued_count": 1, "total_wait": 50.0}
+
+
+def test_tokens_per_minute(monkeypatch):
+    clock, sleeps = use_clock(monkeypatch)
+    budget = RequestBudget(tokens_per_minute=100)
+    budget.acquire(60)
+    budget.acquire(60)
+    assert sleeps == [60.0]
+
+    # 单次超过整个预算的请求在窗口清空后放行
+    budget.acquire(500)
+    assert sleeps == [60.0, 60.0]
+
+
+def test_unlimited_budget_never_waits(monkeypatch):
+    _, sleeps = use_clock(monkeypatch)
+    budget = RequestBudget()
+    for _ in range(100):
+        budget.acquire(1000)
+    assert sleeps == []
+
+
+def test_map_preserves_order_and_runs_concurrently():
+    executor = AIExecutor(max_workers=4)
+    barrier = threading.Barrier(4, timeout=5)
+
+    def work(item):
+        barrier.wait()
+        return item * 2
+
+    assert executor.map(work, [1, 2, 3, 4]) == [2, 4, 6, 8]
+    assert AIExecutor(max_workers=0).map(str, [1, 2]) == ["1", "2"]
+
+
+def test_enrichment_without_ai_calls_does_not_use_the_pool(monkeypatch):
+    executor = AIExecutor(max_workers=4)
+    monkeypatch.setattr(executor, 'map', lambda func, items: pytest.fail("AI 关闭时不应使用线程池"))
+    monkeypatch.setattr(sync, 'get_ai_executor', lambda: executor)
+
+    syncer = object.__new__(sync.WeRead2FlomoV2)
+    syncer.ai_enrichment_generator = SimpleNamespace(uses_ai=lambda: False, supports_batch=lambda: False)
+    monkeypatch.setattr(syncer, 'enrich_highlight', lambda book_title, author, text: ([], None), raising=False)
+
+    assert syncer.enrich_highlights("书", "作者", ["一", "二", "三"]) == [([], None)] * 3
+
+
+def test_shared_instances_are_created_once_under_concurrency(monkeypatch):
+    from src import ai_cache
+
+    created = []
+
+    class SlowCache:
+        def __init__(self, **kwargs):
+            time.sleep(0.05)
+            created.append(self)
+
+    monkeypatch.setattr(ai_cache, '_cache', None)
+    monkeypatch.setattr(ai_cache, 'AICache', SlowCache)
+    monkeypatch.setattr(ai_cache.config, 'should_enable_ai_cache', lambda: True)
+    barrier = threading.Barrier(8)
+
+    def worker(_):
+        barrier.wait()
+        return ai_cache.get_ai_cache()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        instances = list(pool.map(worker, range(8)))
+
+    assert len(created) == 1
+    assert all(instance is created[0] for instance in instances)
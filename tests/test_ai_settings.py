@@ -0,0 +1,23 @@
+"""AI 标签和摘要生成器读取的配置（环境变量 > config.yaml > 默认值）"""
+from types import SimpleNamespace
+
+from src import ai_tags
+from src.ai_summary import AISummaryGenerator
+from src.ai_tags import AITagGenerator
+from src.config_manager import config
+
+
+def test_summary_min_length_honours_env_override(monkeypatch):
+    monkeypatch.setenv('AI_SUMMARY_MIN_LENGTH', '7')
+    generator = AISummaryGenerator()
+    assert generator.min_length == 7
+
+
+def test_tag_lookups_use_max_ai_tags_from_settings(monkeypatch):
+    monkeypatch.setenv('MAX_AI_TAGS', '1')
+    monkeypatch.setattr(config, '_settings', None)
+    monkeypatch.setattr(ai_tags, 'get_tag_index', lambda: SimpleNamespace(lookup=lambda text: ["#一", "#二", "#三"]))
+
+    generator = object.__new__(AITagGenerator)
+    monkeypatch.setattr(generator, 'get_cached_tags', lambda text: None, raising=False)
+    assert generator.lookup_tags("一段划线") == ["#一"]
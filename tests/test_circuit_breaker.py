@@ -0,0 +1,99 @@
+"""熔断器和自适应超时"""
+from src import circuit_breaker
+from src.circuit_breaker import (
+    STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN, CircuitBreaker, LatencyTracker
+)
+
+
+def use_clock(monkeypatch, start: float = 1000.0):
+    clock = [start]
+    monkeypatch.setattr(circuit_breaker.time, 'time', lambda: clock[0])
+    return clock
+
+
+def test_opens_after_consecutive_failures(monkeypatch):
+    use_clock(monkeypatch)
+    breaker = CircuitBreaker(failure_threshold=2, recovery_time=60)
+    breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == STATE_CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == STATE_OPEN
+    assert breaker.is_open()
+    assert not breaker.allow_request()
+    assert (breaker.trip_count, breaker.rejected_count) == (1, 1)
+
+
+def test_half_open_allows_a_single_probe(monkeypatch):
+    clock = use_clock(monkeypatch)
+    breaker = CircuitBreaker(failure_threshold=1, recovery_time=60)
+    breaker.record_failure()
+    clock[0] += 60
+
+    assert not breaker.is_open()
+    assert breaker.allow_request()
+    assert breaker.state == STATE_HALF_OPEN
+    assert not breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state == STATE_CLOSED
+    assert breaker.allow_request()
+
+
+def test_failed_probe_reopens(monkeypatch):
+    clock = use_clock(monkeypatch)
+    breaker = CircuitBreaker(failure_threshold=3, recovery_time=10)
+    for _ in range(3):
+        breaker.record_failure()
+    clock[0] += 10
+    assert breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.state == STATE_OPEN
+    assert breaker.is_open()
+    assert breaker.trip_count == 2
+
+
+def test_zero_threshold_never_opens():
+    breaker = CircuitBreaker(failure_threshold=0)
+    for _ in range(10):
+        breaker.record_failure()
+    assert breaker.allow_request()
+
+
+def test_latency_percentiles():
+    tracker = LatencyTracker(min_samples=1)
+    assert tracker.get_percentile() is None
+    for elapsed in range(1, 11):
+        tracker.record(float(elapsed))
+    assert tracker.get_percentile(50) == 5
+    assert tracker.get_percentile(90) == 9
+    assert tracker.get_percentile(95) == 10
+
+
+def test_timeout_uses_max_until_enough_samples():
+    tracker = LatencyTracker(max_timeout=30, min_timeout=5, multiplier=2, min_samples=3)
+    tracker.record(1)
+    tracker.record(1)
+    assert tracker.get_timeout() == 30
+
+    tracker.record(1)
+    assert tracker.get_timeout() == 5
+
+    for _ in range(3):
+        tracker.record(4)
+    assert tracker.get_timeout() == 8
+
+    tracker.record(100)
+    assert tracker.get_timeout() == 30
+
+
+def test_latency_window_drops_old_samples():
+    tracker = LatencyTracker(window=3, min_samples=1)
+    for elapsed in (10, 10, 10, 1, 1, 1):
+        tracker.record(elapsed)
+    assert tracker.get_percentile(100) == 1
+    assert tracker.get_stats()["samples"] == 3
@@ -0,0 +1,108 @@
+"""配置优先级、配置快照、热重载和解析缓存"""
+import json
+import os
+
+import pytest
+
+from src.config_manager import ENV_SECTION, ConfigManager
+
+CONFIG = """
+tags:
+  max_ai_tags: 2
+  enable_ai_tags: true
+templates:
+  simple: "{highlight_text}"
+"""
+
+
+@pytest.fixture
+def paths(tmp_path):
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text(CONFIG, encoding="utf-8")
+    return config_path, tmp_path / ".env", tmp_path / "config_cache.json"
+
+
+def make_manager(paths, cache=True):
+    config_path, env_path, cache_path = paths
+    return ConfigManager(str(config_path), str(env_path), str(cache_path) if cache else "")
+
+
+def rewrite(path, text):
+    """写入新内容并确保修改时间变化"""
+    stat = os.stat(path) if path.exists() else None
+    path.write_text(text, encoding="utf-8")
+    if stat is not None:
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_env_overrides_yaml_overrides_default(paths, monkeypatch):
+    manager = make_manager(paths)
+    monkeypatch.delenv('MAX_AI_TAGS', raising=False)
+    assert manager.get('tags.max_ai_tags', 3, env_key='MAX_AI_TAGS') == 2
+    assert manager.get('tags.missing', 'default') == 'default'
+
+    monkeypatch.setenv('MAX_AI_TAGS', '5')
+    assert manager.get('tags.max_ai_tags', 3, env_key='MAX_AI_TAGS') == 5
+    monkeypatch.setenv('MAX_AI_TAGS', ' ')
+    assert manager.get('tags.max_ai_tags', 3, env_key='MAX_AI_TAGS') == 2
+
+
+def test_settings_snapshot_is_resolved_once(paths, monkeypatch):
+    monkeypatch.delenv('MAX_AI_TAGS', raising=False)
+    manager = make_manager(paths)
+    settings = manager.settings
+    assert settings.max_ai_tags == 2
+    assert manager.settings is settings
+
+    monkeypatch.setenv('MAX_AI_TAGS', '9')
+    assert manager.settings.max_ai_tags == 2
+
+
+def test_reload_notifies_only_changed_sections(paths, monkeypatch):
+    monkeypatch.delenv('MAX_AI_TAGS', raising=False)
+    manager = make_manager(paths)
+    events = []
+    manager.add_reload_listener(events.append)
+    assert manager.reload_if_changed() == set()
+
+    rewrite(paths[0], CONFIG.replace("max_ai_tags: 2", "max_ai_tags: 4"))
+    assert manager.reload_if_changed() == {'tags'}
+    assert manager.settings.max_ai_tags == 4
+    assert events == [{'tags'}]
+
+
+def test_reload_keeps_current_config_when_invalid(paths):
+    manager = make_manager(paths)
+    rewrite(paths[0], "- just\n- a list\n")
+    assert manager.reload_if_changed() == set()
+    assert manager.get('tags.max_ai_tags') == 2
+
+
+def test_env_change_reloads_every_section(paths, monkeypatch):
+    monkeypatch.setenv('RELOAD_TEST_VALUE', '0')
+    manager = make_manager(paths)
+    rewrite(paths[1], "RELOAD_TEST_VALUE=1\n")
+
+    changed = manager.reload_if_changed()
+    assert {'tags', 'templates', ENV_SECTION} <= changed
+    assert os.environ['RELOAD_TEST_VALUE'] == '1'
+
+
+def test_parsed_config_is_cached(paths):
+    make_manager(paths)
+    cached = json.loads(paths[2].read_text(encoding="utf-8"))
+    assert cached['config']['tags']['max_ai_tags'] == 2
+
+    # 修改时间和大小未变时直接使用缓存，不重新解析
+    cached['config']['tags']['max_ai_tags'] = 7
+    paths[2].write_text(json.dumps(cached), encoding="utf-8")
+    assert make_manager(paths).get('tags.max_ai_tags') == 7
+
+    # 内容变化后重新解析
+    rewrite(paths[0], CONFIG.replace("max_ai_tags: 2", "max_ai_tags: 3"))
+    assert make_manager(paths).get('tags.max_ai_tags') == 3
+
+
+def test_missing_config_uses_defaults(tmp_path):
+    manager = ConfigManager(str(tmp_path / "missing.yaml"), str(tmp_path / ".env"), "")
+    assert manager.get('tags.max_ai_tags') == 3
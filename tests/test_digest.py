@@ -0,0 +1,46 @@
+"""摘要模式：把多条划线打包为一条 flomo 笔记"""
+from src import sync
+
+
+def make_syncer(group_by: str = "book", max_items: int = 10, max_chars: int = 1000) -> sync.WeRead2FlomoV2:
+    syncer = object.__new__(sync.WeRead2FlomoV2)
+    syncer.digest_group_by = group_by
+    syncer.digest_max_items = max_items
+    syncer.digest_max_chars = max_chars
+    return syncer
+
+
+def item(text: str, chapter_uid: int = 1, note_text: str = "", ai_summary=None) -> dict:
+    return {"highlight_text": text, "note_text": note_text, "ai_summary": ai_summary, "chapter_uid": chapter_uid}
+
+
+def texts(batches):
+    return [[entry["highlight_text"] for entry in batch] for batch in batches]
+
+
+def test_groups_are_capped_by_item_count():
+    syncer = make_syncer(max_items=2)
+    batches = syncer.group_digest_items(item(text) for text in "abcde")
+    assert texts(batches) == [["a", "b"], ["c", "d"], ["e"]]
+
+
+def test_groups_are_capped_by_characters_including_notes_and_summaries():
+    syncer = make_syncer(max_chars=10)
+    items = [item("aaaa"), item("bb", note_text="cc"), item("dd", ai_summary="eee")]
+    assert texts(syncer.group_digest_items(items)) == [["aaaa", "bb"], ["dd"]]
+
+
+def test_oversized_highlight_still_gets_its_own_memo():
+    syncer = make_syncer(max_chars=5)
+    items = [item("a"), item("x" * 20), item("b")]
+    assert texts(syncer.group_digest_items(items)) == [["a"], ["x" * 20], ["b"]]
+
+
+def test_chapter_grouping_starts_a_new_memo_per_chapter():
+    items = [item("a", chapter_uid=1), item("b", chapter_uid=1), item("c", chapter_uid=2)]
+    assert texts(make_syncer(group_by="chapter").group_digest_items(items)) == [["a", "b"], ["c"]]
+    assert texts(make_syncer(group_by="book").group_digest_items(items)) == [["a", "b", "c"]]
+
+
+def test_no_items_yield_no_memos():
+    assert list(make_syncer().group_digest_items([])) == []
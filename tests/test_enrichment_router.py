@@ -0,0 +1,48 @@
+"""AI 生成分流"""
+from types import SimpleNamespace
+
+from src.enrichment_router import TIER_CACHE, TIER_LLM, TIER_LOCAL, EnrichmentRouter
+
+
+def make_router(cached=(), **kwargs):
+    tag_generator = SimpleNamespace(
+        provider='openai',
+        is_enabled=lambda: True,
+        has_cached_tags=lambda text: text in cached,
+    )
+    summary_generator = SimpleNamespace(
+        uses_ai=lambda: True,
+        should_summarize=lambda text: len(text) >= 100,
+        has_cached_summary=lambda text: text in cached,
+    )
+    options = dict(enabled=True, min_length=50, category_weights={"哲学": 1.0})
+    options.update(kwargs)
+    return EnrichmentRouter(tag_generator, summary_generator, **options)
+
+
+def test_disabled_router_sends_everything_to_the_llm():
+    assert make_router(enabled=False).route("短", False, None) == TIER_LLM
+
+
+def test_scores_length_note_and_category():
+    router = make_router()
+    assert router.score("短", False, None) == 0
+    assert router.score("长" * 50, True, "哲学") == 3
+    assert router.route("短", False, None) == TIER_LOCAL
+    assert router.route("短", True, None) == TIER_LLM
+    assert router.route("短", False, "哲学") == TIER_LLM
+
+
+def test_cached_text_uses_the_cache_tier():
+    router = make_router(cached={"已缓存"})
+    assert router.route("已缓存", False, None) == TIER_CACHE
+    assert router.is_cached("已缓存")
+    assert not router.is_cached("未缓存")
+
+
+def test_record_and_stats():
+    router = make_router()
+    router.record(TIER_LOCAL, 4, 0.02)
+    stats = router.get_stats()
+    assert stats[TIER_LOCAL] == {"count": 4, "duration": 0.02, "avg_ms": 5.0}
+    assert stats[TIER_LLM]["avg_ms"] == 0.0
@@ -0,0 +1,88 @@
+"""flomo 客户端的幂等发送记录和重试状态"""
+import json
+
+import pytest
+
+from src.flomo_client import FlomoClient, FlomoSendLog
+
+
+def make_client(tmp_path, outcomes, daily_limit=100, **kwargs):
+    """_post 依次返回 outcomes 的客户端（每次返回都计为一次到达 flomo 的调用）"""
+    send_log = FlomoSendLog(str(tmp_path / "flomo_sent.json"))
+    client = FlomoClient(api_url="https://flomoapp.com/iwh/test/", daily_limit=daily_limit, send_log=send_log, **kwargs)
+    remaining = list(outcomes)
+
+    def fake_post(content):
+        client._count_request()
+        return remaining.pop(0)
+
+    client._post = fake_post
+    return client
+
+
+def test_default_policy_is_resend(tmp_path):
+    client = make_client(tmp_path, [])
+    assert client.ambiguous_policy == "resend"
+
+
+def test_sent_content_is_not_sent_again(tmp_path):
+    client = make_client(tmp_path, ["sent"])
+    assert client.send_memo("hello")
+    assert client.send_memo("hello")
+    assert client.request_count == 1
+    assert client.deduplicated_count == 1
+
+
+def test_throttled_then_quota_exhausted_is_marked_failed(tmp_path):
+    client = make_client(tmp_path, ["retry"], daily_limit=1)
+    assert not client.send_memo("hello")
+    key = FlomoClient.content_key("hello")
+    assert client.send_log.get_status(key) == "failed"
+
+    # 下次运行（即使使用 assume_sent）也会真正重新发送
+    client.flush()
+    retry_client = make_client(tmp_path, ["sent"], ambiguous_policy="assume_sent")
+    assert retry_client.send_memo("hello")
+    assert retry_client.request_count == 1
+
+
+def test_retries_exhausted_after_ambiguous_is_unknown(tmp_path):
+    client = make_client(tmp_path, ["retry", "ambiguous"], max_retries=1)
+    assert not client.send_memo("hello")
+    assert client.send_log.get_status(FlomoClient.content_key("hello")) == "unknown"
+
+
+def test_resend_policy_retries_ambiguous(tmp_path):
+    client = make_client(tmp_path, ["ambiguous", "sent"])
+    assert client.send_memo("hello")
+    assert client.request_count == 2
+
+
+def test_assume_sent_policy_stops_on_ambiguous(tmp_path):
+    client = make_client(tmp_path, ["ambiguous"], ambiguous_policy="assume_sent")
+    assert client.send_memo("hello")
+    assert client.send_log.get_status(FlomoClient.content_key("hello")) == "unknown"
+
+
+def test_non_retryable_failure_is_not_retried(tmp_path):
+    client = make_client(tmp_path, ["failed"])
+    assert not client.send_memo("hello")
+    assert client.request_count == 1
+
+
+def test_send_log_writes_only_on_flush(tmp_path):
+    path = tmp_path / "flomo_sent.json"
+    send_log = FlomoSendLog(str(path))
+    send_log.mark("a", "pending")
+    send_log.mark("a", "sent")
+    assert not path.exists()
+
+    send_log.flush()
+    records = json.loads(path.read_text(encoding="utf-8"))["records"]
+    assert records["a"]["status"] == "sent"
+    assert records["a"]["attempts"] == 1
+
+    # 没有变化时不再写入
+    path.unlink()
+    send_log.flush()
+    assert not path.exists()
@@ -0,0 +1,67 @@
+from src.highlight_utils import content_hash, merge_highlight_ranges, normalize_text, parse_range
+
+
+def bookmark(bookmark_id, text, chapter=1, create_time=0):
+    return {"bookmarkId": bookmark_id, "markText": text, "chapterUid": chapter, "createTime": create_time}
+
+
+def test_normalize_text_ignores_width_case_and_punctuation():
+    assert normalize_text("Ｈｅｌｌｏ， World！") == "helloworld"
+    assert normalize_text("你好，世界。") == normalize_text("你好 世界")
+
+
+def test_content_hash_matches_normalized_text():
+    assert content_hash("你好，世界。") == content_hash("你好世界")
+    assert content_hash("你好世界") != content_hash("你好")
+    assert len(content_hash("abc")) == 16
+
+
+def test_content_hash_is_none_for_empty_or_punctuation_only_text():
+    assert content_hash("") is None
+    assert content_hash(None) is None
+    assert content_hash("  \n") is None
+    assert content_hash("……！？") is None
+
+
+def test_parse_range_prefers_range_field():
+    assert parse_range({"range": "20-30", "bookmarkId": "1_2_5-9"}) == (20, 30)
+    assert parse_range({"bookmarkId": "1_2_9983-10065"}) == (9983, 10065)
+    assert parse_range({"bookmarkId": "1_2_10-5"}) == (5, 10)
+    assert parse_range({"bookmarkId": "abc"}) is None
+
+
+def test_merge_overlapping_highlights():
+    merged = merge_highlight_ranges([
+        bookmark("b_1_0-5", "abcdef", create_time=1),
+        bookmark("b_1_3-8", "defghi", create_time=2),
+    ])
+    assert len(merged) == 1
+    assert merged[0]["markText"] == "abcdefghi"
+    assert merged[0]["range"] == "0-8"
+    assert merged[0]["createTime"] == 2
+    assert merged[0]["mergedIds"] == ["b_1_0-5", "b_1_3-8"]
+
+
+def test_merge_adjacent_highlights_within_gap_uses_separator():
+    merged = merge_highlight_ranges([
+        bookmark("b_1_0-5", "first"),
+        bookmark("b_1_8-12", "second"),
+    ], gap=5, separator="…")
+    assert [item["markText"] for item in merged] == ["first…second"]
+
+    separate = merge_highlight_ranges([
+        bookmark("b_1_0-5", "first"),
+        bookmark("b_1_8-12", "second"),
+    ], gap=0)
+    assert [item["markText"] for item in separate] == ["first", "second"]
+
+
+def test_merge_keeps_chapters_apart_and_preserves_order():
+    items = [
+        bookmark("b_2_0-5", "chapter two", chapter=2),
+        bookmark("no-range", "unparsed"),
+        bookmark("b_1_0-5", "chapter one", chapter=1),
+    ]
+    merged = merge_highlight_ranges(items)
+    assert [item["bookmarkId"] for item in merged] == ["b_2_0-5", "no-range", "b_1_0-5"]
+    assert all("mergedIds" not in item for item in merged)
@@ -0,0 +1,31 @@
+"""多关键词匹配器"""
+from src.keyword_matcher import KeywordMatcher
+
+
+def make_matcher():
+    return KeywordMatcher([
+        ("心理", "心理学", 1),
+        ("心理学", "心理学", 1),
+        ("理学", "自然科学", 0.5),
+        ("Python", "编程", 2),
+        ("", "空", 1),
+    ])
+
+
+def test_finds_overlapping_keywords_case_insensitively():
+    matcher = make_matcher()
+    assert len(matcher) == 4
+    assert matcher.find_keywords("认知心理学与PYTHON，心理") == ["心理", "心理学", "理学", "python"]
+    assert matcher.find_keywords("") == []
+    assert KeywordMatcher([]).find_keywords("心理学") == []
+
+
+def test_score_counts_each_keyword_once():
+    assert make_matcher().score("心理学和心理学") == {"心理学": 2, "自然科学": 0.5}
+
+
+def test_best_uses_priority_to_break_ties():
+    matcher = KeywordMatcher([("a", "甲", 1), ("b", "乙", 1)])
+    assert matcher.best("ab") == "甲"
+    assert matcher.best("ab", priority={"乙": 1}) == "乙"
+    assert matcher.best("xyz") is None
@@ -0,0 +1,26 @@
+"""本地抽取式摘要"""
+from src.local_summary import LocalSummarizer, split_sentences
+
+TEXT = (
+    "系统1的运作是无意识且快速的，不怎么费脑力。"
+    "系统2将注意力转移到需要费脑力的大脑活动上来。"
+    "今天天气不错！"
+    "系统1和系统2的分工是非常高效的。"
+)
+
+
+def test_split_sentences_keeps_punctuation():
+    assert split_sentences("第一句。第二句！\n\n第三句？  ") == ["第一句。", "第二句！", "第三句？"]
+    assert split_sentences("  \n ") == []
+
+
+def test_summary_prefers_representative_sentences_in_original_order():
+    summary = LocalSummarizer(max_length=40).summarize(TEXT)
+    assert summary == "系统1的运作是无意识且快速的，不怎么费脑力。系统1和系统2的分工是非常高效的。"
+
+
+def test_summary_keeps_original_order_and_truncates():
+    summarizer = LocalSummarizer(max_length=10)
+    assert summarizer.summarize("") is None
+    assert summarizer.summarize("只有一句话但是很长很长很长。") == "只有一句话但是很长…"
+    assert len(summarizer.summarize(TEXT)) <= 10
@@ -0,0 +1,39 @@
+"""本地 TF-IDF 标签引擎"""
+from src.local_tagger import LocalTagger, char_ngrams
+
+
+def make_tagger(tmp_path, **kwargs):
+    return LocalTagger(history_path=str(tmp_path / "tag_history.json"), **kwargs)
+
+
+def test_char_ngrams_ignore_punctuation():
+    assert char_ngrams("A，b c", sizes=(2,)) == {"ab": 1, "bc": 1}
+
+
+def test_learned_tags_are_suggested_for_similar_text(tmp_path):
+    tagger = make_tagger(tmp_path, vocabulary={})
+    tagger.learn("复利是世界第八大奇迹，长期投资的回报", ["#投资"])
+    tagger.learn("番茄工作法让专注时间更长", ["#效率"])
+
+    assert "#投资" in tagger.tag("长期投资依靠复利的力量")
+    assert "#投资" not in tagger.tag("专注的番茄工作法", max_tags=1)
+
+
+def test_vocabulary_keywords_score_directly(tmp_path):
+    tagger = make_tagger(tmp_path, vocabulary={"#量子": ["量子力学"]})
+    assert tagger.tag("关于量子力学的一段话")[0] == "#量子"
+    assert "#量子" in tagger.tag("第一章", book_title="量子力学导论")
+
+
+def test_history_round_trip_and_cap(tmp_path):
+    tagger = make_tagger(tmp_path, max_history=2)
+    tagger.save()
+    assert not (tmp_path / "tag_history.json").exists()
+
+    for index in range(3):
+        tagger.learn(f"第{index}条", [f"#{index}"])
+    tagger.learn("", ["#忽略"])
+    tagger.save()
+
+    reloaded = make_tagger(tmp_path)
+    assert [item["tags"] for item in reloaded.history] == [["#1"], ["#2"]]
@@ -0,0 +1,180 @@
+"""发件箱：发送顺序、持久化和死信"""
+import json
+from pathlib import Path
+
+import pytest
+
+from src import sync
+from src.flomo_client import FlomoClient, FlomoSendLog
+from src.outbox import Outbox
+
+
+def make_outbox(tmp_path, **kwargs) -> Outbox:
+    return Outbox(path=str(tmp_path / "outbox.json"), **kwargs)
+
+
+def test_fifo_order(tmp_path):
+    outbox = make_outbox(tmp_path)
+    outbox.enqueue("a", ["1"], priority=0)
+    outbox.enqueue("b", ["2"], priority=1)
+    assert [entry["content"] for entry in outbox.ordered_entries()] == ["a", "b"]
+
+
+def test_priority_order_keeps_fifo_within_priority(tmp_path):
+    outbox = make_outbox(tmp_path, order="priority")
+    outbox.enqueue("a", ["1"], priority=0)
+    outbox.enqueue("b", ["2"], priority=1)
+    outbox.enqueue("c", ["3"], priority=1)
+    assert [entry["content"] for entry in outbox.ordered_entries()] == ["b", "c", "a"]
+
+
+def test_enqueue_and_remove_are_saved_immediately(tmp_path):
+    outbox = make_outbox(tmp_path)
+    entry = outbox.enqueue("a", ["1", "2"])
+
+    reloaded = make_outbox(tmp_path)
+    assert [item["content"] for item in reloaded.entries] == ["a"]
+    assert reloaded.get_pending_ids() == {"1", "2"}
+
+    outbox.remove(entry["id"])
+    reloaded = make_outbox(tmp_path)
+    assert len(reloaded) == 0
+    assert reloaded.get_pending_ids() == set()
+
+
+def test_exhausted_entry_moves_to_dead_list(tmp_path):
+    outbox = make_outbox(tmp_path, max_attempts=2)
+    entry = outbox.enqueue("a", ["1"])
+
+    assert not outbox.mark_failed(entry["id"])
+    assert len(outbox) == 1
+    assert outbox.mark_failed(entry["id"])
+    assert len(outbox) == 0
+
+    data = json.loads((tmp_path / "outbox.json").read_text(encoding="utf-8"))
+    assert [item["content"] for item in data["dead"]] == ["a"]
+    # 死信中的划线不再重新同步，但也不算等待发送
+    reloaded = make_outbox(tmp_path)
+    assert reloaded.get_pending_ids() == set()
+    assert reloaded.is_dead("1")
+
+
+def test_zero_max_attempts_never_dead_letters(tmp_path):
+    outbox = make_outbox(tmp_path, max_attempts=0)
+    entry = outbox.enqueue("a", ["1"])
+    for _ in range(10):
+        assert not outbox.mark_failed(entry["id"])
+    assert len(outbox) == 1
+
+
+class FakeFlomo:
+    """按内容决定发送结果的 flomo 客户端"""
+
+    def __init__(self, rejected=()):
+        self.rejected = set(rejected)
+        self.sent = []
+
+    def get_remaining_quota(self):
+        return 100
+
+    def send_memo(self, content):
+        if content in self.rejected:
+            return False
+        self.sent.append(content)
+        return True
+
+    def flush(self):
+        pass
+
+
+def make_syncer(outbox, flomo) -> sync.WeRead2FlomoV2:
+    syncer = object.__new__(sync.WeRead2FlomoV2)
+    syncer.outbox = outbox
+    syncer.flomo_client = flomo
+    syncer.synced_file = str(Path(outbox.path).with_name("synced_bookmarks.json"))
+    syncer.synced_ids = set()
+    syncer.watermarks = {}
+    syncer.days_limit = 0
+    syncer.content_index = {}
+    syncer.stats = sync.SyncStatistics()
+    return syncer
+
+
+def test_failing_head_does_not_block_drain(tmp_path):
+    outbox = make_outbox(tmp_path, max_attempts=1)
+    outbox.enqueue("bad", ["1"])
+    outbox.enqueue("good", ["2"])
+    flomo = FakeFlomo(rejected={"bad"})
+    syncer = make_syncer(outbox, flomo)
+
+    assert syncer.drain_outbox() == 1
+    assert flomo.sent == ["good"]
+    assert syncer.synced_ids == {"2"}
+    assert len(outbox) == 0
+    assert [entry["content"] for entry in outbox.dead] == ["bad"]
+
+
+def test_drain_stops_after_consecutive_failures(tmp_path):
+    outbox = make_outbox(tmp_path)
+    limit = sync.WeRead2FlomoV2.OUTBOX_FAILURE_LIMIT
+    for index in range(limit + 2):
+        outbox.enqueue(f"memo {index}", [str(index)])
+    flomo = FakeFlomo(rejected={f"memo {index}" for index in range(limit + 2)})
+    syncer = make_syncer(outbox, flomo)
+
+    assert syncer.drain_outbox() == 0
+    attempts = [entry["attempts"] for entry in outbox.entries]
+    assert attempts == [1] * limit + [0, 0]
+
+
+def test_dead_letter_does_not_pin_the_watermark(tmp_path):
+    outbox = make_outbox(tmp_path, max_attempts=1)
+    outbox.enqueue("bad", ["1"])
+    flomo = FakeFlomo(rejected={"bad"})
+    syncer = make_syncer(outbox, flomo)
+    syncer.drain_outbox()
+    syncer.synced_ids.add("2")
+
+    bookmarks = [
+        {"bookmarkId": "1", "createTime": 100},
+        {"bookmarkId": "2", "createTime": 200},
+    ]
+    # 死信中的划线既不重新同步，也不阻挡水位线
+    assert not syncer.should_sync_bookmark(bookmarks[0], cutoff_time=0)
+    assert syncer.advance_watermark("book", bookmarks, cutoff_time=0) == 200
+
+    # 下次运行重新加载发件箱后同样如此
+    syncer.outbox = make_outbox(tmp_path, max_attempts=1)
+    syncer.watermarks = {}
+    assert syncer.advance_watermark("book", bookmarks, cutoff_time=0) == 200
+
+
+def test_crash_after_send_does_not_resend(tmp_path, monkeypatch):
+    outbox = make_outbox(tmp_path)
+    outbox.enqueue("memo", ["1"])
+    flomo = FlomoClient(api_url="https://flomoapp.com/iwh/test/",
+                        send_log=FlomoSendLog(str(tmp_path / "flomo_sent.json")))
+    posts = []
+    monkeypatch.setattr(flomo, '_post', lambda content: posts.append(content) or "sent")
+    syncer = make_syncer(outbox, flomo)
+
+    # 发送成功后、移出发件箱前进程中断
+    def crash(entry_id):
+        raise SystemExit("crash")
+
+    monkeypatch.setattr(outbox, 'remove', crash)
+    with pytest.raises(SystemExit):
+        syncer.drain_outbox()
+
+    data = json.loads((tmp_path / "synced_bookmarks.json").read_text(encoding="utf-8"))
+    assert data["synced_ids"] == ["1"]
+
+    # 下次运行：条目仍在发件箱中，但发送记录表明已发送，不会重复发送
+    rerun_flomo = FlomoClient(api_url="https://flomoapp.com/iwh/test/",
+                              send_log=FlomoSendLog(str(tmp_path / "flomo_sent.json")))
+    monkeypatch.setattr(rerun_flomo, '_post', lambda content: posts.append(content) or "sent")
+    rerun = make_syncer(make_outbox(tmp_path), rerun_flomo)
+    assert rerun.drain_outbox() == 1
+    assert posts == ["memo"]
+    assert rerun_flomo.deduplicated_count == 1
+    assert len(make_outbox(tmp_path)) == 0
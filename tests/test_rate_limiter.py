@@ -0,0 +1,76 @@
+"""flomo 发送的自适应速率限制"""
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from src.rate_limiter import AdaptiveRateLimiter, parse_retry_after
+
+
+def test_parse_retry_after_seconds():
+    assert parse_retry_after("5") == 5.0
+    assert parse_retry_after("1.5") == 1.5
+    assert parse_retry_after("-3") == 0.0
+
+
+def test_parse_retry_after_http_date():
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+    delay = parse_retry_after(format_datetime(retry_at, usegmt=True))
+    assert 25 <= delay <= 30
+
+    past = datetime.now(timezone.utc) - timedelta(minutes=5)
+    assert parse_retry_after(format_datetime(past, usegmt=True)) == 0.0
+
+
+def test_parse_retry_after_invalid():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("") is None
+    assert parse_retry_after("soon") is None
+
+
+def test_initial_rate_is_clamped():
+    assert AdaptiveRateLimiter(initial_rate=50, min_rate=1, max_rate=10).rate == 10
+    assert AdaptiveRateLimiter(initial_rate=0.1, min_rate=1, max_rate=10).rate == 1
+
+
+def test_additive_increase_multiplicative_decrease():
+    limiter = AdaptiveRateLimiter(initial_rate=4, min_rate=1, max_rate=5, increase_step=0.5, decrease_factor=0.5)
+    limiter.on_success()
+    limiter.on_success()
+    limiter.on_success()
+    assert limiter.rate == 5
+
+    limiter.on_throttle(retry_after=0)
+    assert limiter.rate == 2.5
+    limiter.on_throttle(retry_after=0)
+    limiter.on_throttle(retry_after=0)
+    assert limiter.rate == 1
+
+    stats = limiter.get_stats()
+    assert stats["throttle_count"] == 3
+    assert stats["min_rate_seen"] == 1
+
+
+def test_burst_tokens_are_immediate_then_paced():
+    limiter = AdaptiveRateLimiter(initial_rate=100, max_rate=100, burst=2)
+    assert limiter.acquire() == 0.0
+    assert limiter.acquire() == 0.0
+    assert limiter.acquire() > 0.0
+
+
+def test_throttle_blocks_for_retry_after(monkeypatch):
+    limiter = AdaptiveRateLimiter(initial_rate=10, max_rate=10)
+    sleeps = []
+    clock = [1000.0]
+    monkeypatch.setattr("src.rate_limiter.time.monotonic", lambda: clock[0])
+
+    def sleep(delay):
+        sleeps.append(delay)
+        clock[0] += delay
+
+    monkeypatch.setattr("src.rate_limiter.time.sleep", sleep)
+    limiter.last_refill = clock[0]
+    limiter.on_throttle(retry_after=7)
+
+    waited = limiter.acquire()
+    assert sleeps[0] == 7
+    assert waited >= 7
+    assert limiter.get_stats()["total_wait"] == waited
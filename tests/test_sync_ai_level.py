@@ -0,0 +1,72 @@
+"""同步器的 AI 降级等级（预算 + 熔断）"""
+from types import SimpleNamespace
+
+import pytest
+
+from src import sync
+from src.ai_budget import LEVEL_FULL, LEVEL_LOCAL, LEVEL_REDUCED
+from src.ai_client import AIClient, AIEndpoint
+
+
+def make_client(failure_threshold: int = 1) -> AIClient:
+    """只有一个接口、连续失败 failure_threshold 次即熔断的客户端"""
+    client = object.__new__(AIClient)
+    client.provider = 'openai'
+    client.endpoints = [
+        AIEndpoint(
+            'https://api.example.com/v1', 'gpt-test', 'sk-test',
+            circuit_breaker={'failure_threshold': failure_threshold, 'recovery_time': 60}
+        )
+    ]
+    return client
+
+
+def make_syncer() -> sync.WeRead2FlomoV2:
+    """不初始化微信读书 API 的同步器，只带 update_ai_level 需要的状态"""
+    syncer = object.__new__(sync.WeRead2FlomoV2)
+    syncer.ai_level = LEVEL_FULL
+    syncer.stats = sync.SyncStatistics()
+    return syncer
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = make_client()
+    monkeypatch.setattr(sync, 'get_ai_client', lambda: client)
+    return client
+
+
+def use_budget_level(monkeypatch, level: str):
+    monkeypatch.setattr(sync, 'get_ai_budget', lambda: SimpleNamespace(get_level=lambda: level))
+
+
+def test_healthy_client_keeps_budget_level(monkeypatch, client):
+    use_budget_level(monkeypatch, LEVEL_FULL)
+    syncer = make_syncer()
+
+    assert syncer.update_ai_level() == LEVEL_FULL
+    assert syncer.stats.warnings == []
+
+
+@pytest.mark.parametrize("budget_level", [LEVEL_FULL, LEVEL_REDUCED])
+def test_tripped_breaker_drops_to_local(monkeypatch, client, budget_level):
+    use_budget_level(monkeypatch, budget_level)
+    client.endpoints[0].breaker.record_failure()
+    assert not client.is_healthy()
+
+    syncer = make_syncer()
+    assert syncer.update_ai_level() == LEVEL_LOCAL
+    assert syncer.ai_level == LEVEL_LOCAL
+    assert len(syncer.stats.warnings) == 1
+
+
+def test_recovered_breaker_restores_full(monkeypatch, client):
+    use_budget_level(monkeypatch, LEVEL_FULL)
+    breaker = client.endpoints[0].breaker
+    breaker.record_failure()
+
+    syncer = make_syncer()
+    assert syncer.update_ai_level() == LEVEL_LOCAL
+
+    breaker.record_success()
+    assert syncer.update_ai_level() == LEVEL_FULL
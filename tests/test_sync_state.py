@@ -0,0 +1,115 @@
+"""同步器的本地状态：同步记录、水位线和内容指纹索引"""
+import json
+
+from src import sync
+from src.outbox import Outbox
+
+
+def make_syncer(tmp_path, max_entries: int = 0) -> sync.WeRead2FlomoV2:
+    """不初始化微信读书 API 的同步器，状态文件都放在临时目录"""
+    syncer = object.__new__(sync.WeRead2FlomoV2)
+    syncer.synced_file = str(tmp_path / "synced_bookmarks.json")
+    syncer.content_index_file = str(tmp_path / "content_index.json")
+    syncer.content_index_max_entries = max_entries
+    syncer.synced_ids = set()
+    syncer.watermarks = {}
+    syncer.days_limit = 0
+    syncer.content_index = {}
+    return syncer
+
+
+def index_entry(bookmark_id: str) -> dict:
+    return {"bookmark_id": bookmark_id, "book_title": "书", "ai_tags": ["#标签"], "ai_summary": "摘要"}
+
+
+def test_content_index_is_not_written_to_the_sync_record(tmp_path):
+    syncer = make_syncer(tmp_path)
+    syncer.synced_ids = {"1"}
+    syncer.content_index = {"hash-1": index_entry("1")}
+    syncer.save_synced_ids()
+    syncer.save_content_index()
+
+    record = json.loads((tmp_path / "synced_bookmarks.json").read_text(encoding="utf-8"))
+    assert "content_index" not in record
+    assert make_syncer(tmp_path).load_content_index(record) == {"hash-1": index_entry("1")}
+
+
+def test_content_index_migrates_from_old_sync_record(tmp_path):
+    record = {"synced_ids": ["1"], "content_index": {"hash-1": index_entry("1")}}
+    syncer = make_syncer(tmp_path)
+    assert syncer.load_content_index(record) == {"hash-1": index_entry("1")}
+
+
+def test_content_index_keeps_the_newest_entries(tmp_path):
+    syncer = make_syncer(tmp_path, max_entries=2)
+    syncer.content_index = {f"hash-{index}": index_entry(str(index)) for index in range(5)}
+    syncer.save_content_index()
+
+    assert list(syncer.content_index) == ["hash-3", "hash-4"]
+    assert list(syncer.load_content_index({})) == ["hash-3", "hash-4"]
+
+
+def bookmark(bookmark_id: str, create_time: int) -> dict:
+    return {"bookmarkId": bookmark_id, "createTime": create_time}
+
+
+def make_watermark_syncer(tmp_path, synced=(), pending=()) -> sync.WeRead2FlomoV2:
+    syncer = make_syncer(tmp_path)
+    syncer.synced_ids = set(synced)
+    syncer.outbox = Outbox(path=str(tmp_path / "outbox.json"))
+    for bookmark_id in pending:
+        syncer.outbox.enqueue("memo", [bookmark_id])
+    return syncer
+
+
+def test_watermark_advances_past_fully_synced_timestamps(tmp_path):
+    syncer = make_watermark_syncer(tmp_path, synced={"1", "2", "3"})
+    bookmarks = [bookmark("3", 300), bookmark("1", 100), bookmark("2", 200)]
+
+    assert syncer.advance_watermark("book", bookmarks, cutoff_time=0) == 300
+    assert syncer.watermarks == {"book": 300}
+
+
+def test_watermark_stops_before_the_first_unsynced_highlight(tmp_path):
+    # 2 因配额或发送失败未同步，3 仍在发件箱中等待发送
+    syncer = make_watermark_syncer(tmp_path, synced={"1", "4"}, pending={"3"})
+    bookmarks = [bookmark("1", 100), bookmark("2", 200), bookmark("3", 300), bookmark("4", 400)]
+    assert syncer.advance_watermark("book", bookmarks, cutoff_time=0) == 100
+
+    syncer.synced_ids.add("2")
+    assert syncer.advance_watermark("book", bookmarks, cutoff_time=0) == 200
+
+
+def test_watermark_needs_every_highlight_of_a_timestamp(tmp_path):
+    syncer = make_watermark_syncer(tmp_path, synced={"1", "2a"})
+    bookmarks = [bookmark("1", 100), bookmark("2a", 200), bookmark("2b", 200)]
+    assert syncer.advance_watermark("book", bookmarks, cutoff_time=0) == 100
+
+
+def test_watermark_passes_highlights_older_than_the_cutoff(tmp_path):
+    syncer = make_watermark_syncer(tmp_path, synced={"3"})
+    bookmarks = [bookmark("1", 100), bookmark("2", 200), bookmark("3", 300)]
+    assert syncer.advance_watermark("book", bookmarks, cutoff_time=250) == 300
+
+
+def test_no_watermark_is_recorded_without_progress(tmp_path):
+    syncer = make_watermark_syncer(tmp_path)
+    assert syncer.advance_watermark("book", [bookmark("1", 100)], cutoff_time=0) == 0
+    assert syncer.watermarks == {}
+
+
+def test_highlights_at_or_below_the_watermark_are_skipped(tmp_path):
+    syncer = make_watermark_syncer(tmp_path, pending={"3"})
+    assert not syncer.should_sync_bookmark(bookmark("1", 100), watermark=200, cutoff_time=0)
+    assert not syncer.should_sync_bookmark(bookmark("2", 200), watermark=200, cutoff_time=0)
+    assert syncer.should_sync_bookmark(bookmark("4", 300), watermark=200, cutoff_time=0)
+    # 水位线以上已在发件箱中的划线同样跳过
+    assert not syncer.should_sync_bookmark(bookmark("3", 300), watermark=200, cutoff_time=0)
+
+
+def test_watermarks_are_dropped_when_the_days_limit_changes(tmp_path):
+    syncer = make_syncer(tmp_path)
+    syncer.days_limit = 30
+    record = {"watermarks": {"book": "300"}, "watermark_days_limit": 30}
+    assert syncer.load_watermarks(record) == {"book": 300}
+    assert syncer.load_watermarks({**record, "watermark_days_limit": 0}) == {}
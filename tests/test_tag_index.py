@@ -0,0 +1,35 @@
+"""标签复用索引"""
+import pytest
+
+from src.tag_index import TagReuseIndex, hashed_vector
+
+
+def test_hashed_vector_is_normalized():
+    vector = hashed_vector("长期投资依靠复利的力量", 64)
+    assert sum(weight * weight for weight in vector.values()) == pytest.approx(1.0)
+    assert all(0 <= index < 64 for index in vector)
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_similar_text_reuses_tags(use_numpy):
+    index = TagReuseIndex(threshold=0.8, use_numpy=use_numpy)
+    assert index.lookup("任何内容") is None
+
+    index.add("复利是世界第八大奇迹，长期投资的回报", ["#投资"])
+    index.add("番茄工作法让专注时间更长", ["#效率"])
+    index.add("", ["#忽略"])
+    assert len(index) == 2
+
+    assert index.lookup("复利是世界第八大奇迹，长期投资的回报！") == ["#投资"]
+    assert index.lookup("完全不相关的一句话") is None
+
+    stats = index.get_stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+    assert stats["hit_rate"] == pytest.approx(100 / 3)
+
+
+def test_lookup_returns_a_copy():
+    index = TagReuseIndex(use_numpy=False)
+    index.add("同一段内容", ["#a"])
+    index.lookup("同一段内容").append("#b")
+    assert index.lookup("同一段内容") == ["#a"]
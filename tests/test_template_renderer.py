@@ -0,0 +1,100 @@
+"""预编译模板、空行清理和书籍标签上下文"""
+import pytest
+
+from src.config_manager import config
+from src.template_renderer import (
+    BookTagContext, CompiledTemplate, TagGenerator, TemplateRenderer, compile_template
+)
+
+TEMPLATE = "{highlight_text}\n\n{chapter_info}\n\n\n{ai_summary_section}\n{note_section}\n{tags}"
+
+
+def legacy_render(template, values):
+    """预编译之前的做法：str.format 后逐行合并连续空行"""
+    lines = []
+    prev_empty = False
+    for line in template.format(**values).split('\n'):
+        is_empty = not line.strip()
+        if not (is_empty and prev_empty):
+            lines.append(line)
+        prev_empty = is_empty
+    return '\n'.join(lines).strip()
+
+
+@pytest.mark.parametrize("chapter_name, note_text, ai_summary, tags", [
+    ("", "", "", None),
+    ("第一章", "", "", ["#a"]),
+    ("", "我的想法", "一句话", ["#a", "#b"]),
+    ("第二章", "我的想法", "一句话", None),
+])
+def test_compiled_template_matches_format_and_cleanup(chapter_name, note_text, ai_summary, tags):
+    values = TemplateRenderer.build_values(
+        "书名", "作者", "划线内容", chapter_name, "", note_text, "2024-01-01", tags, ai_summary
+    )
+    assert CompiledTemplate(TEMPLATE).render(values) == legacy_render(TEMPLATE, values)
+
+
+def test_compiled_template_handles_escaped_braces_and_format_specs():
+    compiled = CompiledTemplate("{{字面}} {book_title!r} {author:>4}")
+    assert not compiled.simple
+    assert compiled.fields == {"book_title", "author"}
+    assert compiled.render({"book_title": "书", "author": "甲"}) == "{字面} '书'    甲"
+
+
+def test_compile_template_is_cached():
+    assert compile_template(TEMPLATE) is compile_template(TEMPLATE)
+
+
+def test_clean_blank_lines_keeps_one_blank_line():
+    assert TemplateRenderer._clean_blank_lines("\n\na\n\n\n\nb\n \n\t\nc\n\n") == "a\n\nb\n \nc"
+
+
+def test_render_many_matches_render():
+    items = [
+        {"highlight_text": "一", "chapter_name": "章", "tags": ["#a"]},
+        {"highlight_text": "二", "note_text": "想法", "ai_summary": None, "create_time": "2024-01-02"},
+    ]
+    rendered = TemplateRenderer.render_many(TEMPLATE, "书", "作者", items)
+    assert rendered == [
+        TemplateRenderer.render(TEMPLATE, "书", "作者", "一", chapter_name="章", tags=["#a"]),
+        TemplateRenderer.render(TEMPLATE, "书", "作者", "二", note_text="想法", create_time="2024-01-02"),
+    ]
+
+
+@pytest.mark.parametrize("title, expected", [
+    ("美丽新世界（译文经典）", "美丽新世界"),
+    ("原则（Principles）", "原则"),
+    ("思考，快与慢", "思考快与慢"),
+    ("代码大全 第2版", "代码大全第2版"),
+    ("《三体》【典藏版】", "三体"),
+])
+def test_clean_book_title(title, expected):
+    assert TagGenerator._clean_book_title(title) == expected
+
+
+def use_settings(monkeypatch, **overrides):
+    monkeypatch.setattr(config, '_settings', config.settings._replace(**overrides))
+
+
+def test_book_tag_context_merges_ai_tags(monkeypatch):
+    use_settings(
+        monkeypatch,
+        add_book_title_tag=True, use_hierarchical_tags=True, add_author_tag=True,
+        category_tags={"心理学": ("#心理学",)}
+    )
+    context = BookTagContext("思考，快与慢", "丹尼尔 卡尼曼", "心理学")
+    assert context.merge() == ["#微信读书/思考快与慢", "#心理学", "#丹尼尔_卡尼曼"]
+    assert context.merge(["#心理学", "#决策", "#决策"]) == [
+        "#微信读书/思考快与慢", "#心理学", "#决策", "#丹尼尔_卡尼曼"
+    ]
+
+
+def test_book_tag_context_flat_tags_without_author(monkeypatch):
+    use_settings(
+        monkeypatch,
+        add_book_title_tag=True, use_hierarchical_tags=False, add_author_tag=False,
+        default_tags=("#微信读书",)
+    )
+    context = BookTagContext("原则（Principles）", "瑞·达利欧")
+    assert context.merge() == ["#微信读书", "#原则"]
+    assert context.merge(["#原则", "#管理"]) == ["#微信读书", "#原则", "#管理"]
@@ -0,0 +1,35 @@
+"""按自然日持久化的用量账本"""
+import json
+from datetime import datetime, timedelta
+
+from src.usage_ledger import UsageLedger
+
+
+def test_add_persists_immediately(tmp_path):
+    path = str(tmp_path / "usage_ledger.json")
+    ledger = UsageLedger(path=path)
+    assert ledger.add("flomo_requests") == 1
+    assert ledger.add("flomo_requests", 2) == 3
+
+    reloaded = UsageLedger(path=path)
+    assert reloaded.get("flomo_requests") == 3
+    assert reloaded.get("ai_tokens") == 0
+
+
+def test_days_use_the_configured_timezone(tmp_path):
+    ledger = UsageLedger(path=str(tmp_path / "usage_ledger.json"), utc_offset_hours=8)
+    assert ledger.today() == datetime.now(ledger.tz).strftime("%Y-%m-%d")
+    ledger.add("flomo_requests")
+    assert ledger.get("flomo_requests", day="2000-01-01") == 0
+
+
+def test_old_days_are_pruned_on_save(tmp_path):
+    path = tmp_path / "usage_ledger.json"
+    ledger = UsageLedger(path=str(path), keep_days=30)
+    old_day = (datetime.now(ledger.tz) - timedelta(days=31)).strftime("%Y-%m-%d")
+    ledger.days[old_day] = {"flomo_requests": 5}
+    ledger.add("flomo_requests")
+
+    days = json.loads(path.read_text(encoding="utf-8"))["days"]
+    assert old_day not in days
+    assert days[ledger.today()] == {"flomo_requests": 1}